@@ -0,0 +1,215 @@
+import argparse
+
+import chess
+import chess.engine
+import chess.pgn
+import numpy as np
+
+from result_store import ResultStore
+
+# Las evaluaciones se recortan a ±CP_LIMIT centipeones (un mate cuenta como el límite)
+CP_LIMIT = 2000
+ACPL_LIMIT = 1000
+
+# Pérdida de probabilidad de ganar (en %) a partir de la que una jugada es imprecisión, error o error grave
+INACCURACY, MISTAKE, BLUNDER = 10, 20, 30
+
+
+def _win_table():
+    # Puntuación esperada (0..100) de cada evaluación entera, con el modelo WDL de chess.engine
+    return np.array([
+        chess.engine.PovScore(chess.engine.Cp(cp), chess.WHITE).wdl().white().expectation() * 100
+        for cp in range(-CP_LIMIT, CP_LIMIT + 1)
+    ])
+
+
+WIN_TABLE = _win_table()
+
+
+def score_to_cp(score):
+    """Centipeones desde el punto de vista de las blancas (PovScore), con los mates en ±CP_LIMIT"""
+    if score is None:
+        return np.nan
+    return max(-CP_LIMIT, min(CP_LIMIT, score.white().score(mate_score=CP_LIMIT)))
+
+
+def win_percent(cp):
+    """Probabilidad de ganar de las blancas (%) para evaluaciones en centipeones; NaN se conserva"""
+    cp = np.asarray(cp, dtype=float)
+    index = np.clip(np.nan_to_num(cp), -CP_LIMIT, CP_LIMIT).round().astype(np.int64) + CP_LIMIT
+    return np.where(np.isnan(cp), np.nan, WIN_TABLE[index])
+
+
+class PlyTable:
+    """Jugadas de muchas partidas en arreglos planos: partida, jugador, color y evaluaciones antes y después"""
+
+    def __init__(self):
+        self.games = []
+        self.players = []
+        self.player_ids = {}
+        self._game = []
+        self._player = []
+        self._white = []
+        self._before = []
+        self._after = []
+
+    def player_id(self, name):
+        if name not in self.player_ids:
+            self.player_ids[name] = len(self.players)
+            self.players.append(name)
+        return self.player_ids[name]
+
+    def add_game(self, label, white, black, evals, white_moves_first=True):
+        """Añadir una partida con la evaluación (centipeones, blancas) de cada posición, de la inicial a la final
+
+        Las posiciones sin evaluación van como NaN; las jugadas que las tocan no cuentan.
+        """
+        game = len(self.games)
+        self.games.append((label, white, black))
+        ids = (self.player_id(white), self.player_id(black))
+        plies = len(evals) - 1
+        movers = (np.arange(plies) + (0 if white_moves_first else 1)) % 2 == 0
+        self._game.append(np.full(plies, game, dtype=np.int64))
+        self._player.append(np.where(movers, ids[0], ids[1]))
+        self._white.append(movers)
+        evals = np.asarray(evals, dtype=float)
+        self._before.append(evals[:-1])
+        self._after.append(evals[1:])
+
+    def arrays(self):
+        def join(parts, dtype):
+            return np.concatenate(parts).astype(dtype) if parts else np.zeros(0, dtype=dtype)
+        return (join(self._game, np.int64), join(self._player, np.int64), join(self._white, bool),
+                join(self._before, float), join(self._after, float))
+
+
+def move_metrics(white, before, after):
+    """Pérdida en centipeones, pérdida de probabilidad de ganar y precisión (0..100) de cada jugada"""
+    sign = np.where(white, 1.0, -1.0)
+    clipped_before = np.clip(before, -ACPL_LIMIT, ACPL_LIMIT)
+    clipped_after = np.clip(after, -ACPL_LIMIT, ACPL_LIMIT)
+    cp_loss = np.maximum(0.0, sign * (clipped_before - clipped_after))
+    win_loss = np.maximum(0.0, sign * (win_percent(before) - win_percent(after)))
+    # Fórmula de precisión por jugada de lichess sobre la caída de la probabilidad de ganar
+    accuracy = np.clip(103.1668 * np.exp(-0.04354 * win_loss) - 3.1669, 0, 100)
+    return cp_loss, win_loss, accuracy
+
+
+def aggregate(keys, count, cp_loss, win_loss, accuracy):
+    """Sumar por clave (partida*2+color o jugador) sin bucles de Python"""
+    def total(values):
+        return np.bincount(keys, weights=values, minlength=count)
+
+    moves = np.bincount(keys, minlength=count)
+    safe = np.maximum(moves, 1)
+    return {
+        "moves": moves,
+        "acpl": total(cp_loss) / safe,
+        "accuracy": total(accuracy) / safe,
+        "inaccuracies": total((win_loss >= INACCURACY) & (win_loss < MISTAKE)).astype(np.int64),
+        "mistakes": total((win_loss >= MISTAKE) & (win_loss < BLUNDER)).astype(np.int64),
+        "blunders": total(win_loss >= BLUNDER).astype(np.int64),
+    }
+
+
+def report(table):
+    """Estadísticas por jugador y por partida y color; devuelve (por_jugador, por_partida)"""
+    game, player, white, before, after = table.arrays()
+    valid = ~np.isnan(before) & ~np.isnan(after)
+    game, player, white, before, after = game[valid], player[valid], white[valid], before[valid], after[valid]
+    cp_loss, win_loss, accuracy = move_metrics(white, before, after)
+
+    by_player = aggregate(player, len(table.players), cp_loss, win_loss, accuracy)
+    # Fila 2*partida para las blancas y 2*partida+1 para las negras
+    by_game = aggregate(game * 2 + ~white, 2 * len(table.games), cp_loss, win_loss, accuracy)
+    return by_player, by_game
+
+
+def load_pgn(path, table=None):
+    """Leer las evaluaciones [%eval] de un PGN anotado"""
+    table = table or PlyTable()
+    with open(path, encoding="utf-8", errors="replace") as f:
+        while True:
+            game = chess.pgn.read_game(f)
+            if game is None:
+                break
+            evals = [score_to_cp(game.eval())] + [score_to_cp(node.eval()) for node in game.mainline()]
+            headers = game.headers
+            label = f"{headers.get('White', '?')} - {headers.get('Black', '?')} {headers.get('Date', '')}".strip()
+            table.add_game(label, headers.get("White", "?"), headers.get("Black", "?"), evals,
+                           game.board().turn == chess.WHITE)
+    return table
+
+
+def load_store(result_store, table=None):
+    """Leer las evaluaciones de las jugadas guardadas en la base de datos durante las partidas
+
+    Cada jugada guarda la evaluación del que mueve antes de mover, así que la evaluación de una
+    posición sale de la jugada que se hizo en ella.
+    """
+    table = table or PlyTable()
+    names = dict(result_store.query("SELECT id, name FROM engines"))
+    games = result_store.query("SELECT id, white_id, black_id, start_fen, plies FROM games ORDER BY id")
+    rows = result_store.query("SELECT game_id, ply, score_cp, mate FROM moves ORDER BY game_id, ply")
+
+    by_game = {}
+    for game_id, ply, score_cp, mate in rows:
+        if mate is not None:
+            cp = CP_LIMIT if mate > 0 else -CP_LIMIT
+        else:
+            cp = np.nan if score_cp is None else max(-CP_LIMIT, min(CP_LIMIT, score_cp))
+        by_game.setdefault(game_id, []).append((ply, cp))
+
+    for game_id, white_id, black_id, start_fen, plies in games:
+        moves = by_game.get(game_id)
+        if not moves:
+            continue
+        # La jugada ply se hizo en la posición ply - 1; las que no se guardaron quedan como NaN
+        played = np.array([ply for ply, _ in moves])
+        scores = np.full(max(plies or 0, played.max()), np.nan)
+        scores[played - 1] = [cp for _, cp in moves]
+        white_first = start_fen is None or chess.Board(start_fen).turn == chess.WHITE
+        # De la evaluación del que mueve a la de las blancas; la posición final no tiene evaluación
+        signs = np.where((np.arange(len(scores)) % 2 == 0) == white_first, 1.0, -1.0)
+        evals = np.append(scores * signs, np.nan)
+        table.add_game(f"Partida {game_id}", names[white_id], names[black_id], evals, white_first)
+    return table
+
+
+def format_player_report(table, by_player):
+    lines = [f"{'Jugador':<24} {'Jugadas':>8} {'ACPL':>7} {'Precisión':>10} {'Impr.':>6} {'Errores':>8} {'Graves':>7}"]
+    for index in np.argsort(-by_player["accuracy"]):
+        lines.append(
+            f"{table.players[index]:<24} {by_player['moves'][index]:>8} {by_player['acpl'][index]:>7.1f} "
+            f"{by_player['accuracy'][index]:>9.1f}% {by_player['inaccuracies'][index]:>6} "
+            f"{by_player['mistakes'][index]:>8} {by_player['blunders'][index]:>7}"
+        )
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="ACPL, precisión y errores graves por motor y por partida")
+    parser.add_argument("--pgn", action="append", default=[], help="PGN anotado con [%%eval]")
+    parser.add_argument("--db", help="Base de datos SQLite de resultados")
+    parser.add_argument("--games", action="store_true", help="Mostrar también cada partida")
+    args = parser.parse_args()
+
+    table = PlyTable()
+    for path in args.pgn:
+        load_pgn(path, table)
+    if args.db:
+        result_store = ResultStore(args.db)
+        load_store(result_store, table)
+        result_store.close()
+
+    by_player, by_game = report(table)
+    print(format_player_report(table, by_player))
+    if args.games:
+        def side(name, row):
+            if not by_game["moves"][row]:
+                return f"{name} -"
+            return (f"{name} {by_game['accuracy'][row]:.1f}% (ACPL {by_game['acpl'][row]:.0f}, "
+                    f"{by_game['blunders'][row]} graves)")
+
+        for game, (label, white, black) in enumerate(table.games):
+            print(f"{label}: {side(white, 2 * game)} | {side(black, 2 * game + 1)}")
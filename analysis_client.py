@@ -0,0 +1,93 @@
+import json
+import urllib.parse
+import urllib.request
+
+import chess
+import chess.engine
+
+
+def info_to_json(board, info):
+    """Resultado de analyse() como JSON: evaluación desde el punto de vista del que mueve"""
+    score = info["score"].pov(board.turn)
+    pv = [move.uci() for move in info.get("pv", [])]
+    return {
+        "fen": board.fen(),
+        "bestmove": pv[0] if pv else None,
+        "pv": pv,
+        "score": {"mate": score.mate()} if score.is_mate() else {"cp": score.score()},
+        "depth": info.get("depth"),
+        "nodes": info.get("nodes"),
+    }
+
+
+def json_to_info(board, data):
+    """Lo contrario de info_to_json, con los tipos de chess.engine"""
+    score = data["score"]
+    relative = chess.engine.Mate(score["mate"]) if "mate" in score else chess.engine.Cp(score["cp"])
+    info = {
+        "score": chess.engine.PovScore(relative, board.turn),
+        "pv": [chess.Move.from_uci(move) for move in data["pv"]],
+    }
+    for key in ("depth", "nodes"):
+        if data.get(key) is not None:
+            info[key] = data[key]
+    return info
+
+
+class AnalysisClient:
+    """Jugador que pide sus jugadas al servicio, con la interfaz play()/analyse() de los motores"""
+
+    protocol = "service"
+
+    def __init__(self, name, url, priority=0):
+        self.name = name
+        self.url = url.rstrip("/")
+        self.command = self.url
+        self.priority = priority
+        self.options = {"url": self.url}
+        self.version = None
+
+    def analyse(self, board, limit, multipv=None, root_moves=None, history=False, **kwargs):
+        """Pedir un análisis al servicio; con multipv devuelve una lista de líneas como chess.engine
+
+        Con history se envían la posición inicial y las jugadas de la partida, para que el motor
+        vea las repeticiones; sin él solo la posición, y el servicio puede juntar peticiones iguales.
+        """
+        # info y game no cambian el resultado; cualquier otra opción no la entiende el servicio
+        unsupported = set(kwargs) - {"info", "game"}
+        if unsupported:
+            raise TypeError(f"El servicio de análisis no admite: {', '.join(sorted(unsupported))}")
+        if history and board.move_stack:
+            params = {"fen": board.root().fen(), "moves": " ".join(move.uci() for move in board.move_stack)}
+        else:
+            params = {"fen": board.fen()}
+        params["priority"] = self.priority
+        if multipv is not None:
+            params["multipv"] = multipv
+        if root_moves:
+            params["searchmoves"] = " ".join(move.uci() for move in root_moves)
+        # El reloj de la partida se traduce a tiempo por jugada, como hacen los motores
+        if limit.white_clock is not None or limit.black_clock is not None:
+            clock = limit.white_clock if board.turn == chess.WHITE else limit.black_clock
+            params["time"] = max(0.01, clock / (limit.remaining_moves or 30))
+        for key in ("depth", "nodes", "time"):
+            if getattr(limit, key) is not None:
+                params[key] = getattr(limit, key)
+        with urllib.request.urlopen(f"{self.url}/analyse?{urllib.parse.urlencode(params)}") as response:
+            data = json.load(response)
+        if "lines" in data:
+            return [{**json_to_info(board, line), "multipv": index} for index, line in enumerate(data["lines"], 1)]
+        return json_to_info(board, data)
+
+    def play(self, board, limit, info=chess.engine.INFO_NONE, **kwargs):
+        result = self.analyse(board, limit, history=True, **kwargs)
+        pv = result["pv"]
+        return chess.engine.PlayResult(pv[0] if pv else None, pv[1] if len(pv) > 1 else None,
+                                       result if info else {})
+
+    def status(self):
+        with urllib.request.urlopen(f"{self.url}/status") as response:
+            return json.load(response)
+
+    def quit(self):
+        pass
@@ -0,0 +1,196 @@
+import argparse
+import collections
+import concurrent.futures
+import itertools
+import json
+import queue
+import threading
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import chess
+import chess.engine
+import chess.polyglot
+
+from analysis_client import info_to_json
+from engine_pool import EnginePool
+
+DEFAULT_PORT = 8765
+
+
+def limit_key(limit):
+    return (limit.depth, limit.nodes, limit.time)
+
+
+class AnalysisService:
+    """Cola de análisis delante de un grupo de motores, compartida por varios clientes
+
+    Las peticiones iguales (misma posición Zobrist y mismo límite) que llegan a la vez se resuelven
+    con un único análisis; los resultados quedan en una caché LRU y la cola atiende antes las
+    peticiones de más prioridad.
+    """
+
+    def __init__(self, pool, cache_size=100_000):
+        self.pool = pool
+        self.cache_size = cache_size
+        self.cache = collections.OrderedDict()
+        self.in_flight = {}
+        self.queue = queue.PriorityQueue()
+        self.order = itertools.count()
+        self.lock = threading.Lock()
+        self.stats = collections.Counter()
+        # Un hilo por motor: la prioridad se decide aquí y no en la cola FIFO del grupo
+        self.workers = [threading.Thread(target=self._work, daemon=True) for _ in range(len(pool))]
+        for worker in self.workers:
+            worker.start()
+
+    def request(self, board, limit, priority=0, multipv=None, root_moves=None, history=False):
+        """Pedir un análisis; devuelve (Future con el resultado de analyse(), origen)
+
+        Con history el tablero trae las jugadas de la partida y la clave incluye las posteriores al
+        último movimiento irreversible (las únicas que pueden repetirse); sin él basta la posición.
+        """
+        moves = tuple(board.move_stack[max(0, len(board.move_stack) - board.halfmove_clock):]) if history else ()
+        key = (
+            chess.polyglot.zobrist_hash(board), limit_key(limit), multipv,
+            frozenset(root_moves) if root_moves else None, moves,
+        )
+        with self.lock:
+            self.stats["requests"] += 1
+            if key in self.cache:
+                self.cache.move_to_end(key)
+                self.stats["cache_hits"] += 1
+                future = concurrent.futures.Future()
+                future.set_result(self.cache[key])
+                return future, "cache"
+            if key in self.in_flight:
+                self.stats["coalesced"] += 1
+                return self.in_flight[key], "coalesced"
+            future = concurrent.futures.Future()
+            self.in_flight[key] = future
+        # Las prioridades altas salen antes; a igual prioridad, por orden de llegada
+        self.queue.put((-priority, next(self.order), key, board.copy(), (limit, multipv, root_moves)))
+        return future, "engine"
+
+    def _work(self):
+        while True:
+            _, _, key, board, request = self.queue.get()
+            if key is None:
+                break
+            limit, multipv, root_moves = request
+            try:
+                info = self.pool.analyse(board, limit, multipv=multipv, root_moves=root_moves).result()
+            except Exception as error:
+                with self.lock:
+                    future = self.in_flight.pop(key)
+                future.set_exception(error)
+                continue
+            with self.lock:
+                self.stats["analysed"] += 1
+                self.cache[key] = info
+                if len(self.cache) > self.cache_size:
+                    self.cache.popitem(last=False)
+                future = self.in_flight.pop(key)
+            future.set_result(info)
+
+    def status(self):
+        with self.lock:
+            return {
+                "engines": len(self.pool),
+                "queue_depth": self.queue.qsize(),
+                "in_flight": len(self.in_flight),
+                "cache_size": len(self.cache),
+                **self.stats,
+            }
+
+    def close(self):
+        for _ in self.workers:
+            # Detrás de cualquier petición pendiente
+            self.queue.put((float("inf"), next(self.order), None, None, None))
+        for worker in self.workers:
+            worker.join()
+
+
+def make_handler(service):
+    class Handler(BaseHTTPRequestHandler):
+        """GET /analyse?fen=...&depth=...&nodes=...&time=...&priority=... y GET /status
+
+        En /analyse también: moves (jugadas UCI desde fen, separadas por espacios), multipv y
+        searchmoves (jugadas de la raíz que se consideran).
+        """
+
+        def reply(self, code, data):
+            body = json.dumps(data).encode()
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            url = urllib.parse.urlparse(self.path)
+            params = dict(urllib.parse.parse_qsl(url.query))
+            if url.path == "/status":
+                self.reply(200, service.status())
+            elif url.path == "/analyse":
+                try:
+                    board = chess.Board(params.get("fen", chess.STARTING_FEN))
+                    for uci in params.get("moves", "").split():
+                        board.push_uci(uci)
+                    root_moves = [board.parse_uci(uci) for uci in params.get("searchmoves", "").split()] or None
+                    multipv = int(params["multipv"]) if "multipv" in params else None
+                    limit = chess.engine.Limit(
+                        depth=int(params["depth"]) if "depth" in params else None,
+                        nodes=int(params["nodes"]) if "nodes" in params else None,
+                        time=float(params["time"]) if "time" in params else None,
+                    )
+                    priority = int(params.get("priority", 0))
+                except ValueError as error:
+                    self.reply(400, {"error": str(error)})
+                    return
+                if not (limit.depth or limit.nodes or limit.time):
+                    self.reply(400, {"error": "Falta depth, nodes o time"})
+                    return
+                if board.is_game_over():
+                    self.reply(400, {"error": "La partida ya ha terminado en esta posición"})
+                    return
+                future, source = service.request(board, limit, priority, multipv, root_moves, "moves" in params)
+                try:
+                    info = future.result()
+                except Exception as error:
+                    self.reply(500, {"error": str(error)})
+                    return
+                if isinstance(info, list):
+                    self.reply(200, {"lines": [info_to_json(board, line) for line in info], "source": source})
+                else:
+                    self.reply(200, {**info_to_json(board, info), "source": source})
+            else:
+                self.reply(404, {"error": "Ruta desconocida"})
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Servicio local de análisis compartido por varias herramientas")
+    parser.add_argument("--engine", action="append", required=True, help="Motor como nombre=comando (repetible)")
+    parser.add_argument("--workers", type=int, default=1, help="Copias del motor si solo se da uno")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--cache-size", type=int, default=100_000, help="Análisis guardados en la caché")
+    args = parser.parse_args()
+
+    pool = EnginePool(args.engine, args.workers)
+    service = AnalysisService(pool, args.cache_size)
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(service))
+    print(f"Servicio de análisis en http://{args.host}:{args.port} con {len(pool)} motores")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("Servicio detenido")
+    finally:
+        server.server_close()
+        service.close()
+        pool.close()
@@ -0,0 +1,145 @@
+import argparse
+import collections
+
+import chess
+import chess.engine
+import chess.pgn
+
+from engine_pool import EnginePool
+from engine_watchdog import ENGINE_ERRORS
+from game_board import GameBoard
+
+# Pérdida mínima (centipeones, desde el punto de vista del que mueve) para cada marca
+NAG_THRESHOLDS = [(300, chess.pgn.NAG_BLUNDER), (100, chess.pgn.NAG_MISTAKE), (50, chess.pgn.NAG_DUBIOUS_MOVE)]
+MATE_SCORE = 1000
+
+
+def final_score(board):
+    """Evaluación de una posición terminada, sin preguntar al motor"""
+    if board.is_checkmate():
+        return chess.engine.PovScore(chess.engine.Mate(0), board.turn)
+    return chess.engine.PovScore(chess.engine.Cp(0), board.turn)
+
+
+def move_nag(before, after):
+    """Marca de una jugada según lo que pierde: before y after son PovScore antes y después de ella"""
+    mover = before.turn
+    loss = before.pov(mover).score(mate_score=MATE_SCORE) - after.pov(mover).score(mate_score=MATE_SCORE)
+    for threshold, nag in NAG_THRESHOLDS:
+        if loss >= threshold:
+            return nag
+    return None
+
+
+class Annotator:
+    """Analizar partidas con un grupo de motores y anotar evaluación, mejor jugada y marcas ?! ? ??
+
+    Las posiciones de varias partidas se reparten a la vez entre los motores; las repetidas
+    (también entre partidas distintas) se analizan una sola vez gracias a una caché acotada.
+    """
+
+    def __init__(self, pool, limit, cache_size=200_000):
+        self.pool = pool
+        self.limit = limit
+        self.cache_size = cache_size
+        self.cache = collections.OrderedDict()
+
+    def _analyse(self, board):
+        key = board.zobrist_key()
+        future = self.cache.get(key)
+        if future is None:
+            future = self.pool.analyse(board.copy(stack=False), self.limit)
+            self.cache[key] = future
+            if len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+        else:
+            self.cache.move_to_end(key)
+        return future
+
+    def submit(self, game):
+        """Encolar el análisis de todas las posiciones de la partida (incluida la final)"""
+        board = GameBoard(game.board().fen(), chess960=game.board().chess960)
+        futures = []
+        for move in game.mainline_moves():
+            futures.append(self._analyse(board))
+            board.push(move)
+        futures.append(final_score(board) if board.is_game_over() else self._analyse(board))
+        return futures
+
+    def finish(self, game, futures):
+        """Esperar los análisis de la partida y escribir los comentarios; devuelve la partida"""
+        infos = []
+        for future in futures:
+            if isinstance(future, chess.engine.PovScore):
+                infos.append({"score": future})
+                continue
+            # Un análisis fallido deja sin anotar solo las jugadas que dependen de él
+            try:
+                info = future.result()
+            except ENGINE_ERRORS:
+                info = None
+            infos.append(info if info and info.get("score") is not None else None)
+
+        # La evaluación de la posición inicial va en el comentario de la partida
+        if infos[0]:
+            game.set_eval(infos[0]["score"], infos[0].get("depth"))
+        board = game.board()
+        for ply, child in enumerate(game.mainline()):
+            before, after = infos[ply], infos[ply + 1]
+            if after:
+                child.set_eval(after["score"], after.get("depth"))
+            if before and after:
+                nag = move_nag(before["score"], after["score"])
+                if nag:
+                    child.nags.add(nag)
+            best = (before.get("pv") or [None])[0] if before else None
+            if best is not None and best != child.move:
+                child.comment = f"{child.comment} Mejor: {board.san(best)}".strip()
+            board.push(child.move)
+        return game
+
+    def annotate(self, games, window=8):
+        """Anotar un iterable de partidas, generándolas en orden con window partidas en vuelo"""
+        pending = collections.deque()
+        for game in games:
+            pending.append((game, self.submit(game)))
+            if len(pending) >= window:
+                yield self.finish(*pending.popleft())
+        while pending:
+            yield self.finish(*pending.popleft())
+
+
+def read_games(path):
+    with open(path, encoding="utf-8", errors="replace") as f:
+        while True:
+            game = chess.pgn.read_game(f)
+            if game is None:
+                break
+            yield game
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Anotar partidas PGN con un grupo de motores")
+    parser.add_argument("pgn")
+    parser.add_argument("output")
+    parser.add_argument("--engine", action="append", required=True, help="Motor como nombre=comando (repetible)")
+    parser.add_argument("--workers", type=int, default=1, help="Copias del motor si solo se da uno")
+    parser.add_argument("--depth", type=int)
+    parser.add_argument("--nodes", type=int)
+    parser.add_argument("--window", type=int, default=8, help="Partidas analizándose a la vez")
+    args = parser.parse_args()
+
+    limit = chess.engine.Limit(depth=args.depth, nodes=args.nodes)
+    if not (args.depth or args.nodes):
+        limit = chess.engine.Limit(depth=12)
+
+    pool = EnginePool(args.engine, args.workers)
+    try:
+        with open(args.output, "w", encoding="utf-8") as output:
+            for count, game in enumerate(Annotator(pool, limit).annotate(read_games(args.pgn), args.window), 1):
+                print(game, file=output, end="\n\n")
+                print(f"Partida {count} anotada")
+    except KeyboardInterrupt:
+        print("Anotación interrumpida")
+    finally:
+        pool.close()
@@ -0,0 +1,156 @@
+import chess
+import numpy as np
+
+from builtin_engine import KING_ENDGAME_VALUES, SQUARE_VALUES
+
+# Orden de los planos: peón, caballo, alfil, torre, dama y rey blancos, luego los negros
+PLANE_ORDER = [(color, piece_type) for color in (chess.WHITE, chess.BLACK) for piece_type in chess.PIECE_TYPES]
+
+# Peso de cada casilla alcanzable por caballos, alfiles, torres y damas (centipeones)
+MOBILITY_WEIGHT = 2
+
+
+def _plane_tables():
+    # Material más tabla de casillas por plano (las piezas negras restan); los reyes aparte,
+    # porque su tabla cambia en el final
+    pieces = np.zeros((12, 64), dtype=np.float32)
+    middlegame_kings = np.zeros((12, 64), dtype=np.float32)
+    endgame_kings = np.zeros((12, 64), dtype=np.float32)
+    for plane, (color, piece_type) in enumerate(PLANE_ORDER):
+        sign = 1 if color == chess.WHITE else -1
+        side = 0 if color == chess.WHITE else 1
+        target = middlegame_kings if piece_type == chess.KING else pieces
+        target[plane] = np.multiply(sign, SQUARE_VALUES[piece_type][side])
+        if piece_type == chess.KING:
+            endgame_kings[plane] = np.multiply(sign, KING_ENDGAME_VALUES[side])
+    return pieces.reshape(-1), middlegame_kings.reshape(-1), endgame_kings.reshape(-1)
+
+
+PLANE_TABLE, MIDDLEGAME_KING_TABLE, ENDGAME_KING_TABLE = _plane_tables()
+
+NOT_FILE_A = np.uint64(~chess.BB_FILE_A & chess.BB_ALL)
+NOT_FILE_H = np.uint64(~chess.BB_FILE_H & chess.BB_ALL)
+NOT_FILE_AB = np.uint64(~(chess.BB_FILE_A | chess.BB_FILE_B) & chess.BB_ALL)
+NOT_FILE_GH = np.uint64(~(chess.BB_FILE_G | chess.BB_FILE_H) & chess.BB_ALL)
+ALL = np.uint64(chess.BB_ALL)
+
+# Direcciones de las piezas deslizantes: desplazamiento y máscara contra el salto de columna
+ORTHOGONAL = [(8, ALL), (-8, ALL), (1, NOT_FILE_A), (-1, NOT_FILE_H)]
+DIAGONAL = [(9, NOT_FILE_A), (7, NOT_FILE_H), (-7, NOT_FILE_A), (-9, NOT_FILE_H)]
+
+_BYTE_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def popcount(bitboards):
+    """Número de bits a uno de cada entero de 64 bits"""
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(bitboards)
+    return _BYTE_POPCOUNT[bitboards.view(np.uint8)].reshape(bitboards.shape + (8,)).sum(axis=-1)
+
+
+def _shift(bitboards, amount):
+    if amount > 0:
+        return np.left_shift(bitboards, np.uint64(amount))
+    return np.right_shift(bitboards, np.uint64(-amount))
+
+
+def slider_attacks(pieces, empty, directions):
+    """Casillas atacadas por piezas deslizantes (relleno Kogge-Stone sobre todos los tableros a la vez)"""
+    attacks = np.zeros_like(pieces)
+    for amount, wrap in directions:
+        generator = pieces.copy()
+        propagator = empty & wrap
+        generator |= propagator & _shift(generator, amount)
+        propagator &= _shift(propagator, amount)
+        generator |= propagator & _shift(generator, 2 * amount)
+        propagator &= _shift(propagator, 2 * amount)
+        generator |= propagator & _shift(generator, 4 * amount)
+        attacks |= _shift(generator, amount) & wrap
+    return attacks
+
+
+def knight_attacks(knights):
+    attacks = (_shift(knights, 17) | _shift(knights, -15)) & NOT_FILE_A
+    attacks |= (_shift(knights, 15) | _shift(knights, -17)) & NOT_FILE_H
+    attacks |= (_shift(knights, 10) | _shift(knights, -6)) & NOT_FILE_AB
+    attacks |= (_shift(knights, 6) | _shift(knights, -10)) & NOT_FILE_GH
+    return attacks
+
+
+def encode_boards(boards):
+    """Convertir tableros en un arreglo (N, 12) de bitboards uint64 y otro (N,) con el turno"""
+    rows = []
+    turns = []
+    for board in boards:
+        white = board.occupied_co[chess.WHITE]
+        black = board.occupied_co[chess.BLACK]
+        pawns, knights, bishops = board.pawns, board.knights, board.bishops
+        rooks, queens, kings = board.rooks, board.queens, board.kings
+        rows.append((
+            pawns & white, knights & white, bishops & white, rooks & white, queens & white, kings & white,
+            pawns & black, knights & black, bishops & black, rooks & black, queens & black, kings & black,
+        ))
+        turns.append(board.turn)
+    return np.array(rows, dtype=np.uint64).reshape(-1, 12), np.array(turns, dtype=bool)
+
+
+def piece_planes(bitboards):
+    """Planos (N, 12, 64) de 0/1 a partir de los bitboards; el bit i es la casilla i"""
+    packed = np.ascontiguousarray(bitboards, dtype="<u8").view(np.uint8)
+    return np.unpackbits(packed, axis=-1, bitorder="little").reshape(len(bitboards), 12, 64)
+
+
+def mobility(bitboards):
+    """Casillas alcanzables (sin propias) por caballos, alfiles/damas y torres/damas de cada bando: (N, 2)"""
+    white = np.bitwise_or.reduce(bitboards[:, :6], axis=1)
+    black = np.bitwise_or.reduce(bitboards[:, 6:], axis=1)
+    empty = ~(white | black)
+
+    result = np.empty((len(bitboards), 2), dtype=np.int32)
+    for side, (offset, own) in enumerate(((0, white), (6, black))):
+        knights = bitboards[:, offset + 1]
+        diagonal = bitboards[:, offset + 2] | bitboards[:, offset + 4]
+        orthogonal = bitboards[:, offset + 3] | bitboards[:, offset + 4]
+        result[:, side] = (
+            popcount(knight_attacks(knights) & ~own)
+            + popcount(slider_attacks(diagonal, empty, DIAGONAL) & ~own)
+            + popcount(slider_attacks(orthogonal, empty, ORTHOGONAL) & ~own)
+        )
+    return result
+
+
+def evaluate_bitboards(bitboards, turns=None, mobility_weight=MOBILITY_WEIGHT):
+    """Evaluar un lote de posiciones: material, tablas de casillas y movilidad
+
+    Devuelve centipeones desde el punto de vista de las blancas, o del bando que mueve si se dan los turnos.
+    La parte de material y casillas coincide con builtin_engine.evaluate().
+    """
+    planes = piece_planes(bitboards).reshape(len(bitboards), -1).astype(np.float32)
+    score = planes @ PLANE_TABLE
+
+    # Rey de medio juego o de final según queden damas
+    endgame = (bitboards[:, 4] | bitboards[:, 10]) == 0
+    score += np.where(endgame, planes @ ENDGAME_KING_TABLE, planes @ MIDDLEGAME_KING_TABLE)
+
+    if mobility_weight:
+        moves = mobility(bitboards)
+        score += mobility_weight * (moves[:, 0] - moves[:, 1])
+
+    score = np.rint(score).astype(np.int32)
+    if turns is not None:
+        score = np.where(turns, score, -score)
+    return score
+
+
+def evaluate_boards(boards, batch_size=65536, relative=False, mobility_weight=MOBILITY_WEIGHT):
+    """Evaluar un iterable de tableros por lotes; genera un arreglo de evaluaciones por lote"""
+    batch = []
+    for board in boards:
+        batch.append(board)
+        if len(batch) == batch_size:
+            bitboards, turns = encode_boards(batch)
+            yield evaluate_bitboards(bitboards, turns if relative else None, mobility_weight)
+            batch = []
+    if batch:
+        bitboards, turns = encode_boards(batch)
+        yield evaluate_bitboards(bitboards, turns if relative else None, mobility_weight)
@@ -0,0 +1,522 @@
+import time
+
+import chess
+import chess.engine
+
+from game_board import GameBoard
+
+MATE_SCORE = 100000
+MATE_THRESHOLD = MATE_SCORE - 1000
+INFINITY = MATE_SCORE + 1
+
+# Valor de las piezas (centipeones)
+PIECE_VALUES = {
+    chess.PAWN: 100, chess.KNIGHT: 320, chess.BISHOP: 330,
+    chess.ROOK: 500, chess.QUEEN: 900, chess.KING: 0,
+}
+
+# Tablas de casillas desde el punto de vista de las blancas, de a8 a h1
+PIECE_SQUARE_TABLES = {
+    chess.PAWN: [
+        0, 0, 0, 0, 0, 0, 0, 0,
+        50, 50, 50, 50, 50, 50, 50, 50,
+        10, 10, 20, 30, 30, 20, 10, 10,
+        5, 5, 10, 25, 25, 10, 5, 5,
+        0, 0, 0, 20, 20, 0, 0, 0,
+        5, -5, -10, 0, 0, -10, -5, 5,
+        5, 10, 10, -20, -20, 10, 10, 5,
+        0, 0, 0, 0, 0, 0, 0, 0,
+    ],
+    chess.KNIGHT: [
+        -50, -40, -30, -30, -30, -30, -40, -50,
+        -40, -20, 0, 0, 0, 0, -20, -40,
+        -30, 0, 10, 15, 15, 10, 0, -30,
+        -30, 5, 15, 20, 20, 15, 5, -30,
+        -30, 0, 15, 20, 20, 15, 0, -30,
+        -30, 5, 10, 15, 15, 10, 5, -30,
+        -40, -20, 0, 5, 5, 0, -20, -40,
+        -50, -40, -30, -30, -30, -30, -40, -50,
+    ],
+    chess.BISHOP: [
+        -20, -10, -10, -10, -10, -10, -10, -20,
+        -10, 0, 0, 0, 0, 0, 0, -10,
+        -10, 0, 5, 10, 10, 5, 0, -10,
+        -10, 5, 5, 10, 10, 5, 5, -10,
+        -10, 0, 10, 10, 10, 10, 0, -10,
+        -10, 10, 10, 10, 10, 10, 10, -10,
+        -10, 5, 0, 0, 0, 0, 5, -10,
+        -20, -10, -10, -10, -10, -10, -10, -20,
+    ],
+    chess.ROOK: [
+        0, 0, 0, 0, 0, 0, 0, 0,
+        5, 10, 10, 10, 10, 10, 10, 5,
+        -5, 0, 0, 0, 0, 0, 0, -5,
+        -5, 0, 0, 0, 0, 0, 0, -5,
+        -5, 0, 0, 0, 0, 0, 0, -5,
+        -5, 0, 0, 0, 0, 0, 0, -5,
+        -5, 0, 0, 0, 0, 0, 0, -5,
+        0, 0, 0, 5, 5, 0, 0, 0,
+    ],
+    chess.QUEEN: [
+        -20, -10, -10, -5, -5, -10, -10, -20,
+        -10, 0, 0, 0, 0, 0, 0, -10,
+        -10, 0, 5, 5, 5, 5, 0, -10,
+        -5, 0, 5, 5, 5, 5, 0, -5,
+        0, 0, 5, 5, 5, 5, 0, -5,
+        -10, 5, 5, 5, 5, 5, 0, -10,
+        -10, 0, 5, 0, 0, 0, 0, -10,
+        -20, -10, -10, -5, -5, -10, -10, -20,
+    ],
+    chess.KING: [
+        -30, -40, -40, -50, -50, -40, -40, -30,
+        -30, -40, -40, -50, -50, -40, -40, -30,
+        -30, -40, -40, -50, -50, -40, -40, -30,
+        -30, -40, -40, -50, -50, -40, -40, -30,
+        -20, -30, -30, -40, -40, -30, -30, -20,
+        -10, -20, -20, -20, -20, -20, -20, -10,
+        20, 20, 0, 0, 0, 0, 20, 20,
+        20, 30, 10, 0, 0, 10, 30, 20,
+    ],
+}
+
+# Rey en el final: centralizarse
+KING_ENDGAME_TABLE = [
+    -50, -40, -30, -20, -20, -30, -40, -50,
+    -30, -20, -10, 0, 0, -10, -20, -30,
+    -30, -10, 20, 30, 30, 20, -10, -30,
+    -30, -10, 30, 40, 40, 30, -10, -30,
+    -30, -10, 30, 40, 40, 30, -10, -30,
+    -30, -10, 20, 30, 30, 20, -10, -30,
+    -30, -30, 0, 0, 0, 0, -30, -30,
+    -50, -30, -30, -30, -30, -30, -30, -50,
+]
+
+
+def _square_tables(table, value):
+    # Valor de la pieza más la tabla, indexado por casilla para cada color
+    white = [value + table[square ^ 56] for square in chess.SQUARES]
+    black = [value + table[square] for square in chess.SQUARES]
+    return white, black
+
+
+SQUARE_VALUES = {
+    piece_type: _square_tables(table, PIECE_VALUES[piece_type])
+    for piece_type, table in PIECE_SQUARE_TABLES.items()
+}
+KING_ENDGAME_VALUES = _square_tables(KING_ENDGAME_TABLE, 0)
+
+
+def evaluate(board):
+    """Evaluación estática (material y tablas de casillas) desde el punto de vista del bando que mueve"""
+    white = board.occupied_co[chess.WHITE]
+    black = board.occupied_co[chess.BLACK]
+    endgame = not board.queens
+
+    score = 0
+    for piece_type, pieces in (
+        (chess.PAWN, board.pawns), (chess.KNIGHT, board.knights), (chess.BISHOP, board.bishops),
+        (chess.ROOK, board.rooks), (chess.QUEEN, board.queens), (chess.KING, board.kings),
+    ):
+        if piece_type == chess.KING and endgame:
+            white_values, black_values = KING_ENDGAME_VALUES
+        else:
+            white_values, black_values = SQUARE_VALUES[piece_type]
+        for square in chess.scan_forward(pieces & white):
+            score += white_values[square]
+        for square in chess.scan_forward(pieces & black):
+            score -= black_values[square]
+
+    return score if board.turn == chess.WHITE else -score
+
+
+# Tipos de entrada en la tabla de transposición
+EXACT, LOWER, UPPER = 0, 1, 2
+
+# Reducción de la búsqueda tras pasar el turno (movimiento nulo)
+NULL_MOVE_REDUCTION = 2
+# Margen de la poda delta en la quiescencia (centipeones)
+DELTA_MARGIN = 200
+
+
+def pack_move(move):
+    """Codificar un movimiento en 15 bits: origen, destino y coronación"""
+    return move.from_square | move.to_square << 6 | (move.promotion or 0) << 12
+
+
+def unpack_move(code):
+    promotion = code >> 12
+    return chess.Move(code & 63, (code >> 6) & 63, promotion or None)
+
+
+class TranspositionTable:
+    """Tabla de transposición de tamaño fijo en cubos de dos entradas de 64+64 bits
+
+    La primera entrada de cada cubo se reemplaza solo por búsquedas al menos igual de profundas
+    y la segunda siempre. La clave se guarda como clave ^ datos, así una entrada a medio escribir
+    por otro proceso (memoria compartida, sin bloqueos) simplemente no coincide.
+    """
+
+    def __init__(self, size_mb=16, buffer=None):
+        self.size = self.bytes_for(size_mb)
+        self.mask = self.size // 32 - 1
+        self.buffer = buffer if buffer is not None else bytearray(self.size)
+        self.table = memoryview(self.buffer)[:self.size].cast("Q")
+
+    @staticmethod
+    def bytes_for(size_mb):
+        """Tamaño en bytes de la tabla: la mayor potencia de dos de cubos que cabe en size_mb"""
+        buckets = 1
+        while buckets * 2 * 32 <= size_mb * 1024 * 1024:
+            buckets *= 2
+        return buckets * 32
+
+    def clear(self):
+        self.table[:] = memoryview(bytes(self.size)).cast("Q")
+
+    def probe(self, key):
+        """Devolver (movimiento, profundidad, evaluación, tipo) o None"""
+        index = (key & self.mask) << 2
+        table = self.table
+        for slot in (index, index + 2):
+            data = table[slot + 1]
+            if table[slot] ^ data == key:
+                move = data & 0x7FFF
+                return (
+                    unpack_move(move) if move else None,
+                    (data >> 17) & 0xFF,
+                    (data >> 32) - 0x80000000,
+                    (data >> 15) & 3,
+                )
+        return None
+
+    def store(self, key, move, depth, score, flag):
+        index = (key & self.mask) << 2
+        table = self.table
+        depth = min(depth, 255)
+        data = (score + 0x80000000) << 32 | depth << 17 | flag << 15 | (pack_move(move) if move else 0)
+
+        # Entrada preferida por profundidad; si no se puede, la de reemplazo siempre
+        stored = table[index + 1]
+        if table[index] ^ stored == key or depth >= (stored >> 17) & 0xFF:
+            slot = index
+        else:
+            slot = index + 2
+        table[slot] = key ^ data
+        table[slot + 1] = data
+
+
+class SearchTimeout(Exception):
+    pass
+
+
+class Searcher:
+    """Búsqueda alfa-beta (PVS y movimiento nulo) con profundización iterativa, quiescencia y ordenación"""
+
+    def __init__(self, tt):
+        self.tt = tt
+        self.nodes = 0
+        self.deadline = None
+        self.max_nodes = None
+        self.stop = None
+        self.root_moves = None
+        self.root_best = None
+        self.finish_iteration = False
+        self.killers = [[None, None] for _ in range(128)]
+        self.history = [[0] * 64 for _ in range(64)]
+
+    def check_limits(self):
+        if self.finish_iteration:
+            return
+        if self.max_nodes is not None and self.nodes >= self.max_nodes:
+            raise SearchTimeout()
+        if self.deadline is not None and time.monotonic() >= self.deadline:
+            raise SearchTimeout()
+        if self.stop is not None and self.stop.value:
+            raise SearchTimeout()
+
+    def order_moves(self, board, moves, tt_move, ply):
+        killers = self.killers[ply] if ply < len(self.killers) else (None, None)
+        # Casillas donde un movimiento captura (la de al paso incluida), sin llamar a is_capture
+        targets = board.occupied_co[not board.turn]
+        if board.ep_square is not None:
+            targets |= chess.BB_SQUARES[board.ep_square]
+
+        def priority(move):
+            if move == tt_move:
+                return 1000000
+            if chess.BB_SQUARES[move.to_square] & targets:
+                # MVV-LVA: la víctima más valiosa con el atacante menos valioso
+                victim = board.piece_type_at(move.to_square) or chess.PAWN
+                attacker = board.piece_type_at(move.from_square)
+                return 100000 + 10 * PIECE_VALUES[victim] - PIECE_VALUES[attacker]
+            if move.promotion:
+                return 90000 + PIECE_VALUES[move.promotion]
+            if move == killers[0]:
+                return 80000
+            if move == killers[1]:
+                return 70000
+            return self.history[move.from_square][move.to_square]
+
+        return sorted(moves, key=priority, reverse=True)
+
+    def quiesce(self, board, alpha, beta, ply):
+        self.nodes += 1
+        if not self.nodes & 63:
+            self.check_limits()
+
+        stand_pat = evaluate(board)
+        if stand_pat >= beta:
+            return stand_pat
+        alpha = max(alpha, stand_pat)
+
+        captures = self.order_moves(board, list(board.generate_legal_captures()), None, ply)
+        for move in captures:
+            # Poda delta: ni ganando la pieza capturada se llega a alpha
+            victim = board.piece_type_at(move.to_square) or chess.PAWN
+            if not move.promotion and stand_pat + PIECE_VALUES[victim] + DELTA_MARGIN <= alpha:
+                continue
+            board.push(move)
+            score = -self.quiesce(board, -beta, -alpha, ply + 1)
+            board.pop()
+            if score >= beta:
+                return score
+            alpha = max(alpha, score)
+        return alpha
+
+    def negamax(self, board, depth, alpha, beta, ply):
+        self.nodes += 1
+        if not self.nodes & 63:
+            self.check_limits()
+
+        # Tablas por repetición, regla de 50 movimientos o material insuficiente
+        if ply and (board.is_repetition(2) or board.halfmove_clock >= 100 or board.is_insufficient_material()):
+            return 0
+
+        in_check = board.is_check()
+        if in_check:
+            depth += 1
+        if depth <= 0:
+            return self.quiesce(board, alpha, beta, ply)
+
+        key = board.zobrist_key()
+        tt_move = None
+        entry = self.tt.probe(key)
+        if entry:
+            tt_move, tt_depth, tt_score, tt_flag = entry
+            if tt_score > MATE_THRESHOLD:
+                tt_score -= ply
+            elif tt_score < -MATE_THRESHOLD:
+                tt_score += ply
+            if ply and tt_depth >= depth:
+                if tt_flag == EXACT:
+                    return tt_score
+                if tt_flag == LOWER and tt_score >= beta:
+                    return tt_score
+                if tt_flag == UPPER and tt_score <= alpha:
+                    return tt_score
+
+        # Movimiento nulo: si pasando el turno la búsqueda reducida sigue por encima de beta, se corta.
+        # Nunca dos seguidos, en jaque ni con solo peones (zugzwang)
+        if (ply and depth >= 3 and not in_check and board.move_stack[-1] and beta < MATE_THRESHOLD
+                and board.occupied_co[board.turn] & ~(board.pawns | board.kings)):
+            board.push(chess.Move.null())
+            score = -self.negamax(board, depth - 1 - NULL_MOVE_REDUCTION, -beta, -beta + 1, ply + 1)
+            board.pop()
+            if score >= beta:
+                return beta
+
+        moves = list(board.generate_legal_moves())
+        if not moves:
+            return -MATE_SCORE + ply if in_check else 0
+        if not ply and self.root_moves:
+            moves = [move for move in moves if move in self.root_moves]
+
+        alpha_orig = alpha
+        best_score = -INFINITY
+        best_move = None
+        for index, move in enumerate(self.order_moves(board, moves, tt_move, ply)):
+            board.push(move)
+            if not index:
+                score = -self.negamax(board, depth - 1, -beta, -alpha, ply + 1)
+            else:
+                # Búsqueda de variante principal: ventana nula y, si mejora alpha, búsqueda completa
+                score = -self.negamax(board, depth - 1, -alpha - 1, -alpha, ply + 1)
+                if alpha < score < beta:
+                    score = -self.negamax(board, depth - 1, -beta, -alpha, ply + 1)
+            board.pop()
+
+            if score > best_score:
+                best_score = score
+                best_move = move
+            if score > alpha:
+                alpha = score
+            if alpha >= beta:
+                if not board.is_capture(move) and ply < len(self.killers):
+                    if self.killers[ply][0] != move:
+                        self.killers[ply][1] = self.killers[ply][0]
+                        self.killers[ply][0] = move
+                    self.history[move.from_square][move.to_square] += depth * depth
+                break
+
+        if not ply:
+            self.root_best = best_move
+
+        # Las evaluaciones de mate se guardan relativas a esta posición
+        stored = best_score
+        if stored > MATE_THRESHOLD:
+            stored += ply
+        elif stored < -MATE_THRESHOLD:
+            stored -= ply
+        flag = UPPER if best_score <= alpha_orig else LOWER if best_score >= beta else EXACT
+        self.tt.store(key, best_move, depth, stored, flag)
+        return best_score
+
+    def principal_variation(self, board, depth):
+        """Seguir los mejores movimientos guardados en la tabla de transposición"""
+        pv = []
+        board = board.copy()
+        while len(pv) < depth:
+            entry = self.tt.probe(board.zobrist_key())
+            if not entry or not entry[0] or entry[0] not in board.legal_moves:
+                break
+            pv.append(entry[0])
+            board.push(entry[0])
+        return pv
+
+    def search(self, board, max_depth=64, deadline=None, max_nodes=None, soft_deadline=None, depths=None,
+               root_moves=None):
+        """Profundización iterativa; devuelve (movimiento, evaluación, profundidad, pv)
+
+        depths permite recorrer otra secuencia de profundidades (los ayudantes del Lazy SMP);
+        root_moves limita las jugadas que se consideran en la raíz.
+        """
+        self.nodes = 0
+        self.deadline = deadline
+        self.max_nodes = max_nodes
+        self.root_moves = root_moves
+        self.root_best = None
+        self.killers = [[None, None] for _ in range(128)]
+        root_length = len(board.move_stack)
+
+        best_move, best_score, completed, pv = None, 0, 0, []
+        for depth in depths or range(1, max_depth + 1):
+            # La profundidad 1 siempre termina, para no devolver una jugada cualquiera
+            self.finish_iteration = depth == 1
+            try:
+                score = self.negamax(board, depth, -INFINITY, INFINITY, 0)
+            except SearchTimeout:
+                while len(board.move_stack) > root_length:
+                    board.pop()
+                break
+
+            completed = depth
+            best_score = score
+            best_move = self.root_best
+            pv = self.principal_variation(board, depth)
+            # La entrada de la raíz en la tabla (compartida) puede haber sido reemplazada
+            if pv[:1] != [best_move]:
+                pv = [best_move] if best_move else []
+
+            # No empezar otra iteración que probablemente no termine
+            if abs(score) > MATE_THRESHOLD or (soft_deadline is not None and time.monotonic() >= soft_deadline):
+                break
+
+        return best_move, best_score, completed, pv
+
+
+def search_board(board):
+    """Copiar cualquier tablero a un GameBoard conservando el historial (para las repeticiones)"""
+    if isinstance(board, GameBoard):
+        return board.copy()
+    game_board = GameBoard(board.root().fen(), chess960=board.chess960)
+    for move in board.move_stack:
+        game_board.push(move)
+    return game_board
+
+
+def time_budget(board, limit):
+    """Segundos disponibles para esta jugada según el chess.engine.Limit (None si no hay límite de tiempo)"""
+    if limit.time is not None:
+        return limit.time
+    clock = limit.white_clock if board.turn == chess.WHITE else limit.black_clock
+    if clock is None:
+        return None
+    increment = (limit.white_inc if board.turn == chess.WHITE else limit.black_inc) or 0
+    moves_to_go = limit.remaining_moves or 30
+    return max(0.01, min(clock * 0.5, clock / moves_to_go + increment * 0.8))
+
+
+class BuiltinEngine:
+    """Motor de ajedrez en Python puro con la misma interfaz play()/analyse() que chess.engine"""
+
+    name = "Integrado"
+    version = "Chess-IA integrado 1.0"
+    command = None
+    protocol = "builtin"
+
+    def __init__(self, hash_mb=16):
+        self.options = {"Hash": hash_mb}
+        self.tt = TranspositionTable(hash_mb)
+        self.searcher = Searcher(self.tt)
+
+    def search(self, board, limit, start, root_moves=None):
+        """Buscar en la posición; devuelve (movimiento, evaluación, profundidad, pv, nodos)"""
+        budget = time_budget(board, limit)
+        deadline = start + budget if budget is not None else None
+        soft_deadline = start + budget * 0.5 if budget is not None else None
+
+        move, score, depth, pv = self.searcher.search(
+            search_board(board), max_depth=limit.depth or 64, deadline=deadline,
+            max_nodes=limit.nodes, soft_deadline=soft_deadline, root_moves=root_moves,
+        )
+        return move, score, depth, pv, self.searcher.nodes
+
+    def analyse(self, board, limit, multipv=None, root_moves=None, **kwargs):
+        """Buscar en la posición y devolver la información al estilo de chess.engine
+
+        Con multipv se devuelve una lista de líneas: cada una se busca con el mismo límite
+        sin las jugadas de raíz de las anteriores.
+        """
+        if not multipv:
+            return self._analyse(board, limit, root_moves)
+        remaining = list(root_moves or board.legal_moves)
+        infos = []
+        while remaining and len(infos) < multipv:
+            info = self._analyse(board, limit, remaining)
+            info["multipv"] = len(infos) + 1
+            infos.append(info)
+            if not info["pv"] or info["pv"][0] not in remaining:
+                break
+            remaining.remove(info["pv"][0])
+        return infos
+
+    def _analyse(self, board, limit, root_moves):
+        start = time.monotonic()
+        move, score, depth, pv, nodes = self.search(board, limit, start, root_moves)
+
+        if score > MATE_THRESHOLD:
+            pov = chess.engine.Mate((MATE_SCORE - score + 1) // 2)
+        elif score < -MATE_THRESHOLD:
+            pov = chess.engine.Mate(-((MATE_SCORE + score + 1) // 2))
+        else:
+            pov = chess.engine.Cp(score)
+
+        elapsed = time.monotonic() - start
+        return {
+            "score": chess.engine.PovScore(pov, board.turn),
+            "depth": depth,
+            "nodes": nodes,
+            "nps": int(nodes / elapsed) if elapsed else 0,
+            "time": elapsed,
+            "pv": pv or ([move] if move else []),
+        }
+
+    def play(self, board, limit, info=chess.engine.INFO_NONE, **kwargs):
+        result = self.analyse(board, limit)
+        pv = result["pv"]
+        move = pv[0] if pv else None
+        ponder = pv[1] if len(pv) > 1 else None
+        return chess.engine.PlayResult(move, ponder, result if info else {})
+
+    def quit(self):
+        pass
@@ -0,0 +1,179 @@
+import argparse
+import os
+import random
+
+import chess
+import chess.engine
+import numpy as np
+
+from builtin_engine import pack_move
+from game_board import GameBoard
+from match import play_game
+from position_codec import POSITION_DTYPE, encode
+from tournament import load_openings, make_player
+
+# Registro de tamaño fijo por posición; evaluación y resultado desde el punto de vista del bando que mueve
+RECORD_DTYPE = np.dtype([
+    ("position", POSITION_DTYPE),
+    ("score", "<i2"),
+    ("move", "<u2"),
+    ("result", "i1"),
+])
+
+MATE_VALUE = 32000
+
+
+class BloomFilter:
+    """Filtro de Bloom de tamaño fijo sobre claves Zobrist de 64 bits"""
+
+    def __init__(self, size_mb=64, hashes=4):
+        bits = 1
+        while bits * 2 <= size_mb * 8 * 1024 * 1024:
+            bits *= 2
+        self.mask = bits - 1
+        self.hashes = hashes
+        self.bits = bytearray(bits // 8)
+
+    def add(self, key):
+        """Marcar la clave; devuelve False si (probablemente) ya estaba"""
+        # Doble hash con las dos mitades de la clave
+        low, high = key & 0xFFFFFFFF, (key >> 32) | 1
+        new = False
+        for i in range(self.hashes):
+            bit = (low + i * high) & self.mask
+            byte, flag = bit >> 3, 1 << (bit & 7)
+            if not self.bits[byte] & flag:
+                self.bits[byte] |= flag
+                new = True
+        return new
+
+
+def play_games(players, limit, games=None, openings=None, random_plies=8, seed=None):
+    """Jugar partidas y generar, por cada una, (posiciones, resultado)
+
+    Cada posición es (tablero antes de la jugada, jugada, info del motor). Las primeras
+    random_plies jugadas son aleatorias, para que las partidas no se repitan. games cuenta los
+    intentos: una partida que termina durante las jugadas aleatorias se descarta pero cuenta.
+    """
+    rng = random.Random(seed)
+    white, black = players
+    count = 0
+    while games is None or count < games:
+        count += 1
+        board = GameBoard(rng.choice(openings) if openings else chess.STARTING_FEN)
+        for _ in range(random_plies):
+            moves = list(board.legal_moves)
+            if not moves:
+                break
+            board.push(rng.choice(moves))
+        if board.is_game_over():
+            continue
+
+        positions = []
+        before = []
+
+        def on_turn(board, player):
+            before.append(board.copy(stack=False))
+
+        def on_move(board, player, move, san_move, time_spent, info):
+            positions.append((before.pop(), move, info))
+
+        play_game(white, black, limit, board=board, on_turn=on_turn, on_move=on_move)
+        outcome = board.outcome()
+        if outcome is not None:
+            yield positions, outcome.winner
+        # Alternar colores entre partidas
+        white, black = black, white
+
+
+def sample_positions(games, book_plies=8, tablebase_pieces=6, sample_rate=1.0, seed=None):
+    """Elegir posiciones: fuera del libro, con más piezas que las tablas de finales y sin jaque"""
+    rng = random.Random(seed)
+    for positions, winner in games:
+        for ply, (board, move, info) in enumerate(positions):
+            if ply < book_plies or board.is_check():
+                continue
+            if chess.popcount(board.occupied) <= tablebase_pieces:
+                continue
+            if info.get("score") is None or rng.random() >= sample_rate:
+                continue
+            result = 0 if winner is None else 1 if winner == board.turn else -1
+            yield board, move, info["score"].relative, result
+
+
+def dedupe(samples, bloom):
+    """Descartar posiciones ya vistas (por clave Zobrist)"""
+    for sample in samples:
+        if bloom.add(sample[0].zobrist_key()):
+            yield sample
+
+
+def to_records(samples):
+    """Convertir muestras en tuplas con el formato de RECORD_DTYPE"""
+    for board, move, score, result in samples:
+        value = max(-MATE_VALUE, min(MATE_VALUE, score.score(mate_score=MATE_VALUE)))
+        yield encode(board).item(), value, pack_move(move), result
+
+
+def write_shards(records, directory, shard_size=1 << 20, prefix="datos"):
+    """Escribir registros en archivos .npy de shard_size registros; genera la ruta de cada archivo escrito"""
+    os.makedirs(directory, exist_ok=True)
+    buffer = np.zeros(shard_size, dtype=RECORD_DTYPE)
+    count = 0
+    shard = 0
+    for record in records:
+        buffer[count] = record
+        count += 1
+        if count == shard_size:
+            path = os.path.join(directory, f"{prefix}-{shard:05d}.npy")
+            np.save(path, buffer)
+            yield path
+            shard += 1
+            count = 0
+    if count:
+        path = os.path.join(directory, f"{prefix}-{shard:05d}.npy")
+        np.save(path, buffer[:count])
+        yield path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generar datos de entrenamiento con partidas entre motores")
+    parser.add_argument("--engine", action="append", required=True,
+                        help="Motor como nombre=comando (una vez para autojuego, dos para motor contra motor)")
+    parser.add_argument("--output", required=True, help="Directorio de salida")
+    parser.add_argument("--games", type=int, help="Número de partidas a intentar (sin límite si no se indica)")
+    parser.add_argument("--time", type=float, help="Segundos por jugada")
+    parser.add_argument("--nodes", type=int, help="Nodos por jugada")
+    parser.add_argument("--depth", type=int, help="Profundidad por jugada")
+    parser.add_argument("--openings", help="Archivo FEN/EPD con las posiciones iniciales")
+    parser.add_argument("--random-plies", type=int, default=8)
+    parser.add_argument("--book-plies", type=int, default=8)
+    parser.add_argument("--tablebase-pieces", type=int, default=6)
+    parser.add_argument("--sample-rate", type=float, default=1.0)
+    parser.add_argument("--shard-size", type=int, default=1 << 20)
+    parser.add_argument("--bloom-mb", type=int, default=64)
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+
+    players = [make_player(spec) for spec in args.engine]
+    if len(players) == 1:
+        players.append(players[0])
+    limit = chess.engine.Limit(time=args.time, nodes=args.nodes, depth=args.depth)
+    if not (args.time or args.nodes or args.depth):
+        limit = chess.engine.Limit(time=0.1)
+
+    try:
+        games = play_games(
+            players, limit, args.games, load_openings(args.openings) if args.openings else None,
+            args.random_plies, args.seed,
+        )
+        # Las jugadas aleatorias no llegan a positions: book_plies cuenta desde la primera del motor
+        samples = sample_positions(games, args.book_plies, args.tablebase_pieces, args.sample_rate, args.seed)
+        records = to_records(dedupe(samples, BloomFilter(args.bloom_mb)))
+        for path in write_shards(records, args.output, args.shard_size):
+            print(f"Escrito {path}")
+    except KeyboardInterrupt:
+        print("Generación interrumpida")
+    finally:
+        for player in {id(player): player for player in players}.values():
+            player.quit()
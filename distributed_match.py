@@ -0,0 +1,305 @@
+import argparse
+import collections
+import json
+import multiprocessing
+import random
+import socket
+import socketserver
+import threading
+import time
+
+import chess
+import chess.engine
+import chess.pgn
+
+from game_board import GameBoard
+from match import play_game
+from match_stats import MatchStats
+from tournament import load_openings, make_player, parse_engine
+
+DEFAULT_PORT = 8766
+# Los trabajadores avisan de que siguen vivos cada HEARTBEAT segundos mientras juegan;
+# tras HEARTBEAT_TIMEOUT sin noticias, su partida vuelve a la cola
+HEARTBEAT = 5
+HEARTBEAT_TIMEOUT = 30
+
+
+def send(stream, message):
+    """Protocolo: un objeto JSON por línea"""
+    stream.write(json.dumps(message).encode() + b"\n")
+    stream.flush()
+
+
+def receive(stream):
+    line = stream.readline()
+    if not line:
+        raise ConnectionError("conexión cerrada")
+    return json.loads(line)
+
+
+def make_jobs(engine_a, engine_b, pairs, openings, move_time, random_plies=0, seed=0):
+    """Partidas por pares como en Tournament: misma apertura y semilla, colores invertidos"""
+    jobs = []
+    for pair in range(pairs):
+        for white, black in ((engine_a, engine_b), (engine_b, engine_a)):
+            jobs.append({
+                "id": len(jobs), "pair": pair, "white": white, "black": black,
+                "fen": openings[pair % len(openings)], "time": move_time,
+                "random_plies": random_plies, "seed": seed + pair,
+            })
+    return jobs
+
+
+def opening_board(job):
+    """Posición inicial de un trabajo: la apertura más random_plies jugadas elegidas con su semilla"""
+    rng = random.Random(job["seed"])
+    board = GameBoard(job["fen"])
+    for _ in range(job["random_plies"]):
+        moves = list(board.legal_moves)
+        if not moves or board.is_game_over():
+            break
+        board.push(rng.choice(moves))
+    return board
+
+
+class Coordinator:
+    """Reparte partidas entre trabajadores y recoge PGN y estadísticas
+
+    La partida de un trabajador que se desconecta o deja de enviar latidos vuelve a la cola.
+    """
+
+    def __init__(self, jobs, output=None):
+        self.jobs = {job["id"]: job for job in jobs}
+        self.pending = collections.deque(jobs)
+        self.assigned = {}
+        self.done = set()
+        self.output = output
+        self.stats = MatchStats()
+        # Nombres de los dos motores, en el orden de la primera partida
+        self.engines = (parse_engine(jobs[0]["white"])[0], parse_engine(jobs[0]["black"])[0]) if jobs else None
+        self.lock = threading.Lock()
+        self.finished = threading.Event()
+        if not jobs:
+            self.finished.set()
+
+    def next_job(self, worker):
+        """Siguiente trabajo para worker; None si no queda ninguno por repartir"""
+        with self.lock:
+            if not self.pending:
+                return None
+            job = self.pending.popleft()
+            self.assigned[job["id"]] = worker
+            return job
+
+    def release(self, worker, job_id):
+        """Devolver a la cola el trabajo de un trabajador caído"""
+        with self.lock:
+            if job_id in self.assigned and job_id not in self.done:
+                del self.assigned[job_id]
+                self.pending.appendleft(self.jobs[job_id])
+                print(f"Trabajador {worker} perdido: la partida {job_id + 1} vuelve a la cola")
+
+    def complete(self, worker, result):
+        job = self.jobs[result["id"]]
+        with self.lock:
+            if job["id"] in self.done:
+                return
+            self.done.add(job["id"])
+            self.assigned.pop(job["id"], None)
+            if self.output:
+                self.output.write(result["pgn"] + "\n\n")
+                self.output.flush()
+
+            a, b = self.engines
+            white = parse_engine(job["white"])[0]
+            if result["result"] != "*":
+                score = {"1-0": 1.0, "0-1": 0.0}.get(result["result"], 0.5)
+                self.stats.add_game(a, b, score if white == a else 1 - score, pair_id=job["pair"])
+            print(f"Partida {job['id'] + 1} ({worker}): {white} - {parse_engine(job['black'])[0]} "
+                  f"{result['result']} en {result['plies']} jugadas")
+            if len(self.done) % 2 == 0:
+                print(self.stats.format_report(a, b))
+            if len(self.done) == len(self.jobs):
+                self.finished.set()
+
+    def has_work(self):
+        with self.lock:
+            return len(self.done) < len(self.jobs)
+
+
+class CoordinatorHandler(socketserver.StreamRequestHandler):
+    """Una conexión por trabajador: trabajo, latidos y resultado, hasta que no quede nada"""
+
+    def handle(self):
+        coordinator = self.server.coordinator
+        self.connection.settimeout(HEARTBEAT_TIMEOUT)
+        job = None
+        worker = f"{self.client_address[0]}:{self.client_address[1]}"
+        try:
+            worker = receive(self.rfile).get("name", worker)
+            while coordinator.has_work():
+                job = coordinator.next_job(worker)
+                if job is None:
+                    # Todo repartido: esperar por si algún trabajador cae y hay que reasignar
+                    send(self.wfile, {"type": "wait", "seconds": 1})
+                    receive(self.rfile)
+                    continue
+                send(self.wfile, {"type": "job", **job})
+                message = receive(self.rfile)
+                while message["type"] == "heartbeat":
+                    message = receive(self.rfile)
+                coordinator.complete(worker, message)
+                job = None
+            send(self.wfile, {"type": "done"})
+        except (OSError, ConnectionError, ValueError, KeyError):
+            pass
+        finally:
+            if job is not None:
+                coordinator.release(worker, job["id"])
+
+
+class CoordinatorServer(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, address, coordinator):
+        super().__init__(address, CoordinatorHandler)
+        self.coordinator = coordinator
+
+
+def play_job(job, players):
+    """Jugar un trabajo con el bucle sin interfaz de siempre; los motores se reutilizan entre partidas
+
+    Los motores van vigilados: los latidos solo dicen que el proceso sigue vivo, así que un motor
+    colgado tiene que reiniciarse aquí para que la partida avance.
+    """
+    for spec in (job["white"], job["black"]):
+        if spec not in players:
+            players[spec] = make_player(spec, watchdog=True)
+    white, black = players[job["white"]], players[job["black"]]
+    board = opening_board(job)
+    times = {chess.WHITE: 0.0, chess.BLACK: 0.0}
+    depths = {chess.WHITE: [], chess.BLACK: []}
+
+    def on_move(board, player, move, san_move, time_spent, info):
+        times[not board.turn] += time_spent
+        if "depth" in info:
+            depths[not board.turn].append(info["depth"])
+
+    play_game(white, black, chess.engine.Limit(time=job["time"]), board=board, on_move=on_move)
+
+    # Las jugadas aleatorias de la apertura quedan en la partida, desde la posición del trabajo
+    game = chess.pgn.Game.from_board(board)
+    outcome = board.outcome()
+    game.headers.update({
+        "Event": "Partida distribuida", "Round": str(job["pair"] + 1),
+        "White": white.name, "Black": black.name, "Result": outcome.result() if outcome else "*",
+    })
+    return {
+        "type": "result", "id": job["id"], "pgn": str(game),
+        "result": outcome.result() if outcome else "*",
+        "termination": outcome.termination.name.lower() if outcome else None,
+        "plies": len(board.move_stack),
+        "time": {"white": times[chess.WHITE], "black": times[chess.BLACK]},
+        "depth": {
+            "white": sum(depths[chess.WHITE]) / len(depths[chess.WHITE]) if depths[chess.WHITE] else None,
+            "black": sum(depths[chess.BLACK]) / len(depths[chess.BLACK]) if depths[chess.BLACK] else None,
+        },
+    }
+
+
+def run_worker(host, port, name=None):
+    """Pedir y jugar partidas hasta que el coordinador diga que no quedan"""
+    players = {}
+    name = name or f"{socket.gethostname()}-{multiprocessing.current_process().pid}"
+    with socket.create_connection((host, port)) as connection:
+        stream = connection.makefile("rwb")
+        lock = threading.Lock()
+        send(stream, {"type": "hello", "name": name})
+        try:
+            while True:
+                message = receive(stream)
+                if message["type"] == "done":
+                    break
+                if message["type"] == "wait":
+                    time.sleep(message["seconds"])
+                    send(stream, {"type": "ready"})
+                    continue
+
+                # Latidos mientras se juega, para que el coordinador sepa que seguimos vivos
+                playing = threading.Event()
+
+                def heartbeat():
+                    while not playing.wait(HEARTBEAT):
+                        with lock:
+                            send(stream, {"type": "heartbeat"})
+
+                beats = threading.Thread(target=heartbeat, daemon=True)
+                beats.start()
+                try:
+                    result = play_job(message, players)
+                finally:
+                    playing.set()
+                    beats.join()
+                with lock:
+                    send(stream, result)
+        finally:
+            for player in players.values():
+                player.quit()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Partidas entre motores repartidas entre trabajadores por TCP")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    coordinator_parser = subparsers.add_parser("coordinator", help="Repartir las partidas y recoger los resultados")
+    coordinator_parser.add_argument("--engine", action="append", required=True, help="Motor como nombre=comando (dos veces)")
+    coordinator_parser.add_argument("--pairs", type=int, default=10, help="Pares de partidas")
+    coordinator_parser.add_argument("--time", type=float, default=0.1, help="Segundos por jugada")
+    coordinator_parser.add_argument("--openings", help="Archivo FEN/EPD con las posiciones iniciales")
+    coordinator_parser.add_argument("--random-plies", type=int, default=0, help="Jugadas aleatorias tras la apertura")
+    coordinator_parser.add_argument("--seed", type=int, default=0)
+    coordinator_parser.add_argument("--output", help="Guardar las partidas en este PGN")
+    coordinator_parser.add_argument("--host", default="127.0.0.1")
+    coordinator_parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    coordinator_parser.add_argument("--local-workers", type=int, default=0, help="Lanzar también trabajadores locales")
+
+    worker_parser = subparsers.add_parser("worker", help="Jugar las partidas que reparta un coordinador")
+    worker_parser.add_argument("--host", default="127.0.0.1")
+    worker_parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    worker_parser.add_argument("--name")
+    args = parser.parse_args()
+
+    if args.command == "worker":
+        try:
+            run_worker(args.host, args.port, args.name)
+        except KeyboardInterrupt:
+            print("Trabajador detenido")
+    else:
+        if len(args.engine) != 2:
+            parser.error("hacen falta exactamente dos motores")
+        openings = load_openings(args.openings) if args.openings else [chess.STARTING_FEN]
+        jobs = make_jobs(args.engine[0], args.engine[1], args.pairs, openings, args.time, args.random_plies, args.seed)
+        output = open(args.output, "a", encoding="utf-8") if args.output else None
+        coordinator = Coordinator(jobs, output)
+        server = CoordinatorServer((args.host, args.port), coordinator)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        print(f"Coordinador en {args.host}:{args.port} con {len(jobs)} partidas")
+
+        workers = [
+            multiprocessing.Process(target=run_worker, args=(args.host, args.port, f"local-{index + 1}"))
+            for index in range(args.local_workers)
+        ]
+        for worker in workers:
+            worker.start()
+        try:
+            coordinator.finished.wait()
+        except KeyboardInterrupt:
+            print("Coordinador detenido")
+        finally:
+            for worker in workers:
+                worker.join(timeout=5)
+            server.shutdown()
+            server.server_close()
+            if output:
+                output.close()
@@ -0,0 +1,253 @@
+import argparse
+import csv
+import functools
+import mmap
+import random
+
+import chess
+import chess.pgn
+
+from builtin_engine import pack_move, unpack_move
+from game_archive import GAME_HEADER_DTYPE, GameArchive
+from game_board import GameBoard
+from position_codec import encode
+
+# Tabla básica (ECO, nombre, jugadas en SAN); para la clasificación completa se carga
+# el TSV de https://github.com/lichess-org/chess-openings con load_tsv()
+BASIC_OPENINGS = [
+    ("B00", "Apertura de peón de rey", "e4"),
+    ("C20", "Apertura de peón de rey", "e4 e5"),
+    ("C23", "Apertura de alfil", "e4 e5 Bc4"),
+    ("C25", "Partida vienesa", "e4 e5 Nc3"),
+    ("C30", "Gambito de rey", "e4 e5 f4"),
+    ("C40", "Apertura de caballo de rey", "e4 e5 Nf3"),
+    ("C41", "Defensa Philidor", "e4 e5 Nf3 d6"),
+    ("C42", "Defensa Petrov", "e4 e5 Nf3 Nf6"),
+    ("C44", "Apertura de caballo de rey", "e4 e5 Nf3 Nc6"),
+    ("C45", "Partida escocesa", "e4 e5 Nf3 Nc6 d4"),
+    ("C50", "Partida italiana", "e4 e5 Nf3 Nc6 Bc4"),
+    ("C53", "Giuoco piano", "e4 e5 Nf3 Nc6 Bc4 Bc5 c3"),
+    ("C55", "Defensa de los dos caballos", "e4 e5 Nf3 Nc6 Bc4 Nf6"),
+    ("C60", "Apertura española", "e4 e5 Nf3 Nc6 Bb5"),
+    ("C65", "Española, defensa berlinesa", "e4 e5 Nf3 Nc6 Bb5 Nf6"),
+    ("C68", "Española, variante del cambio", "e4 e5 Nf3 Nc6 Bb5 a6 Bxc6"),
+    ("C70", "Apertura española", "e4 e5 Nf3 Nc6 Bb5 a6 Ba4"),
+    ("B20", "Defensa siciliana", "e4 c5"),
+    ("B22", "Siciliana, variante Alapin", "e4 c5 c3"),
+    ("B23", "Siciliana cerrada", "e4 c5 Nc3"),
+    ("B27", "Defensa siciliana", "e4 c5 Nf3"),
+    ("B30", "Defensa siciliana", "e4 c5 Nf3 Nc6"),
+    ("B40", "Defensa siciliana", "e4 c5 Nf3 e6"),
+    ("B50", "Defensa siciliana", "e4 c5 Nf3 d6"),
+    ("B54", "Siciliana abierta", "e4 c5 Nf3 d6 d4 cxd4 Nxd4"),
+    ("B70", "Siciliana, variante del dragón", "e4 c5 Nf3 d6 d4 cxd4 Nxd4 Nf6 Nc3 g6"),
+    ("B90", "Siciliana, variante Najdorf", "e4 c5 Nf3 d6 d4 cxd4 Nxd4 Nf6 Nc3 a6"),
+    ("C00", "Defensa francesa", "e4 e6"),
+    ("C01", "Francesa, variante del cambio", "e4 e6 d4 d5 exd5"),
+    ("C02", "Francesa, variante del avance", "e4 e6 d4 d5 e5"),
+    ("C03", "Francesa, variante Tarrasch", "e4 e6 d4 d5 Nd2"),
+    ("C10", "Defensa francesa", "e4 e6 d4 d5 Nc3"),
+    ("B10", "Defensa Caro-Kann", "e4 c6"),
+    ("B12", "Caro-Kann, variante del avance", "e4 c6 d4 d5 e5"),
+    ("B01", "Defensa escandinava", "e4 d5"),
+    ("B02", "Defensa Alekhine", "e4 Nf6"),
+    ("B06", "Defensa moderna", "e4 g6"),
+    ("B07", "Defensa Pirc", "e4 d6 d4 Nf6"),
+    ("A40", "Apertura de peón de dama", "d4"),
+    ("D00", "Apertura de peón de dama", "d4 d5"),
+    ("D02", "Apertura de peón de dama", "d4 d5 Nf3"),
+    ("D06", "Gambito de dama", "d4 d5 c4"),
+    ("D10", "Defensa eslava", "d4 d5 c4 c6"),
+    ("D20", "Gambito de dama aceptado", "d4 d5 c4 dxc4"),
+    ("D30", "Gambito de dama rehusado", "d4 d5 c4 e6"),
+    ("D35", "Gambito de dama rehusado, variante del cambio", "d4 d5 c4 e6 Nc3 Nf6 cxd5"),
+    ("D43", "Defensa semieslava", "d4 d5 c4 c6 Nf3 Nf6 Nc3 e6"),
+    ("A45", "Defensa india", "d4 Nf6"),
+    ("A46", "Defensa india", "d4 Nf6 Nf3"),
+    ("A56", "Defensa Benoni", "d4 Nf6 c4 c5"),
+    ("A57", "Gambito Benko", "d4 Nf6 c4 c5 d5 b5"),
+    ("E00", "Defensa india", "d4 Nf6 c4 e6"),
+    ("E12", "Defensa india de dama", "d4 Nf6 c4 e6 Nf3 b6"),
+    ("E20", "Defensa Nimzo-india", "d4 Nf6 c4 e6 Nc3 Bb4"),
+    ("E60", "Defensa india de rey", "d4 Nf6 c4 g6"),
+    ("E61", "Defensa india de rey", "d4 Nf6 c4 g6 Nc3 Bg7"),
+    ("D80", "Defensa Grünfeld", "d4 Nf6 c4 g6 Nc3 d5"),
+    ("A80", "Defensa holandesa", "d4 f5"),
+    ("A10", "Apertura inglesa", "c4"),
+    ("A20", "Apertura inglesa", "c4 e5"),
+    ("A30", "Inglesa simétrica", "c4 c5"),
+    ("A04", "Apertura Zukertort", "Nf3"),
+    ("A09", "Apertura Réti", "Nf3 d5 c4"),
+    ("A01", "Apertura Larsen", "b3"),
+    ("A02", "Apertura Bird", "f4"),
+]
+
+# Clave del hijo que guarda la clasificación del nodo (las jugadas son enteros)
+ENTRY = None
+
+# Valores aleatorios por (bando, jugada): su suma identifica el conjunto de jugadas de cada bando
+# sin importar el orden, como una clave Zobrist de las jugadas
+_rng = random.Random(0x5EC0)
+MOVE_SET_KEYS = [_rng.getrandbits(64) for _ in range(2 << 15)]
+MASK_64 = (1 << 64) - 1
+
+
+def _san_moves(text):
+    # Quitar los números de jugada de un texto tipo "1. e4 e5 2. Nf3"
+    return [token for token in text.split() if not token[0].isdigit() and token != "*"]
+
+
+class EcoClassifier:
+    """Clasificación ECO con un trie de jugadas (codificadas en 16 bits) y, para las transposiciones,
+    un diccionario de claves Zobrist de las posiciones con nombre
+    """
+
+    def __init__(self, openings=BASIC_OPENINGS):
+        self.root = {}
+        # Suma de MOVE_SET_KEYS de las jugadas -> (eco, nombre, jugadas, clave Zobrist de la posición)
+        self.move_sets = {}
+        self.max_plies = 0
+        for eco, name, moves in openings:
+            self.add(eco, name, _san_moves(moves))
+
+    def add(self, eco, name, san_moves):
+        board = GameBoard()
+        node = self.root
+        move_set = 0
+        for ply, san in enumerate(san_moves):
+            move = board.parse_san(san)
+            code = pack_move(move)
+            node = node.setdefault(code, {})
+            move_set = (move_set + MOVE_SET_KEYS[(ply & 1) << 15 | code]) & MASK_64
+            board.push(move)
+        node[ENTRY] = (eco, name)
+        self.move_sets[move_set] = (eco, name, len(san_moves), board.zobrist_key())
+        self.max_plies = max(self.max_plies, len(san_moves))
+
+    @classmethod
+    def load_tsv(cls, *paths):
+        """Cargar archivos TSV con columnas eco, name y pgn (formato de lichess chess-openings)"""
+        openings = []
+        for path in paths:
+            with open(path, encoding="utf-8") as f:
+                for row in csv.DictReader(f, delimiter="\t"):
+                    openings.append((row["eco"], row["name"], row["pgn"]))
+        return cls(openings)
+
+    def classify(self, moves):
+        """Devolver (eco, nombre) de una partida desde la posición inicial, o None
+
+        moves son jugadas como chess.Move, UCI o enteros de pack_move(). Se recorre el trie
+        jugada a jugada; cuando se sale de él, se buscan transposiciones a aperturas más profundas:
+        primero por el conjunto de jugadas hechas y, si coincide, comprobando la clave Zobrist.
+        """
+        codes = []
+        for move in moves[:self.max_plies]:
+            if isinstance(move, str):
+                move = chess.Move.from_uci(move)
+            codes.append(move if isinstance(move, int) else pack_move(move))
+
+        node = self.root
+        best = None
+        best_plies = 0
+        for ply, code in enumerate(codes, 1):
+            node = node.get(code)
+            if node is None:
+                break
+            if ENTRY in node:
+                best, best_plies = node[ENTRY], ply
+        else:
+            return best
+
+        # Transposiciones: solo sirven si dan una clasificación más profunda que la del trie
+        move_set = 0
+        for ply, code in enumerate(codes):
+            move_set = (move_set + MOVE_SET_KEYS[(ply & 1) << 15 | code]) & MASK_64
+            found = self.move_sets.get(move_set)
+            if found and found[2] > best_plies and self._reaches(codes[:ply + 1], found[3]):
+                best, best_plies = found[:2], found[2]
+        return best
+
+    @staticmethod
+    def _reaches(codes, key):
+        board = GameBoard()
+        for code in codes:
+            move = unpack_move(code)
+            if not board.is_legal(move):
+                return False
+            board.push(move)
+        return board.zobrist_key() == key
+
+    def classify_board(self, board):
+        """Clasificar la partida de un tablero (posición inicial más su pila de jugadas)"""
+        if board.chess960 or board.root().board_fen() != chess.STARTING_BOARD_FEN:
+            return None
+        return self.classify(board.move_stack)
+
+    def tag(self, game):
+        """Poner las cabeceras ECO y Opening de una partida de chess.pgn; devuelve la clasificación"""
+        if game.board().fen() != chess.STARTING_FEN:
+            return None
+        found = self.classify(list(game.mainline_moves()))
+        if found:
+            game.headers["ECO"], game.headers["Opening"] = found
+        return found
+
+
+@functools.lru_cache(maxsize=None)
+def default_classifier(*paths):
+    """Clasificador compartido: la tabla básica o los TSV indicados"""
+    return EcoClassifier.load_tsv(*paths) if paths else EcoClassifier()
+
+
+def tag_archive(path, classifier=None):
+    """Escribir el código ECO en la cabecera de cada partida del archivo binario; devuelve las clasificadas"""
+    classifier = classifier or default_classifier()
+    archive = GameArchive(path)
+    eco_offset = GAME_HEADER_DTYPE.fields["eco"][1]
+    standard = encode(GameBoard()).tobytes()
+    tagged = 0
+    with open(path, "r+b") as f:
+        data = mmap.mmap(f.fileno(), 0)
+        for index in range(len(archive)):
+            header = archive.header(index)
+            if header["start"].tobytes() != standard or header["flags"]:
+                continue
+            found = classifier.classify(archive.moves(index)[:classifier.max_plies].tolist())
+            if found:
+                offset = int(archive.offsets[index]) + eco_offset
+                data[offset:offset + 4] = found[0].encode().ljust(4, b"\0")
+                tagged += 1
+        data.close()
+    archive.close()
+    return tagged
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Clasificar partidas por apertura (ECO)")
+    parser.add_argument("--pgn", help="PGN de entrada")
+    parser.add_argument("--output", help="PGN de salida con las cabeceras ECO y Opening")
+    parser.add_argument("--archive", help="Archivo binario de partidas a etiquetar en su sitio")
+    parser.add_argument("--tsv", nargs="+", default=[], help="Tablas de aperturas en TSV (eco, name, pgn)")
+    args = parser.parse_args()
+
+    classifier = default_classifier(*args.tsv)
+    if args.archive:
+        print(f"{tag_archive(args.archive, classifier)} partidas clasificadas")
+    if args.pgn:
+        output = open(args.output, "w", encoding="utf-8") if args.output else None
+        counts = {}
+        with open(args.pgn, encoding="utf-8", errors="replace") as f:
+            while True:
+                game = chess.pgn.read_game(f)
+                if game is None:
+                    break
+                found = classifier.tag(game)
+                key = f"{found[0]} {found[1]}" if found else "Sin clasificar"
+                counts[key] = counts.get(key, 0) + 1
+                if output:
+                    print(game, file=output, end="\n\n")
+        if output:
+            output.close()
+        for key, count in sorted(counts.items(), key=lambda item: -item[1])[:20]:
+            print(f"{count:>8}  {key}")
@@ -0,0 +1,82 @@
+import concurrent.futures
+import queue
+import time
+
+import chess
+import chess.engine
+
+from tournament import make_player
+
+
+def stream_analysis(player, board, limit, multipv=None, root_moves=None):
+    """Generar la info de análisis (una línea cada vez) según llega, hasta el límite o hasta cerrar el generador
+
+    Los motores UCI/xboard informan mientras buscan; el integrado no, así que se profundiza de una
+    en una (su tabla de transposición se conserva entre búsquedas) con el tiempo y los nodos totales.
+    """
+    if hasattr(player, "engine"):
+        with player.engine.analysis(board, limit, multipv=multipv, root_moves=root_moves) as analysis:
+            for info in analysis:
+                if info.get("pv") and "score" in info:
+                    yield info
+        return
+
+    start = time.monotonic()
+    nodes = 0
+    for depth in range(1, (limit.depth or 64) + 1):
+        remaining_time = limit.time - (time.monotonic() - start) if limit.time is not None else None
+        remaining_nodes = limit.nodes - nodes if limit.nodes is not None else None
+        if (remaining_time is not None and remaining_time <= 0) or (remaining_nodes is not None and remaining_nodes <= 0):
+            break
+        # Las líneas de un MultiPV del integrado se buscan una tras otra y se reparten el tiempo
+        step = chess.engine.Limit(
+            depth=depth, nodes=remaining_nodes,
+            time=remaining_time / (multipv or 1) if remaining_time is not None else None,
+        )
+        result = player.analyse(board, step, multipv=multipv, root_moves=root_moves)
+        lines = result if isinstance(result, list) else [result]
+        nodes += sum(line.get("nodes", 0) for line in lines)
+        for line in lines:
+            yield {**line, "nodes": nodes, "time": time.monotonic() - start}
+        # Búsqueda cortada por el límite o mate encontrado antes de esta profundidad
+        if any(line.get("depth", depth) < depth for line in lines):
+            break
+
+
+class EnginePool:
+    """Motores persistentes compartidos por varios hilos: cada análisis usa el primer motor libre
+
+    Los motores UCI/xboard trabajan en sus propios procesos, así que los hilos solo esperan respuestas.
+    """
+
+    def __init__(self, specs, size=1):
+        # Con una sola especificación se abren size copias del mismo motor
+        specs = list(specs) * size if len(specs) == 1 else list(specs)
+        self.players = [make_player(spec) for spec in specs]
+        self.idle = queue.Queue()
+        for player in self.players:
+            self.idle.put(player)
+        self.executor = concurrent.futures.ThreadPoolExecutor(len(self.players), thread_name_prefix="engine-pool")
+
+    def __len__(self):
+        return len(self.players)
+
+    def _run(self, function, args):
+        player = self.idle.get()
+        try:
+            return function(player, *args)
+        finally:
+            self.idle.put(player)
+
+    def submit(self, function, *args):
+        """Encolar function(motor, *args) para el primer motor libre; devuelve un Future"""
+        return self.executor.submit(self._run, function, args)
+
+    def analyse(self, board, limit, **kwargs):
+        """Encolar un análisis (con los argumentos de chess.engine analyse()); devuelve un Future"""
+        return self.submit(lambda player: player.analyse(board, limit, **kwargs))
+
+    def close(self):
+        self.executor.shutdown(wait=True, cancel_futures=True)
+        for player in self.players:
+            player.quit()
@@ -0,0 +1,130 @@
+import threading
+import time
+
+import chess
+import chess.engine
+
+from match import EnginePlayer
+
+# Errores con los que chess.engine avisa de un motor caído, colgado o cerrado por el vigilante
+ENGINE_ERRORS = (chess.engine.EngineError, chess.engine.EngineTerminatedError, TimeoutError)
+
+
+class SupervisedEngine(EnginePlayer):
+    """Motor UCI/xboard vigilado: si se cuelga o se cae, se reinicia con las mismas opciones
+    y la jugada se vuelve a pedir desde la misma posición
+
+    Un hilo comprueba cada interval segundos que el proceso sigue vivo (chess.engine resuelve
+    returncode con waitpid en cuanto termina), que un motor libre responde a isready/ping y que
+    uno que está pensando no pasa de su tiempo más grace.
+    """
+
+    def __init__(self, name, command, protocol="uci", options=None, interval=2.0, ping_timeout=5.0, grace=5.0,
+                 max_think=60.0, on_restart=None):
+        self.interval = interval
+        self.ping_timeout = ping_timeout
+        self.grace = grace
+        self.max_think = max_think
+        self.on_restart = on_restart
+        self.crashes = 0
+        self.hangs = 0
+        self.restart_latencies = []
+        # Solo una petición a la vez: la jugada en curso, un ping o un reinicio
+        self.lock = threading.Lock()
+        self.deadline = None
+        self.kill_reason = None
+        super().__init__(name, command, protocol, options)
+
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._watch, name=f"watchdog-{name}", daemon=True)
+        self.thread.start()
+
+    def open(self):
+        super().open()
+        self.engine.timeout = self.ping_timeout
+
+    def _budget(self, board, limit):
+        """Tiempo máximo razonable para una petición con este límite"""
+        if limit.time is not None:
+            return limit.time
+        clock = limit.white_clock if board.turn == chess.WHITE else limit.black_clock
+        return clock if clock is not None else self.max_think
+
+    def _watch(self):
+        while not self.stopped.wait(self.interval):
+            engine = self.engine
+            reason = None
+            if engine.returncode.done():
+                reason = "crash"
+            elif self.deadline is not None:
+                if time.monotonic() > self.deadline:
+                    reason = "hang"
+            elif self.lock.acquire(blocking=False):
+                try:
+                    if not engine.returncode.done():
+                        engine.ping()
+                except ENGINE_ERRORS:
+                    reason = "hang"
+                finally:
+                    self.lock.release()
+            if reason is None:
+                continue
+
+            if self.deadline is not None:
+                # Cerrar el motor hace que la petición en curso falle y se reintente tras reiniciar
+                self.kill_reason = reason
+                engine.close()
+            else:
+                with self.lock:
+                    if self.engine is engine:
+                        try:
+                            self._restart(reason)
+                        except (OSError, *ENGINE_ERRORS) as e:
+                            print(f"No se pudo reiniciar {self.name}: {e}")
+
+    def _restart(self, reason):
+        start = time.monotonic()
+        self.engine.close()
+        self.kill_reason = None
+        self.open()
+        latency = time.monotonic() - start
+        if reason == "hang":
+            self.hangs += 1
+        else:
+            self.crashes += 1
+        self.restart_latencies.append(latency)
+        print(f"{self.name} {'no responde' if reason == 'hang' else 'se ha caído'}: reiniciado en {latency * 1000:.0f} ms")
+        if self.on_restart:
+            self.on_restart(self, reason, latency)
+
+    def _call(self, board, limit, request):
+        with self.lock:
+            for attempt in range(2):
+                self.deadline = time.monotonic() + self._budget(board, limit) + self.grace
+                try:
+                    return request()
+                except ENGINE_ERRORS:
+                    reason = self.kill_reason or ("crash" if self.engine.returncode.done() else "hang")
+                    self.deadline = None
+                    if attempt:
+                        raise
+                    # El motor nuevo recibe la partida entera (position ... moves ...) al repetir la petición
+                    self._restart(reason)
+                finally:
+                    self.deadline = None
+
+    def play(self, board, limit, info=chess.engine.INFO_NONE):
+        return self._call(board, limit, lambda: self.engine.play(board, limit, info=info))
+
+    def analyse(self, board, limit, **kwargs):
+        return self._call(board, limit, lambda: self.engine.analyse(board, limit, **kwargs))
+
+    def format_stats(self):
+        mean = sum(self.restart_latencies) / len(self.restart_latencies) if self.restart_latencies else 0
+        return (f"{self.name}: {self.crashes} caídas, {self.hangs} cuelgues, "
+                f"reinicio medio {mean * 1000:.0f} ms")
+
+    def quit(self):
+        self.stopped.set()
+        self.thread.join()
+        super().quit()
@@ -0,0 +1,164 @@
+import argparse
+import concurrent.futures
+import time
+
+import chess
+import chess.engine
+
+from engine_pool import EnginePool, stream_analysis
+from engine_watchdog import ENGINE_ERRORS
+
+
+def load_suite(path):
+    """Leer un archivo EPD; devuelve [(tablero, operaciones)] con las posiciones que tienen bm o am"""
+    suite = []
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            board, ops = chess.Board.from_epd(line)
+            if "bm" in ops or "am" in ops:
+                suite.append((board, ops))
+    return suite
+
+
+def solves(ops, move):
+    """La jugada es una de las mejores (bm) y ninguna de las que hay que evitar (am)"""
+    if "bm" in ops and move not in ops["bm"]:
+        return False
+    return "am" not in ops or move not in ops["am"]
+
+
+def expected_moves(board, ops):
+    return " ".join(board.san(m) for m in ops.get("bm", [])) or "no " + " ".join(board.san(m) for m in ops.get("am", []))
+
+
+def solve_position(player, board, ops, limit, stable=3):
+    """Analizar hasta el límite o hasta que la jugada que resuelve aguante stable iteraciones seguidas
+
+    El tiempo y los nodos de la solución son los de la primera iteración de esa racha.
+    """
+    start = time.monotonic()
+    move = None
+    found = None
+    depths = set()
+    depth = 0
+    for info in stream_analysis(player, board, limit):
+        if info.get("multipv", 1) != 1:
+            continue
+        move = info["pv"][0]
+        depth = info.get("depth", depth)
+        if not solves(ops, move):
+            found = None
+            depths.clear()
+            continue
+        if found is None:
+            found = {"time": info.get("time", time.monotonic() - start), "nodes": info.get("nodes"), "depth": depth}
+        depths.add(depth)
+        if len(depths) >= stable:
+            break
+
+    solved = move is not None and solves(ops, move)
+    return {
+        "id": ops.get("id", board.fen()),
+        "solved": solved,
+        "move": board.san(move) if move else None,
+        "expected": expected_moves(board, ops),
+        "time": found["time"] if solved else None,
+        "nodes": found["nodes"] if solved else None,
+        "depth": found["depth"] if solved else None,
+        "elapsed": time.monotonic() - start,
+        "error": None,
+    }
+
+
+def failed_position(board, ops, error):
+    """Resultado de una posición cuyo motor falló: cuenta como no resuelta"""
+    return {
+        "id": ops.get("id", board.fen()), "solved": False, "move": None, "expected": expected_moves(board, ops),
+        "time": None, "nodes": None, "depth": None, "elapsed": 0.0, "error": str(error) or type(error).__name__,
+    }
+
+
+def run_suite(pool, suite, limit, stable=3, callback=None):
+    """Repartir las posiciones entre los motores del grupo; devuelve los resultados en el orden de la suite
+
+    Si el motor falla en una posición, esa queda como no resuelta (con el error) y la suite sigue.
+    """
+    futures = {
+        pool.submit(solve_position, board, ops, limit, stable): index for index, (board, ops) in enumerate(suite)
+    }
+    results = [None] * len(suite)
+    for future in concurrent.futures.as_completed(futures):
+        index = futures[future]
+        try:
+            results[index] = future.result()
+        except ENGINE_ERRORS as e:
+            results[index] = failed_position(*suite[index], e)
+        if callback:
+            callback(results[index])
+    return results
+
+
+def format_summary(name, results):
+    solved = [result for result in results if result["solved"]]
+    lines = [f"{name}: {len(solved)}/{len(results)} resueltas ({100 * len(solved) / max(1, len(results)):.1f}%)"]
+    if solved:
+        times = sorted(result["time"] for result in solved)
+        lines.append(f"  tiempo hasta la solución: medio {sum(times) / len(times):.2f} s, "
+                     f"mediana {times[len(times) // 2]:.2f} s")
+        nodes = sorted(result["nodes"] for result in solved if result["nodes"] is not None)
+        if nodes:
+            lines.append(f"  nodos hasta la solución: medio {sum(nodes) / len(nodes):,.0f}, "
+                         f"mediana {nodes[len(nodes) // 2]:,}")
+    errors = sum(1 for result in results if result.get("error"))
+    if errors:
+        lines.append(f"  {errors} posiciones sin analizar por errores del motor")
+    lines.append(f"  tiempo total de análisis: {sum(result['elapsed'] for result in results):.1f} s")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Resolver una suite EPD (bm/am) con un grupo de motores")
+    parser.add_argument("epd")
+    parser.add_argument("--engine", action="append", required=True,
+                        help="Motor como nombre=comando; repetido, la suite se pasa a cada uno por separado")
+    parser.add_argument("--workers", type=int, default=1, help="Copias de cada motor")
+    parser.add_argument("--time", type=float, help="Segundos por posición")
+    parser.add_argument("--nodes", type=int, help="Nodos por posición")
+    parser.add_argument("--depth", type=int)
+    parser.add_argument("--stable", type=int, default=3, help="Iteraciones seguidas con la solución para parar antes")
+    parser.add_argument("--verbose", action="store_true", help="Mostrar cada posición")
+    args = parser.parse_args()
+
+    limit = chess.engine.Limit(time=args.time, nodes=args.nodes, depth=args.depth)
+    if not (args.time or args.nodes or args.depth):
+        limit = chess.engine.Limit(time=10)
+    suite = load_suite(args.epd)
+    print(f"{len(suite)} posiciones en {args.epd}")
+
+    def show(result):
+        if args.verbose:
+            if result["solved"]:
+                status = f"resuelta en {result['time']:.2f} s, prof. {result['depth']}"
+            elif result.get("error"):
+                status = f"error del motor ({result['error']})"
+            else:
+                status = f"fallada ({result['move']})"
+            print(f"{result['id']}: {status} [{result['expected']}]")
+
+    summaries = []
+    for spec in args.engine:
+        pool = EnginePool([spec], args.workers)
+        try:
+            results = run_suite(pool, suite, limit, args.stable, show)
+            summaries.append(format_summary(pool.players[0].name, results))
+            print(summaries[-1])
+        except KeyboardInterrupt:
+            print("Suite interrumpida")
+            break
+        finally:
+            pool.close()
+    if len(summaries) > 1:
+        print("\n" + "\n".join(summaries))
@@ -0,0 +1,226 @@
+import argparse
+import mmap
+import os
+
+import chess
+import chess.pgn
+import numpy as np
+
+from builtin_engine import pack_move, unpack_move
+from game_board import GameBoard
+from position_codec import POSITION_DTYPE, decode, encode
+
+# Cabecera fija de cada partida; detrás van las jugadas, 16 bits cada una
+GAME_HEADER_DTYPE = np.dtype([
+    ("start", POSITION_DTYPE),
+    ("white", "S24"),
+    ("black", "S24"),
+    ("date", "S8"),
+    ("eco", "S4"),
+    ("result", "u1"),
+    ("flags", "u1"),
+    ("plies", "<u2"),
+])
+MOVE_DTYPE = np.dtype("<u2")
+
+RESULTS = ["*", "1-0", "0-1", "1/2-1/2"]
+CHESS960 = 1
+
+
+def _text(value, size):
+    return value.encode("utf-8")[:size]
+
+
+def _pgn_date(date):
+    # "2024.05.01" se guarda como "20240501"
+    return date.replace(".", "")[:8] if date else ""
+
+
+def encode_game(start, moves, white="?", black="?", result="*", date="", eco=""):
+    """Codificar una partida tal como se guarda en el archivo: cabecera y jugadas"""
+    header = np.zeros((), dtype=GAME_HEADER_DTYPE)
+    encode(start, header["start"])
+    header["white"] = _text(white, 24)
+    header["black"] = _text(black, 24)
+    header["date"] = _text(_pgn_date(date), 8)
+    header["eco"] = _text(eco, 4)
+    header["result"] = RESULTS.index(result) if result in RESULTS else 0
+    header["flags"] = CHESS960 if start.chess960 else 0
+    header["plies"] = len(moves)
+    return header.tobytes() + np.fromiter((pack_move(move) for move in moves), MOVE_DTYPE, len(moves)).tobytes()
+
+
+def encode_pgn_game(game):
+    """Codificar una partida de chess.pgn"""
+    headers = game.headers
+    return encode_game(
+        game.board(), list(game.mainline_moves()), headers.get("White", "?"), headers.get("Black", "?"),
+        headers.get("Result", "*"), headers.get("Date", ""), headers.get("ECO", ""),
+    )
+
+
+class ArchiveWriter:
+    """Añadir partidas al final de un archivo, con su índice de posiciones en path + '.idx'"""
+
+    def __init__(self, path):
+        self.path = path
+        self.data = open(path, "ab")
+        self.data.seek(0, os.SEEK_END)
+        self.index = open(path + ".idx", "ab")
+
+    def add(self, board, white="?", black="?", result=None, date="", eco=""):
+        """Guardar la partida de un tablero (posición inicial más su lista de jugadas)"""
+        if result is None:
+            outcome = board.outcome()
+            result = outcome.result() if outcome else "*"
+        return self.add_record(encode_game(board.root(), board.move_stack, white, black, result, date, eco))
+
+    def add_game(self, game):
+        """Guardar una partida de chess.pgn"""
+        return self.add_record(encode_pgn_game(game))
+
+    def add_record(self, record):
+        """Añadir una partida ya codificada con encode_game(); devuelve su número"""
+        offset = self.data.tell()
+        self.data.write(record)
+        self.index.write(np.uint64(offset).tobytes())
+        return self.index.tell() // 8 - 1
+
+    def flush(self):
+        # Primero los datos: una entrada del índice nunca apunta a una partida sin escribir
+        self.data.flush()
+        self.index.flush()
+
+    def close(self):
+        self.flush()
+        self.data.close()
+        self.index.close()
+
+
+class GameArchive:
+    """Lectura de un archivo de partidas con mmap: cualquier partida en O(1) y recorridos sin analizar PGN"""
+
+    def __init__(self, path):
+        self.path = path
+        self._files = []
+        self.data = self._map(path)
+        self.offsets = np.frombuffer(self._map(path + ".idx"), dtype="<u8")
+
+    def _map(self, path):
+        f = open(path, "rb")
+        self._files.append(f)
+        if os.fstat(f.fileno()).st_size == 0:
+            return b""
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def header(self, index):
+        return np.frombuffer(self.data, GAME_HEADER_DTYPE, 1, int(self.offsets[index]))[0]
+
+    def moves(self, index):
+        """Jugadas codificadas de la partida (vista sobre el archivo, sin copiar)"""
+        offset = int(self.offsets[index])
+        plies = int(np.frombuffer(self.data, GAME_HEADER_DTYPE, 1, offset)["plies"][0])
+        return np.frombuffer(self.data, MOVE_DTYPE, plies, offset + GAME_HEADER_DTYPE.itemsize)
+
+    def headers(self, chunk=8192):
+        """Todas las cabeceras en un arreglo, para estadísticas en bloque
+
+        Las partidas tienen longitudes distintas, así que se copian por bloques de chunk cabeceras:
+        los índices temporales ocupan chunk * 96 * 8 bytes y no crecen con el archivo.
+        """
+        result = np.empty(len(self), dtype=GAME_HEADER_DTYPE)
+        if not len(self):
+            return result
+        raw = np.frombuffer(self.data, dtype=np.uint8)
+        out = result.view(np.uint8).reshape(len(self), GAME_HEADER_DTYPE.itemsize)
+        columns = np.arange(GAME_HEADER_DTYPE.itemsize)
+        for start in range(0, len(self), chunk):
+            rows = self.offsets[start:start + chunk, None].astype(np.int64) + columns
+            out[start:start + chunk] = raw[rows]
+        return result
+
+    def scan(self):
+        """Generar (cabecera, jugadas codificadas) de todas las partidas en orden"""
+        for index in range(len(self)):
+            yield self.header(index), self.moves(index)
+
+    def start_board(self, index, board_class=GameBoard):
+        header = self.header(index)
+        board = decode(header["start"], board_class)
+        if header["flags"] & CHESS960:
+            board.chess960 = True
+        return board
+
+    def board(self, index, board_class=GameBoard):
+        """Tablero al final de la partida, con todas sus jugadas en la pila"""
+        board = self.start_board(index, board_class)
+        for code in self.moves(index).tolist():
+            board.push(unpack_move(code))
+        return board
+
+    def game(self, index):
+        """Reconstruir la partida como chess.pgn.Game"""
+        header = self.header(index)
+        start = self.start_board(index, chess.Board)
+        game = chess.pgn.Game.from_board(start)
+        node = game
+        for code in self.moves(index).tolist():
+            node = node.add_main_variation(unpack_move(code))
+
+        date = header["date"].decode()
+        game.headers["White"] = header["white"].decode("utf-8", "replace")
+        game.headers["Black"] = header["black"].decode("utf-8", "replace")
+        game.headers["Date"] = f"{date[:4]}.{date[4:6]}.{date[6:]}" if len(date) == 8 else "????.??.??"
+        game.headers["Result"] = RESULTS[header["result"]]
+        if header["eco"]:
+            game.headers["ECO"] = header["eco"].decode()
+        return game
+
+    def close(self):
+        # El mmap se libera cuando no quedan vistas de numpy sobre él
+        self.data = b""
+        self.offsets = np.zeros(0, dtype="<u8")
+        for f in self._files:
+            f.close()
+
+
+def import_pgn(pgn_path, archive_path):
+    """Convertir un PGN en archivo binario; devuelve el número de partidas añadidas"""
+    writer = ArchiveWriter(archive_path)
+    count = 0
+    with open(pgn_path, encoding="utf-8", errors="replace") as f:
+        while True:
+            game = chess.pgn.read_game(f)
+            if game is None:
+                break
+            writer.add_game(game)
+            count += 1
+    writer.close()
+    return count
+
+
+def export_pgn(archive_path, pgn_path):
+    """Escribir todas las partidas del archivo binario como PGN"""
+    archive = GameArchive(archive_path)
+    with open(pgn_path, "w", encoding="utf-8") as f:
+        for index in range(len(archive)):
+            print(archive.game(index), file=f, end="\n\n")
+    count = len(archive)
+    archive.close()
+    return count
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convertir entre PGN y el archivo binario de partidas")
+    parser.add_argument("command", choices=["import", "export"])
+    parser.add_argument("pgn")
+    parser.add_argument("archive")
+    args = parser.parse_args()
+
+    if args.command == "import":
+        print(f"{import_pgn(args.pgn, args.archive)} partidas importadas")
+    else:
+        print(f"{export_pgn(args.archive, args.pgn)} partidas exportadas")
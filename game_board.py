@@ -0,0 +1,192 @@
+import collections
+import functools
+
+import chess
+import chess.polyglot
+
+# Mismos números aleatorios que chess.polyglot.zobrist_hash()
+ZOBRIST_ARRAY = chess.polyglot.POLYGLOT_RANDOM_ARRAY
+ZOBRIST_HASHER = chess.polyglot.ZobristHasher(ZOBRIST_ARRAY)
+ZOBRIST_TURN = ZOBRIST_ARRAY[780]
+
+
+def material_signature(board):
+    """Calcular la firma de material: número de piezas por color y tipo"""
+    signature = []
+    for color in chess.COLORS:
+        own = board.occupied_co[color]
+        bishops = board.bishops & own
+        signature.extend((
+            chess.popcount(board.pawns & own),
+            chess.popcount(board.knights & own),
+            chess.popcount(bishops & chess.BB_LIGHT_SQUARES),
+            chess.popcount(bishops & chess.BB_DARK_SQUARES),
+            chess.popcount(board.rooks & own),
+            chess.popcount(board.queens & own),
+        ))
+    return tuple(signature)
+
+
+@functools.lru_cache(maxsize=4096)
+def is_insufficient_signature(signature):
+    """Decidir si una firma de material no alcanza para dar mate (mismas reglas que python-chess)"""
+    sides = (signature[:6], signature[6:])
+    pawns = sides[0][0] + sides[1][0]
+    knights = sides[0][1] + sides[1][1]
+    light_bishops = sides[0][2] + sides[1][2]
+    dark_bishops = sides[0][3] + sides[1][3]
+
+    for own, other in (sides, sides[::-1]):
+        own_pawns, own_knights, own_light, own_dark, own_rooks, own_queens = own
+        if own_pawns or own_rooks or own_queens:
+            return False
+        if own_knights:
+            # Un caballo solo, y el rival sin más que dama(s) y rey
+            if own_knights + own_light + own_dark > 1 or any(other[:5]):
+                return False
+        elif own_light or own_dark:
+            # Todos los alfiles del tablero en casillas del mismo color
+            same_color = not light_bishops or not dark_bishops
+            if not same_color or pawns or knights:
+                return False
+    return True
+
+
+class GameBoard(chess.Board):
+    """Tablero que actualiza en cada push/pop su clave Zobrist y lo necesario para detectar el fin de la partida"""
+
+    def clear_stack(self):
+        super().clear_stack()
+        self._reset_tracking()
+
+    def _reset_tracking(self):
+        # Clave Zobrist, firma de material y contador de repeticiones de la posición actual
+        self._key = ZOBRIST_HASHER(self)
+        self._castling_key = ZOBRIST_HASHER.hash_castling(self)
+        self._position_key = self._repetition_key()
+        self._signature = material_signature(self)
+        self._insufficient = is_insufficient_signature(self._signature)
+        self._history = []
+        self._repetitions = collections.Counter({self._position_key: 1})
+
+    def _repetition_key(self):
+        # Polyglot cuenta la casilla al paso si hay un peón al lado aunque la captura sea ilegal
+        # (peón clavado); para repetir posición, python-chess solo la cuenta si es legal
+        if self.ep_square is not None and not self.has_legal_en_passant():
+            return self._key ^ ZOBRIST_HASHER.hash_ep_square(self)
+        return self._key
+
+    def zobrist_key(self):
+        """Clave Zobrist (Polyglot) de la posición actual, igual a chess.polyglot.zobrist_hash()"""
+        return self._key
+
+    def push(self, move):
+        self._history.append((self._position_key, self._key, self._castling_key, self._signature, self._insufficient))
+        pieces = chess.popcount(self.occupied)
+        castling_rights = self.castling_rights
+        before = (self.pawns, self.knights, self.bishops, self.rooks, self.queens, self.kings)
+        before_co = tuple(self.occupied_co)
+        key = self._key ^ ZOBRIST_HASHER.hash_ep_square(self)
+
+        super().push(move)
+
+        # Quitar y poner solo las piezas que cambiaron de casilla o de color
+        after = (self.pawns, self.knights, self.bishops, self.rooks, self.queens, self.kings)
+        recolored = before_co[chess.WHITE] ^ self.occupied_co[chess.WHITE]
+        for piece_index, (old, new) in enumerate(zip(before, after)):
+            if old == new and not old & recolored:
+                continue
+            for pivot in (chess.BLACK, chess.WHITE):
+                changed = (old & before_co[pivot]) ^ (new & self.occupied_co[pivot])
+                for square in chess.scan_forward(changed):
+                    key ^= ZOBRIST_ARRAY[128 * piece_index + 64 * pivot + square]
+
+        # Enroques, casilla al paso y turno
+        if self.castling_rights != castling_rights:
+            castling_key = ZOBRIST_HASHER.hash_castling(self)
+            key ^= self._castling_key ^ castling_key
+            self._castling_key = castling_key
+        key ^= ZOBRIST_HASHER.hash_ep_square(self) ^ ZOBRIST_TURN
+
+        self._key = key
+        self._position_key = self._repetition_key()
+        self._repetitions[self._position_key] += 1
+
+        # El material solo cambia con capturas y coronaciones
+        if move.promotion or chess.popcount(self.occupied) != pieces:
+            self._signature = material_signature(self)
+            self._insufficient = is_insufficient_signature(self._signature)
+
+    def pop(self):
+        move = super().pop()
+
+        self._repetitions[self._position_key] -= 1
+        if not self._repetitions[self._position_key]:
+            del self._repetitions[self._position_key]
+        self._position_key, self._key, self._castling_key, self._signature, self._insufficient = self._history.pop()
+
+        return move
+
+    def copy(self, *, stack=True):
+        board = super().copy(stack=stack)
+        board._key = self._key
+        board._position_key = self._position_key
+        board._castling_key = self._castling_key
+        board._signature = self._signature
+        board._insufficient = self._insufficient
+
+        # Conservar solo la parte del historial que se copió
+        if stack is True:
+            board._history = self._history.copy()
+            board._repetitions = self._repetitions.copy()
+        else:
+            board._history = self._history[-stack:] if stack else []
+            board._repetitions = collections.Counter(entry[0] for entry in board._history)
+            board._repetitions[board._position_key] += 1
+        return board
+
+    def root(self):
+        board = super().root()
+        board._reset_tracking()
+        return board
+
+    def apply_transform(self, f):
+        super().apply_transform(f)
+        self._reset_tracking()
+
+    def apply_mirror(self):
+        super().apply_mirror()
+        self._reset_tracking()
+
+    def is_insufficient_material(self):
+        return self._insufficient
+
+    def is_repetition(self, count=3):
+        # Las posiciones anteriores a un movimiento irreversible no pueden repetirse,
+        # así que basta con contar claves Zobrist en toda la partida
+        return self._repetitions[self._position_key] >= count
+
+    def is_fivefold_repetition(self):
+        return self.is_repetition(5)
+
+    def outcome(self, *, claim_draw=False):
+        # Las reclamaciones de tablas siguen el camino completo de python-chess
+        if claim_draw:
+            return super().outcome(claim_draw=True)
+
+        # Generar movimientos solo hasta encontrar el primero legal
+        has_moves = any(self.generate_legal_moves())
+        if not has_moves and self.is_check():
+            return chess.Outcome(chess.Termination.CHECKMATE, not self.turn)
+        if self._insufficient:
+            return chess.Outcome(chess.Termination.INSUFFICIENT_MATERIAL, None)
+        if not has_moves:
+            return chess.Outcome(chess.Termination.STALEMATE, None)
+
+        # Tablas automáticas
+        if self.halfmove_clock >= 150:
+            return chess.Outcome(chess.Termination.SEVENTYFIVE_MOVES, None)
+        if self._repetitions[self._position_key] >= 5:
+            return chess.Outcome(chess.Termination.FIVEFOLD_REPETITION, None)
+
+        return None
@@ -0,0 +1,114 @@
+import multiprocessing
+import os
+import time
+from multiprocessing import shared_memory
+
+from builtin_engine import BuiltinEngine, Searcher, TranspositionTable, search_board, time_budget
+from game_board import GameBoard
+
+# Estado de cada proceso ayudante: memoria compartida y su propio buscador
+_helper = None
+
+
+class _GenerationStop:
+    """Bandera de parada de un ayudante: se activa en cuanto el principal pasa a otra búsqueda"""
+
+    def __init__(self, generation):
+        self.generation = generation
+        self.current = None
+
+    @property
+    def value(self):
+        return self.generation.value != self.current
+
+
+def _init_helper(memory_name, hash_mb, generation):
+    global _helper
+    # Los ayudantes comparten el resource_tracker del principal, que es quien libera la memoria
+    memory = shared_memory.SharedMemory(name=memory_name)
+    searcher = Searcher(TranspositionTable(hash_mb, memory.buf))
+    searcher.stop = _GenerationStop(generation)
+    _helper = (memory, searcher)
+
+
+def _helper_search(fen, moves, chess960, budget, max_depth, max_nodes, helper_index, generation, root_moves=None):
+    """Búsqueda de un ayudante sobre la tabla compartida, hasta que el principal pase de la búsqueda generation"""
+    _, searcher = _helper
+    searcher.stop.current = generation
+    board = GameBoard(fen, chess960=chess960)
+    for move in moves:
+        board.push(move)
+
+    deadline = time.monotonic() + budget if budget is not None else None
+    # Los ayudantes impares van una profundidad por delante para repartir el trabajo
+    depths = range(1 + helper_index % 2, max_depth + 1)
+    move, score, depth, pv = searcher.search(board, max_depth, deadline, max_nodes, depths=depths,
+                                             root_moves=root_moves)
+    return move, score, depth, pv, searcher.nodes
+
+
+class LazySMPEngine(BuiltinEngine):
+    """Motor integrado con búsqueda Lazy SMP: ayudantes en otros procesos que comparten la tabla de transposición
+
+    Todos buscan la misma posición; lo que uno guarda en la tabla lo aprovechan los demás,
+    y al acabar el tiempo se elige la búsqueda completa más profunda.
+    """
+
+    def __init__(self, workers=None, hash_mb=64):
+        self.workers = workers or os.cpu_count() or 1
+        self.options = {"Hash": hash_mb, "Threads": self.workers}
+
+        self.memory = shared_memory.SharedMemory(create=True, size=TranspositionTable.bytes_for(hash_mb))
+        self.tt = TranspositionTable(hash_mb, self.memory.buf)
+        self.searcher = Searcher(self.tt)
+
+        # Número de la búsqueda en curso, sin bloqueo: un ayudante para en cuanto deja de coincidir con el
+        # suyo, así que uno rezagado de una búsqueda anterior no sigue escribiendo en la tabla
+        self.generation = multiprocessing.RawValue("q", 0)
+        self.pool = None
+        if self.workers > 1:
+            self.pool = multiprocessing.Pool(
+                self.workers - 1, initializer=_init_helper, initargs=(self.memory.name, hash_mb, self.generation)
+            )
+
+    def search(self, board, limit, start, root_moves=None):
+        if self.pool is None:
+            return super().search(board, limit, start, root_moves)
+
+        root = search_board(board).root()
+        budget = time_budget(board, limit)
+        self.generation.value += 1
+        generation = self.generation.value
+        tasks = [
+            self.pool.apply_async(_helper_search, (
+                root.fen(), board.move_stack, board.chess960, budget, limit.depth or 64, limit.nodes, index,
+                generation, root_moves,
+            ))
+            for index in range(1, self.workers)
+        ]
+
+        move, score, depth, pv, nodes = super().search(board, limit, start, root_moves)
+        self.generation.value += 1
+
+        # Quedarse con la búsqueda completa más profunda
+        for task in tasks:
+            try:
+                helper_move, helper_score, helper_depth, helper_pv, helper_nodes = task.get(timeout=1.0)
+            except multiprocessing.TimeoutError:
+                continue
+            nodes += helper_nodes
+            if helper_move and helper_depth > depth:
+                move, score, depth, pv = helper_move, helper_score, helper_depth, helper_pv
+        return move, score, depth, pv, nodes
+
+    def quit(self):
+        if self.pool is not None:
+            self.generation.value += 1
+            self.pool.terminate()
+            self.pool.join()
+            self.pool = None
+        if self.memory is not None:
+            self.searcher = self.tt = None
+            self.memory.close()
+            self.memory.unlink()
+            self.memory = None
@@ -1,11 +1,21 @@
 
 import chess
+import chess.engine
 import subprocess
 import time
 import os
-import sys
 import pygame
 import threading
+import argparse
+
+from analysis_client import AnalysisClient
+from builtin_engine import BuiltinEngine
+from eco import default_classifier
+from engine_watchdog import SupervisedEngine
+from game_board import GameBoard
+from match import ProcessPlayer, play_game
+from opening_tree import OpeningTree
+from result_store import ResultStore
 
 # Colores
 WHITE = (255, 255, 255)
@@ -16,68 +26,129 @@ HIGHLIGHT = (247, 247, 105)
 TEXT_COLOR = (0, 0, 0)
 
 
+def parse_uci_info(line, turn):
+    """Extraer profundidad, nodos y evaluación de una línea 'info' UCI, con las claves de chess.engine"""
+    tokens = line.split()
+    info = {}
+    for i, token in enumerate(tokens[:-1]):
+        value = tokens[i + 1]
+        if token == "depth" and value.isdigit():
+            info["depth"] = int(value)
+        elif token == "nodes" and value.isdigit():
+            info["nodes"] = int(value)
+        elif token == "score" and i + 2 < len(tokens):
+            kind, amount = tokens[i + 1], tokens[i + 2]
+            if kind == "cp":
+                info["score"] = chess.engine.PovScore(chess.engine.Cp(int(amount)), turn)
+            elif kind == "mate":
+                info["score"] = chess.engine.PovScore(chess.engine.Mate(int(amount)), turn)
+    return info
+
+
 class ChessGame:
-    def __init__(self):
+    def __init__(self, result_store=None, opening_tree=None, service=None, watchdog=False):
         # Inicializar pygame
         pygame.init()
         self.screen_width = 800
         self.screen_height = 850
         self.square_size = self.screen_width // 8
         self.screen = pygame.display.set_mode((self.screen_width, self.screen_height))
-        pygame.display.set_caption("Stockfish vs Crafty")
 
         # Fuente para el texto
         self.font = pygame.font.SysFont("Arial", 24)
 
-        # Tablero de ajedrez
-        self.board = chess.Board()
-
-        # Rutas de los motores - comprobar varias ubicaciones posibles
-        self.stockfish_paths = [
-            "/usr/games/stockfish",
-            "/usr/bin/stockfish",
-            "/usr/local/bin/stockfish"
-        ]
-
-        self.crafty_paths = [
-            "/usr/games/crafty",
-            "/usr/bin/crafty",
-            "/usr/local/bin/crafty"
-        ]
-
-        # Probar cada ruta
-        self.stockfish_path = None
-        for path in self.stockfish_paths:
-            if os.path.exists(path):
-                self.stockfish_path = path
-                break
-
-        self.crafty_path = None
-        for path in self.crafty_paths:
-            if os.path.exists(path):
-                self.crafty_path = path
-                break
-
-        # Verificar que se encontraron los motores
-        if not self.stockfish_path:
-            print("Error: No se encontró Stockfish en el sistema")
-            print("Intenta instalarlo con: sudo apt-get install stockfish")
-            pygame.quit()
-            sys.exit()
+        # Tablero de ajedrez (detecta el fin de la partida de forma incremental)
+        self.board = GameBoard()
+
+        if service:
+            # Las dos partes piden sus jugadas al servicio de análisis compartido en lugar de abrir motores
+            white = AnalysisClient("Servicio (blancas)", service)
+            black = AnalysisClient("Servicio (negras)", service)
+        else:
+            # Rutas de los motores - comprobar varias ubicaciones posibles
+            self.stockfish_paths = [
+                "/usr/games/stockfish",
+                "/usr/bin/stockfish",
+                "/usr/local/bin/stockfish"
+            ]
 
-        if not self.crafty_path:
-            print("Error: No se encontró crafty en el sistema")
-            print("Intenta instalarlo con: sudo apt-get install crafty")
-            pygame.quit()
-            sys.exit()
+            self.crafty_paths = [
+                "/usr/games/crafty",
+                "/usr/bin/crafty",
+                "/usr/local/bin/crafty"
+            ]
+
+            # Probar cada ruta
+            self.stockfish_path = None
+            for path in self.stockfish_paths:
+                if os.path.exists(path):
+                    self.stockfish_path = path
+                    break
+
+            self.crafty_path = None
+            for path in self.crafty_paths:
+                if os.path.exists(path):
+                    self.crafty_path = path
+                    break
+
+            # Verificar que se encontraron los motores; si falta alguno, juega el motor integrado
+            if self.stockfish_path and watchdog:
+                # Motor persistente que se reinicia si se cuelga o se cae, en lugar de un proceso por jugada
+                print(f"Stockfish encontrado en: {self.stockfish_path} (vigilado)")
+                white = SupervisedEngine("Stockfish", self.stockfish_path, "uci")
+            elif self.stockfish_path:
+                print(f"Stockfish encontrado en: {self.stockfish_path}")
+                white = ProcessPlayer(
+                    "Stockfish", self.get_stockfish_move, lambda: self.last_info,
+                    options={"path": self.stockfish_path, "movetime": 1000},
+                )
+            else:
+                print("Error: No se encontró Stockfish en el sistema")
+                print("Intenta instalarlo con: sudo apt-get install stockfish")
+                print("Se usará el motor integrado en su lugar")
+                white = BuiltinEngine()
+
+            if self.crafty_path and watchdog:
+                print(f"Crafty encontrado en: {self.crafty_path} (vigilado)")
+                black = SupervisedEngine("Crafty", self.crafty_path, "xboard")
+            elif self.crafty_path:
+                print(f"Crafty encontrado en: {self.crafty_path}")
+                black = ProcessPlayer(
+                    "Crafty", self.get_crafty_move, lambda: self.last_info,
+                    options={"path": self.crafty_path, "st": 1.0},
+                )
+            else:
+                print("Error: No se encontró crafty en el sistema")
+                print("Intenta instalarlo con: sudo apt-get install crafty")
+                print("Se usará el motor integrado en su lugar")
+                black = BuiltinEngine()
 
-        print(f"Stockfish encontrado en: {self.stockfish_path}")
-        print(f"Crafty encontrado en: {self.crafty_path}")
+        self.players = {chess.WHITE: white, chess.BLACK: black}
+        pygame.display.set_caption(f"{white.name} vs {black.name}")
 
         # Estado del juego
         self.info_text = "Iniciando juego..."
         self.running = True
         self.last_move = None
+        self.last_info = {}
+        self.clock = pygame.time.Clock()
+
+        # Base de datos de resultados (opcional)
+        self.result_store = result_store
+        self.game_id = None
+        if self.result_store:
+            self.engine_ids = {
+                player.name: self.result_store.register_engine(player.name, player.options, player.version)
+                for player in self.players.values()
+            }
+            for player in self.players.values():
+                if isinstance(player, SupervisedEngine):
+                    player.on_restart = self.record_restart
+
+        # Árbol de aperturas (opcional): se consulta en cada turno y se actualiza al final
+        self.opening_tree = opening_tree
+        self.evals = []
+        self.times = []
 
     def draw_board(self):
         # Dibujar el tablero
@@ -170,6 +241,7 @@ class ChessGame:
 
     def get_stockfish_move(self, fen, time_limit=1000):
         """Obtener un movimiento de Stockfish usando comunicación directa"""
+        self.last_info = {}
         try:
             # Iniciar Stockfish como subproceso
             process = subprocess.Popen(
@@ -199,6 +271,8 @@ class ChessGame:
             while time.time() - start_time < (time_limit / 1000) + 1:
                 if process.stdout.readable():
                     line = process.stdout.readline().strip()
+                    if line.startswith("info") and " score " in line:
+                        self.last_info = parse_uci_info(line, self.board.turn)
                     if line.startswith("bestmove"):
                         best_move = line.split()[1]
                         break
@@ -216,6 +290,7 @@ class ChessGame:
 
     def get_crafty_move(self, fen, time_limit=1000):
         """Obtener un movimiento de crafty usando xboard"""
+        self.last_info = {}
         try:
             # Iniciar crafty como subproceso
             process = subprocess.Popen(
@@ -290,6 +365,8 @@ class ChessGame:
                 start_time = time.time()
                 while time.time() - start_time < (time_limit / 1000) + 1:
                     line = process.stdout.readline().strip()
+                    if line.startswith("info") and " score " in line:
+                        self.last_info = parse_uci_info(line, self.board.turn)
                     if line.startswith("bestmove"):
                         return chess.Move.from_uci(line.split()[1])
 
@@ -297,110 +374,95 @@ class ChessGame:
             except Exception as e:
                 print(f"Error en enfoque alternativo: {e}")
 
-            # En caso de fallo, usar un movimiento legal aleatorio
-            legal_moves = list(self.board.legal_moves)
-            if legal_moves:
-                import random
-                return random.choice(legal_moves)
-
+            # En caso de fallo, la partida sigue con el motor integrado
             return None
         except Exception as e:
             print(f"Error al obtener movimiento de crafty: {e}")
             return None
 
+    def record_restart(self, player, reason, latency):
+        """Guardar en la base de datos un reinicio de un motor vigilado"""
+        self.result_store.record_restart(self.engine_ids[player.name], reason, latency)
+
+    def record_move(self, player, move, san_move, time_spent, info):
+        """Guardar una jugada en la base de datos de resultados, si hay una"""
+        if self.result_store:
+            self.result_store.record_move(
+                self.game_id, len(self.board.move_stack), self.engine_ids[player],
+                san_move, move.uci(), time_spent, info
+            )
+
+    def poll_events(self):
+        """Atender los eventos de la ventana; devuelve True si hay que detener la partida"""
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                self.running = False
+        self.clock.tick(30)
+        return not self.running
+
+    def show_turn(self, board, player):
+        color = "blancas" if board.turn == chess.WHITE else "negras"
+        self.info_text = f"Turno de {player.name} ({color}), pensando..."
+        if self.opening_tree:
+            known = self.opening_tree.format_moves(board)
+            if known:
+                self.info_text += f" Árbol: {known}"
+        self.update_display()
+
+    def show_move(self, board, player, move, san_move, time_spent, info):
+        self.last_move = move
+        self.record_move(player.name, move, san_move, time_spent, info)
+        self.evals.append(info.get("score"))
+        self.times.append(time_spent)
+
+        next_player = self.players[board.turn].name
+        self.info_text = f"Último movimiento: {san_move} | Turno: {next_player}"
+        self.update_display()
+
+        # Pausa para ver el movimiento
+        time.sleep(0.5)
+
     def start_game(self):
         try:
             print("Iniciando juego...")
             self.info_text = "Iniciando juego..."
             self.update_display()
 
-            # Bucle principal
-            clock = pygame.time.Clock()
-            current_player = "Stockfish"
-
-            while not self.board.is_game_over() and self.running:
-                for event in pygame.event.get():
-                    if event.type == pygame.QUIT:
-                        self.running = False
-
-                if self.running:
-                    try:
-                        # Obtener FEN actual
-                        current_fen = self.board.fen()
-
-                        if current_player == "Stockfish":
-                            self.info_text = f"Turno de Stockfish (blancas), pensando..."
-                            self.update_display()
-
-                            move = self.get_stockfish_move(current_fen)
-                            if not move or move not in self.board.legal_moves:
-                                print("Stockfish devolvió un movimiento inválido o ninguno")
-                                # Usar un movimiento legal aleatorio
-                                legal_moves = list(self.board.legal_moves)
-                                if legal_moves:
-                                    import random
-                                    move = random.choice(legal_moves)
-                                else:
-                                    break
-
-                            current_player = "Crafty"
-                        else:
-                            self.info_text = f"Turno de Crafty (negras), pensando..."
-                            self.update_display()
-
-                            move = self.get_crafty_move(current_fen)
-                            if not move or move not in self.board.legal_moves:
-                                print("Crafty devolvió un movimiento inválido o ninguno")
-                                # Usar un movimiento legal aleatorio
-                                legal_moves = list(self.board.legal_moves)
-                                if legal_moves:
-                                    import random
-                                    move = random.choice(legal_moves)
-                                else:
-                                    break
-
-                            current_player = "Stockfish"
-
-                        # Realizar movimiento
-                        self.last_move = move
-                        san_move = self.board.san(move)
-                        self.board.push(move)
-
-                        move_text = f"{san_move}"
-                        self.info_text = f"Último movimiento: {move_text} | Turno: {current_player}"
-                        self.update_display()
-
-                        # Pausa para ver el movimiento
-                        time.sleep(0.5)
-                    except Exception as e:
-                        print(f"Error en movimiento: {str(e)}")
-                        self.info_text = f"Error: {str(e)}"
-                        self.update_display()
-                        time.sleep(2)
-
-                        # Intentar recuperarse
-                        legal_moves = list(self.board.legal_moves)
-                        if legal_moves:
-                            import random
-                            move = random.choice(legal_moves)
-                            self.last_move = move
-                            self.board.push(move)
-                            self.info_text = f"Recuperado con movimiento aleatorio"
-                            self.update_display()
-                            time.sleep(1)
-                            current_player = "Crafty" if current_player == "Stockfish" else "Stockfish"
-                        else:
-                            break
-
-                clock.tick(30)
+            if self.result_store:
+                self.game_id = self.result_store.start_game(
+                    self.engine_ids[self.players[chess.WHITE].name],
+                    self.engine_ids[self.players[chess.BLACK].name],
+                    self.board.fen(),
+                )
+
+            # Bucle principal: el mismo que usan los torneos sin interfaz
+            play_game(
+                self.players[chess.WHITE], self.players[chess.BLACK], chess.engine.Limit(time=1.0), board=self.board,
+                on_turn=self.show_turn, on_move=self.show_move, should_stop=self.poll_events,
+            )
 
             # Fin del juego
-            if self.board.is_game_over():
-                result = self.board.result()
+            outcome = self.board.outcome()
+            if self.result_store:
+                self.result_store.finish_game(
+                    self.game_id,
+                    outcome.result() if outcome else "*",
+                    outcome.termination.name.lower() if outcome else None,
+                    len(self.board.move_stack),
+                )
+                opening = default_classifier().classify_board(self.board)
+                if opening:
+                    self.result_store.set_opening(self.game_id, *opening)
+            if self.opening_tree:
+                self.opening_tree.add_game(self.board, evals=self.evals, times=self.times)
+                self.opening_tree.save()
+
+            if outcome:
+                result = outcome.result()
                 if result == "1-0":
-                    winner = "Stockfish (blancas)"
+                    winner = f"{self.players[chess.WHITE].name} (blancas)"
                 elif result == "0-1":
-                    winner = "Crafty (negras)"
+                    winner = f"{self.players[chess.BLACK].name} (negras)"
                 else:
                     winner = "Empate"
 
@@ -416,7 +478,7 @@ class ChessGame:
                             self.running = False
                         elif event.type == pygame.KEYDOWN:
                             waiting = False
-                    clock.tick(30)
+                    self.clock.tick(30)
 
         except Exception as e:
             print(f"Error general: {str(e)}")
@@ -425,13 +487,28 @@ class ChessGame:
             time.sleep(5)
 
         finally:
+            for player in self.players.values():
+                if isinstance(player, SupervisedEngine):
+                    print(player.format_stats())
+                player.quit()
             pygame.quit()
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stockfish vs Crafty")
+    parser.add_argument("--db", help="Guardar partidas y jugadas en esta base de datos SQLite")
+    parser.add_argument("--tree", help="Árbol de aperturas (.npy) que se muestra y se actualiza con la partida")
+    parser.add_argument("--watchdog", action="store_true", help="Motores persistentes que se reinician si se cuelgan")
+    parser.add_argument("--service", metavar="URL", help="Pedir las jugadas a un servicio de análisis (analysis_service.py)")
+    args = parser.parse_args()
+
+    result_store = ResultStore(args.db) if args.db else None
     try:
-        game = ChessGame()
+        game = ChessGame(result_store, OpeningTree(args.tree) if args.tree else None, args.service, args.watchdog)
         game.start_game()
     except Exception as e:
         print(f"Error de inicialización: {str(e)}")
-        pygame.quit()
\ No newline at end of file
+        pygame.quit()
+    finally:
+        if result_store:
+            result_store.close()
\ No newline at end of file
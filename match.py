@@ -0,0 +1,119 @@
+import time
+
+import chess
+import chess.engine
+
+from builtin_engine import BuiltinEngine
+from game_board import GameBoard
+
+# Motor integrado que juega cuando un motor falla o devuelve un movimiento ilegal.
+# Con 100 ms solo llega a profundidad 1-2 en el medio juego; con 500 ms, al menos a 3
+FALLBACK_LIMIT = chess.engine.Limit(time=0.5)
+_fallback_engine = None
+
+
+class ProcessPlayer:
+    """Adaptar una función fen -> movimiento (milisegundos de límite) a la interfaz play() de chess.engine"""
+
+    version = None
+
+    def __init__(self, name, get_move, get_info=None, options=None):
+        self.name = name
+        self.get_move = get_move
+        self.get_info = get_info
+        self.options = options or {}
+
+    def play(self, board, limit, info=chess.engine.INFO_NONE):
+        time_limit = int((limit.time or 1.0) * 1000)
+        move = self.get_move(board.fen(), time_limit)
+        return chess.engine.PlayResult(move, None, self.get_info() if self.get_info else {})
+
+    def quit(self):
+        pass
+
+
+def fallback_move(board):
+    """Jugada del motor integrado con FALLBACK_LIMIT, para cuando un motor falla"""
+    global _fallback_engine
+    if _fallback_engine is None:
+        _fallback_engine = BuiltinEngine()
+    return _fallback_engine.play(board, FALLBACK_LIMIT).move
+
+
+def play_game(white, black, limit, board=None, on_turn=None, on_move=None, should_stop=None, fallback=fallback_move,
+              book=None):
+    """Jugar una partida entre dos jugadores con play(board, limit) sin interfaz gráfica
+
+    on_turn(board, player) se llama antes de cada jugada, on_move(board, player, move, san, time_spent, info)
+    después, y should_stop() permite interrumpir la partida. Con un libro Polyglot (book, un lector de
+    chess.polyglot), las posiciones que están en él se juegan sin preguntar al motor. Devuelve el tablero final.
+    """
+    board = board if board is not None else GameBoard()
+    players = {chess.WHITE: white, chess.BLACK: black}
+
+    while not board.is_game_over():
+        if should_stop and should_stop():
+            break
+
+        player = players[board.turn]
+        if on_turn:
+            on_turn(board, player)
+
+        move_start = time.time()
+        entry = book.get(board) if book is not None else None
+        if entry is not None:
+            move, info = entry.move, {}
+        else:
+            try:
+                result = player.play(board, limit, info=chess.engine.INFO_ALL)
+                move, info = result.move, result.info
+            except (chess.engine.EngineError, chess.engine.EngineTerminatedError, OSError) as e:
+                print(f"Error al obtener movimiento de {player.name}: {e}")
+                move, info = None, {}
+        time_spent = time.time() - move_start
+
+        if not move or move not in board.legal_moves:
+            print(f"{player.name} devolvió un movimiento inválido o ninguno")
+            move, info = fallback(board), {}
+            if move is None:
+                break
+
+        san_move = board.san(move)
+        board.push(move)
+        if on_move:
+            on_move(board, player, move, san_move, time_spent, info)
+
+    return board
+
+
+class EnginePlayer:
+    """Motor UCI o xboard persistente abierto con chess.engine"""
+
+    def __init__(self, name, command, protocol="uci", options=None):
+        self.name = name
+        self.command = command
+        self.protocol = protocol
+        self.options = options or {}
+        self.open()
+
+    def open(self):
+        """Lanzar el proceso del motor y aplicarle las opciones"""
+        if self.protocol == "xboard":
+            self.engine = chess.engine.SimpleEngine.popen_xboard(self.command)
+        else:
+            self.engine = chess.engine.SimpleEngine.popen_uci(self.command)
+        if self.options:
+            self.engine.configure(self.options)
+        self.version = self.engine.id.get("name")
+
+    def play(self, board, limit, info=chess.engine.INFO_NONE):
+        return self.engine.play(board, limit, info=info)
+
+    def analyse(self, board, limit, **kwargs):
+        return self.engine.analyse(board, limit, **kwargs)
+
+    def quit(self):
+        try:
+            self.engine.quit()
+        except (chess.engine.EngineError, chess.engine.EngineTerminatedError):
+            pass
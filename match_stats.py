@@ -0,0 +1,195 @@
+import math
+
+import numpy as np
+
+# Puntuación de cada casilla del pentanomio: 0, 0.5, 1, 1.5 y 2 puntos en un par de partidas
+PENTANOMIAL_SCORES = np.array([0.0, 0.25, 0.5, 0.75, 1.0])
+WDL_SCORES = np.array([1.0, 0.5, 0.0])
+
+# Cuantil de la normal para intervalos de confianza del 95%
+Z_95 = 1.959963984540054
+
+
+def erf(x):
+    """Función de error vectorizada (Abramowitz y Stegun 7.1.26, error < 1.5e-7)"""
+    sign = np.sign(x)
+    x = np.abs(x)
+    t = 1.0 / (1.0 + 0.3275911 * x)
+    poly = t * (0.254829592 + t * (-0.284496736 + t * (1.421413741 + t * (-1.453152027 + t * 1.061405429))))
+    return sign * (1.0 - poly * np.exp(-x * x))
+
+
+def score_to_elo(score):
+    """Convertir una puntuación media (0..1) en diferencia de Elo"""
+    score = np.clip(score, 1e-6, 1 - 1e-6)
+    return -400.0 * np.log10(1.0 / score - 1.0)
+
+
+def elo_to_score(elo):
+    """Puntuación esperada para una diferencia de Elo"""
+    return 1.0 / (1.0 + 10.0 ** (-np.asarray(elo, dtype=float) / 400.0))
+
+
+def mean_variance(counts, scores):
+    """Número de muestras, media y varianza por fila a partir de conteos por resultado"""
+    n = counts.sum(axis=1)
+    probabilities = counts / np.maximum(n, 1)[:, None]
+    mean = probabilities @ scores
+    variance = (probabilities * (scores[None, :] - mean[:, None]) ** 2).sum(axis=1)
+    return n, mean, variance
+
+
+def elo_interval(counts, scores):
+    """Elo y margen de error del 95% a partir de conteos por resultado (una fila por emparejamiento)"""
+    n, mean, variance = mean_variance(counts, scores)
+    stderr = np.sqrt(variance / np.maximum(n, 1))
+
+    elo = score_to_elo(mean)
+    lower = score_to_elo(mean - Z_95 * stderr)
+    upper = score_to_elo(mean + Z_95 * stderr)
+    return elo, (upper - lower) / 2, mean, variance
+
+
+class MatchStats:
+    """Contadores incrementales de resultados por emparejamiento de motores
+
+    Cada partida suma en O(1); las estadísticas de todos los emparejamientos se calculan
+    de una vez con operaciones vectorizadas, así se pueden recalcular tras cada partida.
+    """
+
+    def __init__(self, capacity=16):
+        self.pairings = []
+        self._index = {}
+        self._pending = {}
+        # Victorias, tablas y derrotas del primer motor de cada emparejamiento
+        self.wdl = np.zeros((capacity, 3), dtype=np.int64)
+        # Pares de partidas con colores invertidos: 0, 0.5, 1, 1.5 o 2 puntos
+        self.pentanomial = np.zeros((capacity, 5), dtype=np.int64)
+
+    def _pairing(self, engine_a, engine_b):
+        # Guardar siempre en el mismo orden; devuelve el índice y si hay que invertir la puntuación
+        key, flipped = ((engine_a, engine_b), False) if engine_a <= engine_b else ((engine_b, engine_a), True)
+        index = self._index.get(key)
+        if index is None:
+            index = len(self.pairings)
+            if index == len(self.wdl):
+                self.wdl = np.concatenate([self.wdl, np.zeros_like(self.wdl)])
+                self.pentanomial = np.concatenate([self.pentanomial, np.zeros_like(self.pentanomial)])
+            self._index[key] = index
+            self.pairings.append(key)
+        return index, flipped
+
+    def add_game(self, engine_a, engine_b, score, pair_id=None):
+        """Sumar una partida: score es la puntuación de engine_a (1, 0.5 o 0)
+
+        Las dos partidas con el mismo pair_id (colores invertidos) cuentan además en el pentanomio.
+        """
+        index, flipped = self._pairing(engine_a, engine_b)
+        if flipped:
+            score = 1.0 - score
+        self.wdl[index, 0 if score == 1 else 1 if score == 0.5 else 2] += 1
+
+        if pair_id is not None:
+            first = self._pending.pop((index, pair_id), None)
+            if first is None:
+                self._pending[(index, pair_id)] = score
+            else:
+                self.pentanomial[index, int(round((first + score) * 2))] += 1
+
+    def summary(self):
+        """Estadísticas de todos los emparejamientos, cada una como arreglo en el orden de self.pairings"""
+        count = len(self.pairings)
+        wdl = self.wdl[:count].astype(float)
+        pentanomial = self.pentanomial[:count].astype(float)
+        wins, draws, losses = wdl.T
+        games = wdl.sum(axis=1)
+
+        elo, elo_error, score, _ = elo_interval(wdl, WDL_SCORES)
+        penta_elo, penta_error, _, _ = elo_interval(pentanomial, PENTANOMIAL_SCORES)
+
+        # Probabilidad de superioridad: solo cuentan las partidas decisivas
+        decisive = wins + losses
+        los = 0.5 * (1.0 + erf((wins - losses) / np.sqrt(2.0 * np.maximum(decisive, 1))))
+
+        return {
+            "games": games.astype(np.int64),
+            "wins": wins.astype(np.int64),
+            "draws": draws.astype(np.int64),
+            "losses": losses.astype(np.int64),
+            "score": score,
+            "draw_ratio": draws / np.maximum(games, 1),
+            "elo": elo,
+            "elo_error": elo_error,
+            "los": los,
+            "pairs": pentanomial.sum(axis=1).astype(np.int64),
+            "pentanomial": self.pentanomial[:count].copy(),
+            "pentanomial_elo": penta_elo,
+            "pentanomial_error": penta_error,
+        }
+
+    def report(self, engine_a, engine_b):
+        """Estadísticas de un emparejamiento desde el punto de vista de engine_a"""
+        index, flipped = self._pairing(engine_a, engine_b)
+        row = {name: values[index] for name, values in self.summary().items()}
+        if flipped:
+            row["wins"], row["losses"] = row["losses"], row["wins"]
+            row["score"] = 1.0 - row["score"]
+            row["elo"] = -row["elo"]
+            row["los"] = 1.0 - row["los"]
+            row["pentanomial"] = row["pentanomial"][::-1]
+            row["pentanomial_elo"] = -row["pentanomial_elo"]
+        return row
+
+    def format_report(self, engine_a, engine_b):
+        """Resumen en una línea, para mostrar mientras llegan resultados"""
+        row = self.report(engine_a, engine_b)
+        return (
+            f"{engine_a} vs {engine_b}: +{row['wins']} ={row['draws']} -{row['losses']} "
+            f"Elo {row['elo']:+.1f} ± {row['elo_error']:.1f} | LOS {row['los'] * 100:.1f}% "
+            f"| Tablas {row['draw_ratio'] * 100:.1f}% | Pentanomio {row['pentanomial'].tolist()}"
+        )
+
+
+class SPRT:
+    """Test secuencial de razón de probabilidades entre las hipótesis elo0 (H0) y elo1 (H1)
+
+    Usa la aproximación normal del GSPRT sobre los pares de partidas (pentanomio) si los hay,
+    o sobre las partidas sueltas (trinomio) si no.
+    """
+
+    def __init__(self, elo0=0.0, elo1=5.0, alpha=0.05, beta=0.05):
+        self.elo0 = elo0
+        self.elo1 = elo1
+        self.alpha = alpha
+        self.beta = beta
+        self.lower = math.log(beta / (1 - alpha))
+        self.upper = math.log((1 - beta) / alpha)
+        self.score0 = float(elo_to_score(elo0))
+        self.score1 = float(elo_to_score(elo1))
+
+    def llr(self, counts, scores):
+        """Logaritmo de la razón de verosimilitud por fila de conteos"""
+        n, mean, variance = mean_variance(np.atleast_2d(counts).astype(float), scores)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            llr = (self.score1 - self.score0) * (2 * mean - self.score0 - self.score1) * n / (2 * variance)
+        return np.where(variance > 0, llr, 0.0)
+
+    def evaluate(self, stats, engine_a, engine_b):
+        """Devolver (llr, decisión) para engine_a frente a engine_b: 'H1', 'H0' o None si hay que seguir"""
+        row = stats.report(engine_a, engine_b)
+        if row["pairs"]:
+            llr = float(self.llr(row["pentanomial"], PENTANOMIAL_SCORES)[0])
+        else:
+            counts = np.array([row["wins"], row["draws"], row["losses"]])
+            llr = float(self.llr(counts, WDL_SCORES)[0])
+
+        if llr >= self.upper:
+            return llr, "H1"
+        if llr <= self.lower:
+            return llr, "H0"
+        return llr, None
+
+    def format_status(self, llr, decision):
+        bounds = f"[{self.lower:.2f}, {self.upper:.2f}]"
+        status = {"H1": "aceptado H1", "H0": "aceptado H0", None: "continuar"}[decision]
+        return f"SPRT elo0={self.elo0:g} elo1={self.elo1:g}: LLR {llr:.2f} {bounds} -> {status}"
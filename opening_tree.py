@@ -0,0 +1,180 @@
+import argparse
+import os
+import struct
+
+import chess
+import chess.pgn
+import chess.polyglot
+import numpy as np
+
+from game_archive import RESULTS, GameArchive
+from game_board import GameBoard
+
+# Una fila por (posición, jugada). Puntos en medios puntos para el bando que mueve;
+# evaluación (centipeones, punto de vista del que mueve) y tiempo en milisegundos como sumas
+ENTRY_DTYPE = np.dtype([
+    ("key", "<u8"),
+    ("move", "<u2"),
+    ("count", "<u4"),
+    ("points", "<u4"),
+    ("eval_sum", "<i8"),
+    ("eval_count", "<u4"),
+    ("time_ms", "<u8"),
+])
+
+MATE_SCORE = 10000
+POLYGLOT_ENTRY = struct.Struct(">QHHI")
+
+
+def polyglot_move(board, move):
+    """Codificar un movimiento como en Polyglot: el enroque como rey que toma su torre"""
+    to_square = move.to_square
+    # En ajedrez normal python-chess da el enroque como e1g1; en Chess960 ya va a la casilla de la torre
+    if board.is_castling(move) and not board.rooks & board.occupied_co[board.turn] & chess.BB_SQUARES[to_square]:
+        rook_file = 7 if board.is_kingside_castling(move) else 0
+        to_square = chess.square(rook_file, chess.square_rank(move.from_square))
+    promotion = move.promotion - 1 if move.promotion else 0
+    return to_square | move.from_square << 6 | promotion << 12
+
+
+def decode_polyglot_move(board, code):
+    move = chess.Move(code >> 6 & 63, code & 63, (code >> 12) + 1 if code >> 12 else None)
+    # Rey que toma su torre: en ajedrez normal, de vuelta a la casilla de destino del rey
+    king = board.kings & chess.BB_SQUARES[move.from_square]
+    takes_own_rook = board.rooks & board.occupied_co[board.turn] & chess.BB_SQUARES[move.to_square]
+    if not board.chess960 and king and takes_own_rook:
+        king_file = 6 if move.to_square > move.from_square else 2
+        move = chess.Move(move.from_square, chess.square(king_file, chess.square_rank(move.from_square)))
+    return move
+
+
+class OpeningTree:
+    """Árbol de aperturas: para cada posición, las jugadas hechas con partidas, puntuación,
+    evaluación media y tiempo medio
+
+    Se actualiza al terminar cada partida y se guarda como arreglo .npy ordenado por clave Zobrist.
+    """
+
+    def __init__(self, path=None, max_plies=30):
+        self.path = path
+        self.max_plies = max_plies
+        # clave Zobrist -> {jugada Polyglot: [partidas, medios puntos, suma eval, evals, ms]}
+        self.nodes = {}
+        if path and os.path.exists(path):
+            for row in np.load(path).tolist():
+                self.nodes.setdefault(row[0], {})[row[1]] = list(row[2:])
+
+    def add_game(self, board, result=None, evals=None, times=None):
+        """Sumar una partida terminada (tablero con su pila de jugadas)
+
+        Sin result se toma el del tablero; las partidas sin resultado no cuentan. evals y times son
+        listas por jugada: evaluación de chess.engine (PovScore o None) y segundos usados.
+        """
+        if result is None:
+            outcome = board.outcome()
+            result = outcome.result() if outcome else "*"
+        if result not in ("1-0", "0-1", "1/2-1/2"):
+            return
+        winner = {"1-0": chess.WHITE, "0-1": chess.BLACK}.get(result)
+        replay = GameBoard(board.root().fen(), chess960=board.chess960)
+        for ply, move in enumerate(board.move_stack[:self.max_plies]):
+            stats = self.nodes.setdefault(replay.zobrist_key(), {}).setdefault(
+                polyglot_move(replay, move), [0, 0, 0, 0, 0]
+            )
+            stats[0] += 1
+            stats[1] += 1 if winner is None else 2 if winner == replay.turn else 0
+            score = evals[ply] if evals and ply < len(evals) else None
+            if score is not None:
+                stats[2] += score.relative.score(mate_score=MATE_SCORE)
+                stats[3] += 1
+            if times and ply < len(times):
+                stats[4] += int(times[ply] * 1000)
+            replay.push(move)
+
+    def moves(self, board):
+        """Jugadas conocidas de una posición, de la más jugada a la menos"""
+        key = board.zobrist_key() if isinstance(board, GameBoard) else chess.polyglot.zobrist_hash(board)
+        rows = []
+        for code, (count, points, eval_sum, eval_count, time_ms) in self.nodes.get(key, {}).items():
+            rows.append({
+                "move": decode_polyglot_move(board, code),
+                "games": count,
+                "score": points / (2 * count),
+                "eval": eval_sum / eval_count if eval_count else None,
+                "time": time_ms / count / 1000,
+            })
+        return sorted(rows, key=lambda row: -row["games"])
+
+    def format_moves(self, board, limit=3):
+        """Resumen en una línea de las jugadas más frecuentes, para la interfaz"""
+        parts = []
+        for row in self.moves(board)[:limit]:
+            evaluation = f" {row['eval'] / 100:+.2f}" if row["eval"] is not None else ""
+            parts.append(f"{board.san(row['move'])} {row['games']}p {row['score'] * 100:.0f}%{evaluation}")
+        return " | ".join(parts)
+
+    def to_array(self):
+        entries = np.array(
+            [(key, code, *stats) for key, moves in self.nodes.items() for code, stats in moves.items()],
+            dtype=ENTRY_DTYPE,
+        )
+        return np.sort(entries, order=["key", "move"])
+
+    def save(self, path=None):
+        path = path or self.path
+        # np.save añade .npy si falta, así que el temporal ya lo lleva
+        temporary = path + ".tmp.npy"
+        np.save(temporary, self.to_array())
+        os.replace(temporary, path)
+
+    def export_polyglot(self, path, min_games=2):
+        """Escribir un libro Polyglot .bin (legible con chess.polyglot); el peso son los medios puntos"""
+        entries = self.to_array()
+        entries = entries[(entries["count"] >= min_games) & (entries["points"] > 0)]
+        # Polyglot ordena por clave; dentro de cada posición, primero la jugada de más peso
+        entries = entries[np.lexsort((-entries["points"].astype(np.int64), entries["key"]))]
+        with open(path, "wb") as f:
+            for key, move, points in zip(entries["key"].tolist(), entries["move"].tolist(), entries["points"].tolist()):
+                f.write(POLYGLOT_ENTRY.pack(key, move, min(points, 0xFFFF), 0))
+        return len(entries)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Árbol de aperturas a partir de partidas jugadas")
+    parser.add_argument("tree", help="Archivo .npy del árbol")
+    parser.add_argument("--pgn", help="Añadir las partidas de este PGN")
+    parser.add_argument("--archive", help="Añadir las partidas de este archivo binario")
+    parser.add_argument("--max-plies", type=int, default=30)
+    parser.add_argument("--polyglot", help="Exportar un libro Polyglot .bin")
+    parser.add_argument("--min-games", type=int, default=2)
+    parser.add_argument("--show", metavar="FEN", help="Mostrar las jugadas de una posición")
+    args = parser.parse_args()
+
+    tree = OpeningTree(args.tree, args.max_plies)
+    added = 0
+    if args.pgn:
+        with open(args.pgn, encoding="utf-8", errors="replace") as f:
+            while True:
+                game = chess.pgn.read_game(f)
+                if game is None:
+                    break
+                tree.add_game(game.end().board(), game.headers.get("Result"))
+                added += 1
+    if args.archive:
+        archive = GameArchive(args.archive)
+        for index in range(len(archive)):
+            tree.add_game(archive.board(index), RESULTS[archive.header(index)["result"]])
+            added += 1
+        archive.close()
+    if added:
+        tree.save()
+        print(f"{added} partidas añadidas ({len(tree.nodes)} posiciones)")
+
+    if args.polyglot:
+        print(f"{tree.export_polyglot(args.polyglot, args.min_games)} entradas escritas en {args.polyglot}")
+    if args.show:
+        board = chess.Board(args.show)
+        for row in tree.moves(board):
+            evaluation = f"{row['eval'] / 100:+.2f}" if row["eval"] is not None else "-"
+            print(f"{board.san(row['move']):>8} {row['games']:>7} partidas {row['score'] * 100:5.1f}% "
+                  f"eval {evaluation} tiempo {row['time']:.2f} s")
@@ -0,0 +1,214 @@
+import argparse
+import multiprocessing
+import os
+import queue
+import subprocess
+import threading
+import time
+
+import chess
+
+from game_board import GameBoard
+
+# Posiciones de referencia con sus recuentos conocidos por profundidad (1, 2, 3...)
+KNOWN_POSITIONS = {
+    "inicial": (chess.STARTING_FEN, [20, 400, 8902, 197281, 4865609, 119060324]),
+    "kiwipete": (
+        "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+        [48, 2039, 97862, 4085603, 193690690],
+    ),
+    "posicion3": ("8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1", [14, 191, 2812, 43238, 674624, 11030083]),
+    "posicion4": (
+        "r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1",
+        [6, 264, 9467, 422333, 15833292],
+    ),
+    "posicion5": ("rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8", [44, 1486, 62379, 2103487, 89941194]),
+    "posicion6": (
+        "r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10",
+        [46, 2079, 89890, 3894594, 164075551],
+    ),
+}
+
+# Tabla de transposición de cada proceso: (clave Zobrist, profundidad) -> nodos
+_tt = None
+
+
+def perft(board, depth, tt=None, tt_size=0):
+    """Contar las hojas legales a depth jugadas; en la última solo se cuentan las jugadas (sin hacerlas)"""
+    if depth == 0:
+        return 1
+    if depth == 1:
+        return board.legal_moves.count()
+    if tt is not None:
+        key = (board.zobrist_key(), depth)
+        nodes = tt.get(key)
+        if nodes is not None:
+            return nodes
+
+    nodes = 0
+    for move in board.legal_moves:
+        board.push(move)
+        nodes += perft(board, depth - 1, tt, tt_size)
+        board.pop()
+
+    if tt is not None:
+        # Tabla llena: se vacía y vuelve a empezar
+        if len(tt) >= tt_size:
+            tt.clear()
+        tt[key] = nodes
+    return nodes
+
+
+def _init_worker(tt_size):
+    global _tt
+    _tt = {} if tt_size else None
+
+
+def _perft_root_move(fen, uci, depth, tt_size):
+    board = GameBoard(fen)
+    board.push(chess.Move.from_uci(uci))
+    return uci, perft(board, depth - 1, _tt, tt_size)
+
+
+def divide(fen, depth, workers=1, tt_size=0):
+    """Recuento por jugada de la raíz, repartiendo las jugadas entre procesos; devuelve {uci: nodos}"""
+    if depth < 1:
+        raise ValueError("La profundidad de divide tiene que ser al menos 1")
+    board = GameBoard(fen)
+    moves = [move.uci() for move in board.legal_moves]
+    if workers <= 1:
+        _init_worker(tt_size)
+        return dict(_perft_root_move(fen, uci, depth, tt_size) for uci in moves)
+    with multiprocessing.Pool(workers, initializer=_init_worker, initargs=(tt_size,)) as pool:
+        tasks = [pool.apply_async(_perft_root_move, (fen, uci, depth, tt_size)) for uci in moves]
+        return dict(task.get() for task in tasks)
+
+
+def engine_perft(command, fen, depth, timeout=600):
+    """Ejecutar 'go perft' en un motor UCI (formato de Stockfish); devuelve ({uci: nodos}, total)"""
+    process = subprocess.Popen(
+        [command], stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True, bufsize=1,
+    )
+    # Las líneas se leen en otro hilo para poder esperar con plazo aunque el motor no escriba nada
+    lines = queue.Queue()
+
+    def read():
+        for line in process.stdout:
+            lines.put(line)
+        lines.put(None)
+
+    threading.Thread(target=read, daemon=True).start()
+    try:
+        process.stdin.write(f"uci\nisready\nposition fen {fen}\ngo perft {depth}\n")
+        process.stdin.flush()
+        counts = {}
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                line = lines.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                raise TimeoutError(f"El motor {command} no terminó go perft en {timeout} s")
+            if line is None:
+                raise RuntimeError(f"El motor {command} no devolvió el resultado de go perft")
+            line = line.strip()
+            if line.startswith("Nodes searched"):
+                return counts, int(line.split(":")[1])
+            move, separator, nodes = line.partition(":")
+            if separator and nodes.strip().isdigit():
+                counts[move.strip()] = int(nodes)
+    finally:
+        try:
+            process.stdin.write("quit\n")
+            process.stdin.flush()
+        except OSError:
+            pass
+        try:
+            process.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+
+
+def compare_divide(board, ours, theirs):
+    """Jugadas de la raíz cuyo recuento no coincide: [(san, nuestro, del motor)]"""
+    differences = []
+    for uci in sorted(set(ours) | set(theirs)):
+        if ours.get(uci) != theirs.get(uci):
+            move = chess.Move.from_uci(uci)
+            san = board.san(move) if board.is_legal(move) else uci
+            differences.append((san, ours.get(uci), theirs.get(uci)))
+    return differences
+
+
+def run(fen, depth, workers=1, tt_size=0, expected=None, engine=None, show_divide=False, engine_timeout=600):
+    """Perft de una posición con su informe; devuelve True si coincide con lo esperado y con el motor"""
+    board = GameBoard(fen)
+    start = time.perf_counter()
+    counts = divide(fen, depth, workers, tt_size)
+    elapsed = time.perf_counter() - start
+    total = sum(counts.values())
+    ok = True
+
+    if show_divide:
+        for uci, nodes in sorted(counts.items()):
+            print(f"  {uci}: {nodes}")
+    line = f"perft({depth}) = {total:,} en {elapsed:.2f} s ({total / max(elapsed, 1e-9):,.0f} nodos/s)"
+    if expected is not None:
+        ok = total == expected
+        line += " correcto" if ok else f" ERROR: se esperaban {expected:,}"
+    print(line)
+
+    if engine:
+        theirs, engine_total = engine_perft(engine, fen, depth, engine_timeout)
+        differences = compare_divide(board, counts, theirs)
+        if engine_total == total and not differences:
+            print(f"  El motor coincide: {engine_total:,}")
+        else:
+            ok = False
+            print(f"  El motor da {engine_total:,}; jugadas distintas (nuestro, motor):")
+            for san, ours, their in differences:
+                print(f"    {san}: {ours}, {their}")
+    return ok
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Perft en paralelo: validar la generación de jugadas y medir su velocidad")
+    parser.add_argument("fen", nargs="?", default=chess.STARTING_FEN)
+    parser.add_argument("--depth", type=int, default=4, help="Profundidad (al menos 1)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Procesos entre los que repartir la raíz")
+    parser.add_argument("--tt", type=int, default=0, metavar="ENTRADAS",
+                        help="Tabla de transposición (Zobrist + profundidad) de este tamaño por proceso")
+    parser.add_argument("--known", action="store_true",
+                        help="Comprobar las posiciones de referencia hasta --depth en vez de la dada")
+    parser.add_argument("--engine", help="Motor UCI con go perft con el que comparar")
+    parser.add_argument("--divide", action="store_true", help="Mostrar el recuento de cada jugada de la raíz")
+    parser.add_argument("--engine-timeout", type=float, default=600, help="Segundos para el go perft del motor")
+    args = parser.parse_args()
+    if args.depth < 1:
+        parser.error("--depth tiene que ser al menos 1")
+
+    try:
+        if args.known:
+            failures = 0
+            for name, (fen, counts) in KNOWN_POSITIONS.items():
+                print(name)
+                for depth in range(1, min(args.depth, len(counts)) + 1):
+                    if not run(fen, depth, args.workers, args.tt, counts[depth - 1], args.engine, args.divide,
+                               args.engine_timeout):
+                        failures += 1
+            print("Todo correcto" if not failures else f"{failures} recuentos incorrectos")
+            raise SystemExit(1 if failures else 0)
+        try:
+            epd = GameBoard(args.fen).epd()
+        except ValueError as e:
+            parser.error(f"FEN no válido: {e}")
+        # Si es una posición de referencia, también se comprueba el recuento
+        expected = next((counts[args.depth - 1] for fen, counts in KNOWN_POSITIONS.values()
+                         if GameBoard(fen).epd() == epd and args.depth <= len(counts)), None)
+        ok = run(args.fen, args.depth, args.workers, args.tt, expected, args.engine, args.divide, args.engine_timeout)
+        raise SystemExit(0 if ok else 1)
+    except (TimeoutError, RuntimeError, OSError) as e:
+        print(f"Error con el motor: {e}")
+        raise SystemExit(1)
+    except KeyboardInterrupt:
+        print("Perft interrumpido")
@@ -0,0 +1,187 @@
+import argparse
+import collections
+import io
+import multiprocessing
+import os
+import time
+
+import chess
+import chess.pgn
+
+from eco import default_classifier
+from game_archive import ArchiveWriter, encode_pgn_game
+from result_store import ResultStore
+
+# Bytes por rango: cada proceso lee un rango entero, así que la memoria depende de esto y no del archivo
+CHUNK_SIZE = 16 << 20
+
+
+def find_boundaries(path, chunk_size=CHUNK_SIZE):
+    """Generar rangos de bytes de unos chunk_size bytes que empiezan al comienzo de una partida
+
+    Una partida empieza en una línea '[' precedida por una línea en blanco (o al principio del archivo).
+    """
+    size = os.path.getsize(path)
+    start = 0
+    with open(path, "rb") as f:
+        while start < size:
+            if start + chunk_size >= size:
+                yield start, size
+                break
+            f.seek(start + chunk_size)
+            f.readline()
+            blank = False
+            while True:
+                offset = f.tell()
+                line = f.readline()
+                if not line:
+                    offset = size
+                    break
+                if blank and line.startswith(b"["):
+                    break
+                blank = not line.strip()
+            yield start, offset
+            start = offset
+
+
+class SanGameBuilder(chess.pgn.GameBuilder):
+    """Construir la partida guardando el SAN de la línea principal tal como viene en el PGN"""
+
+    def begin_game(self):
+        super().begin_game()
+        self.san = []
+        self.depth = 0
+
+    def begin_variation(self):
+        self.depth += 1
+        return super().begin_variation()
+
+    def end_variation(self):
+        self.depth -= 1
+        return super().end_variation()
+
+    def parse_san(self, board, san):
+        move = super().parse_san(board, san)
+        if not self.depth:
+            self.san.append((san, move.uci()))
+        return move
+
+
+def parse_range(task):
+    """Leer las partidas de un rango de bytes (en un proceso aparte)
+
+    Devuelve una lista de (cabeceras, partida codificada para el archivo o None, SAN de las jugadas o None).
+    Con headers_only solo se leen las cabeceras y el resto de cada partida se salta; con eco se
+    clasifican las partidas que no traen la cabecera ECO.
+    """
+    path, start, end, headers_only, want_record, want_san, eco = task
+    with open(path, "rb") as f:
+        f.seek(start)
+        text = io.StringIO(f.read(end - start).decode("utf-8", "replace"))
+
+    games = []
+    if headers_only:
+        while True:
+            headers = chess.pgn.read_headers(text)
+            if headers is None:
+                break
+            games.append((dict(headers), None, None))
+        return games
+
+    while True:
+        builder = SanGameBuilder()
+        game = chess.pgn.read_game(text, Visitor=lambda: builder)
+        if game is None:
+            break
+        if eco and "ECO" not in game.headers:
+            default_classifier().tag(game)
+        record = encode_pgn_game(game) if want_record else None
+        games.append((dict(game.headers), record, builder.san if want_san else None))
+    return games
+
+
+def ingest(path, workers=None, headers_only=False, archive=None, result_store=None, chunk_size=CHUNK_SIZE,
+           max_in_flight=None, eco=False):
+    """Leer un PGN en paralelo y generar, en el orden del archivo, los resultados de cada partida
+
+    Como mucho max_in_flight rangos (por defecto dos por proceso) están a la vez en cola, en
+    lectura o esperando a quien consume el generador. Si se dan archive (ArchiveWriter) o
+    result_store (ResultStore), las partidas se guardan allí a medida que llegan.
+    """
+    workers = workers or os.cpu_count() or 1
+    max_in_flight = max_in_flight or 2 * workers
+    want_record = archive is not None and not headers_only
+    want_san = result_store is not None and not headers_only
+
+    def results(games):
+        for headers, record, san in games:
+            if archive is not None and record is not None:
+                archive.add_record(record)
+            if result_store is not None:
+                store_game(result_store, headers, san)
+            yield headers
+
+    with multiprocessing.Pool(workers) as pool:
+        # Los rangos se entregan en orden aunque terminen desordenados
+        pending = collections.deque()
+        for start, end in find_boundaries(path, chunk_size):
+            if len(pending) >= max_in_flight:
+                yield from results(pending.popleft().get())
+            pending.append(pool.apply_async(
+                parse_range, ((path, start, end, headers_only, want_record, want_san, eco),)
+            ))
+        while pending:
+            yield from results(pending.popleft().get())
+
+
+def store_game(result_store, headers, san=None):
+    """Guardar una partida leída de PGN en la base de datos (los jugadores se registran como motores)"""
+    white_id = result_store.register_engine(headers.get("White", "?"), {"source": "pgn"})
+    black_id = result_store.register_engine(headers.get("Black", "?"), {"source": "pgn"})
+    game_id = result_store.start_game(white_id, black_id, headers.get("FEN"))
+    plies = None
+    if san is not None:
+        plies = len(san)
+        # Con posición inicial (cabecera FEN) puede empezar moviendo el negro
+        first = chess.Board(headers["FEN"]).turn if headers.get("FEN") else chess.WHITE
+        for ply, (san_move, uci) in enumerate(san, 1):
+            engine_id = white_id if (ply % 2 == 1) == (first == chess.WHITE) else black_id
+            result_store.record_move(game_id, ply, engine_id, san_move, uci, 0.0)
+    elif headers.get("PlyCount", "").isdigit():
+        plies = int(headers["PlyCount"])
+    result_store.finish_game(game_id, headers.get("Result", "*"), headers.get("Termination"), plies)
+    if headers.get("ECO") or headers.get("Opening"):
+        result_store.set_opening(game_id, headers.get("ECO"), headers.get("Opening"))
+    return game_id
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Importar un PGN grande en paralelo")
+    parser.add_argument("pgn")
+    parser.add_argument("--archive", help="Añadir las partidas a este archivo binario")
+    parser.add_argument("--db", help="Guardar las partidas en esta base de datos SQLite")
+    parser.add_argument("--headers-only", action="store_true", help="Leer solo las cabeceras")
+    parser.add_argument("--workers", type=int, help="Procesos (por defecto, uno por núcleo)")
+    parser.add_argument("--eco", action="store_true", help="Clasificar por apertura las partidas sin cabecera ECO")
+    parser.add_argument("--chunk-mb", type=int, default=CHUNK_SIZE >> 20, help="Tamaño de cada rango en MB")
+    args = parser.parse_args()
+
+    archive = ArchiveWriter(args.archive) if args.archive else None
+    result_store = ResultStore(args.db) if args.db else None
+    results = {}
+    start = time.perf_counter()
+    try:
+        for headers in ingest(args.pgn, args.workers, args.headers_only, archive, result_store,
+                              chunk_size=args.chunk_mb << 20, eco=args.eco):
+            result = headers.get("Result", "*")
+            results[result] = results.get(result, 0) + 1
+        elapsed = time.perf_counter() - start
+        total = sum(results.values())
+        print(f"{total} partidas en {elapsed:.1f} s ({total / max(elapsed, 1e-9):.0f} partidas/s)")
+        for result, count in sorted(results.items(), key=lambda item: -item[1]):
+            print(f"  {result}: {count}")
+    finally:
+        if archive:
+            archive.close()
+        if result_store:
+            result_store.close()
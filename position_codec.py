@@ -0,0 +1,168 @@
+import chess
+import numpy as np
+
+from game_board import GameBoard
+
+# Posición empaquetada en 32 bytes: ocupación (64 bits), un código de 4 bits por pieza
+# en orden de casilla (como mucho 32 piezas) y el estado de la partida
+POSITION_DTYPE = np.dtype([
+    ("occupied", "<u8"),
+    ("pieces", "u1", 16),
+    ("turn", "u1"),
+    ("ep_square", "u1"),
+    ("halfmove_clock", "<u2"),
+    ("fullmove_number", "<u2"),
+    ("reserved", "u1", 2),
+])
+
+# Códigos 0-5: peón, caballo, alfil, torre, dama y rey blancos; 6-11 los negros.
+# Una torre con derecho a enroque lleva su propio código (vale también para Chess960)
+WHITE_CASTLING_ROOK = 12
+BLACK_CASTLING_ROOK = 13
+NO_EP_SQUARE = 64
+
+_PIECES = [(color, piece_type) for color in (chess.WHITE, chess.BLACK) for piece_type in chess.PIECE_TYPES]
+_CODE_PIECES = _PIECES + [(chess.WHITE, chess.ROOK), (chess.BLACK, chess.ROOK)]
+
+
+def _piece_bitboards(board):
+    white = board.occupied_co[chess.WHITE]
+    black = board.occupied_co[chess.BLACK]
+    pieces = (board.pawns, board.knights, board.bishops, board.rooks, board.queens, board.kings)
+    return [bb & white for bb in pieces] + [bb & black for bb in pieces]
+
+
+def encode(board, out=None):
+    """Empaquetar un tablero en un registro POSITION_DTYPE (out, si se da, se rellena en su sitio)"""
+    if chess.popcount(board.occupied) > 32:
+        raise ValueError("no se pueden empaquetar más de 32 piezas")
+    codes = {}
+    for code, bitboard in enumerate(_piece_bitboards(board)):
+        for square in chess.scan_forward(bitboard):
+            codes[square] = code
+    for square in chess.scan_forward(board.castling_rights & board.rooks):
+        codes[square] = WHITE_CASTLING_ROOK if board.occupied_co[chess.WHITE] & chess.BB_SQUARES[square] \
+            else BLACK_CASTLING_ROOK
+
+    nibbles = [codes[square] for square in chess.scan_forward(board.occupied)]
+    if len(nibbles) % 2:
+        nibbles.append(0)
+    record = np.zeros((), dtype=POSITION_DTYPE) if out is None else out
+    record["occupied"] = board.occupied
+    record["pieces"] = 0
+    record["pieces"][:len(nibbles) // 2] = [low | high << 4 for low, high in zip(nibbles[::2], nibbles[1::2])]
+    record["turn"] = board.turn
+    record["ep_square"] = NO_EP_SQUARE if board.ep_square is None else board.ep_square
+    record["halfmove_clock"] = min(board.halfmove_clock, 0xFFFF)
+    record["fullmove_number"] = min(board.fullmove_number, 0xFFFF)
+    return record
+
+
+def decode(record, board_class=GameBoard):
+    """Reconstruir el tablero de un registro POSITION_DTYPE"""
+    occupied = int(record["occupied"])
+    packed = bytes(record["pieces"])
+    bitboards = [0] * 14
+    for index, square in enumerate(chess.scan_forward(occupied)):
+        code = packed[index >> 1] >> (4 * (index & 1)) & 15
+        bitboards[code] |= chess.BB_SQUARES[square]
+
+    board = board_class(None)
+    for code, bitboard in enumerate(bitboards):
+        if bitboard:
+            color, piece_type = _CODE_PIECES[code]
+            board.occupied_co[color] |= bitboard
+            _set_piece_bitboard(board, piece_type, bitboard)
+    board.occupied = occupied
+    board.castling_rights = bitboards[WHITE_CASTLING_ROOK] | bitboards[BLACK_CASTLING_ROOK]
+    board.promoted = chess.BB_EMPTY
+    board.turn = bool(record["turn"])
+    ep_square = int(record["ep_square"])
+    board.ep_square = None if ep_square == NO_EP_SQUARE else ep_square
+    board.halfmove_clock = int(record["halfmove_clock"])
+    board.fullmove_number = int(record["fullmove_number"])
+    # Derechos de enroque que solo tienen sentido en Chess960
+    if board.clean_castling_rights() != board.castling_rights:
+        board.chess960 = True
+    board.clear_stack()
+    return board
+
+
+def _set_piece_bitboard(board, piece_type, bitboard):
+    if piece_type == chess.PAWN:
+        board.pawns |= bitboard
+    elif piece_type == chess.KNIGHT:
+        board.knights |= bitboard
+    elif piece_type == chess.BISHOP:
+        board.bishops |= bitboard
+    elif piece_type == chess.ROOK:
+        board.rooks |= bitboard
+    elif piece_type == chess.QUEEN:
+        board.queens |= bitboard
+    else:
+        board.kings |= bitboard
+
+
+def encode_batch(boards, out=None):
+    """Empaquetar varios tableros de una vez en un arreglo POSITION_DTYPE"""
+    boards = list(boards)
+    count = len(boards)
+    records = np.zeros(count, dtype=POSITION_DTYPE) if out is None else out[:count]
+
+    bitboards = np.zeros((count, 14), dtype=np.uint64)
+    for row, board in enumerate(boards):
+        pieces = _piece_bitboards(board)
+        castling = board.castling_rights & board.rooks
+        bitboards[row, :12] = pieces
+        bitboards[row, 12] = castling & board.occupied_co[chess.WHITE]
+        bitboards[row, 13] = castling & board.occupied_co[chess.BLACK]
+        records[row]["turn"] = board.turn
+        records[row]["ep_square"] = NO_EP_SQUARE if board.ep_square is None else board.ep_square
+        records[row]["halfmove_clock"] = min(board.halfmove_clock, 0xFFFF)
+        records[row]["fullmove_number"] = min(board.fullmove_number, 0xFFFF)
+
+    # Código por casilla (las torres con enroque, al ir después, ganan)
+    planes = np.unpackbits(bitboards.astype("<u8").view(np.uint8).reshape(count, 14, 8), axis=-1,
+                           bitorder="little").astype(bool)
+    occupied = planes[:, :12].any(axis=1)
+    if (occupied.sum(axis=1) > 32).any():
+        raise ValueError("no se pueden empaquetar más de 32 piezas")
+    codes = np.zeros((count, 64), dtype=np.uint8)
+    for code in range(14):
+        codes[planes[:, code]] = code
+
+    # Compactar los códigos de las casillas ocupadas en orden y unir de dos en dos
+    rows, squares = np.nonzero(occupied)
+    ranks = np.cumsum(occupied, axis=1)[rows, squares] - 1
+    nibbles = np.zeros((count, 32), dtype=np.uint8)
+    nibbles[rows, ranks] = codes[rows, squares]
+    records["pieces"] = nibbles[:, 0::2] | nibbles[:, 1::2] << 4
+    records["occupied"] = np.bitwise_or.reduce(bitboards[:, :12], axis=1)
+    return records
+
+
+def decode_batch(records):
+    """Desempaquetar registros en bitboards (N, 12) y turnos (N,), el formato de batch_eval"""
+    records = np.asarray(records, dtype=POSITION_DTYPE).reshape(-1)
+    count = len(records)
+    occupied = np.unpackbits(records["occupied"].astype("<u8").view(np.uint8).reshape(count, 8), axis=-1,
+                             bitorder="little").astype(bool)
+    nibbles = np.empty((count, 32), dtype=np.uint8)
+    nibbles[:, 0::2] = records["pieces"] & 15
+    nibbles[:, 1::2] = records["pieces"] >> 4
+
+    rows, squares = np.nonzero(occupied)
+    ranks = np.cumsum(occupied, axis=1)[rows, squares] - 1
+    codes = nibbles[rows, ranks]
+    # Las torres con enroque vuelven a ser torres
+    codes = np.where(codes == WHITE_CASTLING_ROOK, 3, np.where(codes == BLACK_CASTLING_ROOK, 9, codes))
+
+    bitboards = np.zeros((count, 12), dtype=np.uint64)
+    np.bitwise_or.at(bitboards, (rows, codes), np.left_shift(np.uint64(1), squares.astype(np.uint64)))
+    return bitboards, records["turn"].astype(bool)
+
+
+def decode_boards(records, board_class=GameBoard):
+    """Generar los tableros de un arreglo de registros"""
+    for record in records:
+        yield decode(record, board_class)
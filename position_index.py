@@ -0,0 +1,258 @@
+import argparse
+import json
+import multiprocessing
+import os
+
+import chess
+import chess.polyglot
+import numpy as np
+
+from builtin_engine import unpack_move
+from game_archive import RESULTS, GameArchive
+from game_board import GameBoard
+
+# Cada aparición de una posición: partida y número de jugadas hechas hasta llegar a ella
+POSTING_DTYPE = np.dtype([("game", "<u4"), ("ply", "<u2")])
+
+
+def index_games(task):
+    """Claves Zobrist y apariciones de un rango de partidas del archivo (en un proceso aparte)"""
+    archive_path, first, last = task
+    archive = GameArchive(archive_path)
+    keys = []
+    postings = []
+    for game in range(first, last):
+        board = archive.start_board(game)
+        keys.append(board.zobrist_key())
+        postings.append((game, 0))
+        for ply, code in enumerate(archive.moves(game).tolist(), 1):
+            board.push(unpack_move(code))
+            keys.append(board.zobrist_key())
+            postings.append((game, ply))
+    archive.close()
+    return np.array(keys, dtype=np.uint64), np.array(postings, dtype=POSTING_DTYPE)
+
+
+def merge_segments(segments, keys_out, postings_out, chunk_size=1_000_000):
+    """Mezclar segmentos ordenados por clave en los arrays de salida, leyendo bloques de chunk_size
+
+    En cada paso solo se escriben las claves hasta la menor de las últimas claves de los bloques:
+    ninguna clave posterior de ningún segmento puede ser menor. A igual clave se conserva el orden
+    de los segmentos. Devuelve el número de apariciones escritas.
+    """
+    cursors = [0] * len(segments)
+    written = 0
+    while True:
+        active = [i for i, (keys, _) in enumerate(segments) if cursors[i] < len(keys)]
+        if not active:
+            return written
+        chunks = {i: segments[i][0][cursors[i]:cursors[i] + chunk_size] for i in active}
+        bound = min(chunk[-1] for chunk in chunks.values())
+
+        keys, postings = [], []
+        for i in active:
+            take = int(np.searchsorted(chunks[i], bound, side="right"))
+            keys.append(np.asarray(chunks[i][:take]))
+            postings.append(np.asarray(segments[i][1][cursors[i]:cursors[i] + take]))
+            cursors[i] += take
+        keys = np.concatenate(keys)
+        order = np.argsort(keys, kind="stable")
+        keys_out[written:written + len(keys)] = keys[order]
+        postings_out[written:written + len(keys)] = np.concatenate(postings)[order]
+        written += len(keys)
+
+
+class PositionIndex:
+    """Índice de clave Zobrist a (partida, jugada) sobre un archivo de partidas
+
+    Se guarda en segmentos ordenados por clave (claves y apariciones en archivos .npy separados)
+    que se leen con mmap y se consultan por búsqueda binaria. Las partidas nuevas van a segmentos
+    nuevos; compact() los junta en uno.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.meta_path = os.path.join(directory, "meta.json")
+        self.meta = {"games": 0, "segments": [], "next_segment": 0}
+        if os.path.exists(self.meta_path):
+            with open(self.meta_path) as f:
+                self.meta = json.load(f)
+        self.segments = [self._load(name) for name in self.meta["segments"]]
+        self._keys = []
+        self._postings = []
+
+    @property
+    def games(self):
+        """Partidas ya indexadas (se indexan siempre en orden, desde la 0)"""
+        return self.meta["games"]
+
+    def _load(self, name):
+        keys = np.load(os.path.join(self.directory, name + ".keys.npy"), mmap_mode="r")
+        postings = np.load(os.path.join(self.directory, name + ".postings.npy"), mmap_mode="r")
+        return keys, postings
+
+    def _save_meta(self):
+        # Escribir aparte y renombrar, para no dejar nunca un meta.json a medias
+        path = self.meta_path + ".tmp"
+        with open(path, "w") as f:
+            json.dump(self.meta, f)
+        os.replace(path, self.meta_path)
+
+    def add_board(self, game, board):
+        """Añadir a lo pendiente las posiciones de una partida (un tablero con su pila de jugadas)"""
+        replay = GameBoard(board.root().fen(), chess960=board.chess960)
+        keys = [replay.zobrist_key()]
+        for move in board.move_stack:
+            replay.push(move)
+            keys.append(replay.zobrist_key())
+        postings = np.zeros(len(keys), dtype=POSTING_DTYPE)
+        postings["game"] = game
+        postings["ply"] = np.arange(len(keys))
+        self.add_arrays(np.array(keys, dtype=np.uint64), postings)
+
+    def add_arrays(self, keys, postings):
+        self._keys.append(keys)
+        self._postings.append(postings)
+
+    def flush(self, games=None):
+        """Escribir lo pendiente como un segmento nuevo; games es el total de partidas ya indexadas"""
+        if self._keys:
+            keys = np.concatenate(self._keys)
+            postings = np.concatenate(self._postings)
+            self._keys, self._postings = [], []
+            self._write_segment(keys, postings)
+            if games is None:
+                games = max(self.meta["games"], int(postings["game"].max()) + 1)
+        if games is not None:
+            self.meta["games"] = games
+        self._save_meta()
+
+    def _new_segment_name(self):
+        name = f"segmento-{self.meta['next_segment']:05d}"
+        self.meta["next_segment"] += 1
+        return name
+
+    def _write_segment(self, keys, postings):
+        order = np.argsort(keys, kind="stable")
+        name = self._new_segment_name()
+        np.save(os.path.join(self.directory, name + ".keys.npy"), keys[order])
+        np.save(os.path.join(self.directory, name + ".postings.npy"), postings[order])
+        self.meta["segments"].append(name)
+        self.segments.append(self._load(name))
+
+    def compact(self, chunk_size=1_000_000):
+        """Juntar todos los segmentos en uno solo
+
+        Los segmentos (con mmap) se mezclan por bloques directamente en los .npy de salida,
+        así nunca se carga el índice entero en memoria.
+        """
+        if len(self.segments) < 2:
+            return
+        old = self.meta["segments"]
+        name = self._new_segment_name()
+        total = sum(len(keys) for keys, _ in self.segments)
+        keys = np.lib.format.open_memmap(
+            os.path.join(self.directory, name + ".keys.npy"), mode="w+", dtype=np.uint64, shape=(total,),
+        )
+        postings = np.lib.format.open_memmap(
+            os.path.join(self.directory, name + ".postings.npy"), mode="w+", dtype=POSTING_DTYPE, shape=(total,),
+        )
+        merge_segments(self.segments, keys, postings, chunk_size)
+        keys.flush()
+        postings.flush()
+        del keys, postings
+
+        self.meta["segments"] = [name]
+        self.segments = [self._load(name)]
+        self._save_meta()
+        for name in old:
+            for suffix in (".keys.npy", ".postings.npy"):
+                os.remove(os.path.join(self.directory, name + suffix))
+
+    def update(self, archive_path, workers=None, games_per_task=2000, segment_size=50_000_000):
+        """Indexar en paralelo las partidas del archivo que aún no están en el índice"""
+        archive = GameArchive(archive_path)
+        total = len(archive)
+        archive.close()
+        tasks = [
+            (archive_path, first, min(first + games_per_task, total))
+            for first in range(self.games, total, games_per_task)
+        ]
+        if not tasks:
+            return 0
+
+        pending = 0
+        with multiprocessing.Pool(workers) as pool:
+            # En orden, para que meta["games"] siempre cuente un prefijo completo del archivo
+            for (_, _, last), (keys, postings) in zip(tasks, pool.imap(index_games, tasks)):
+                self.add_arrays(keys, postings)
+                pending += len(keys)
+                if pending >= segment_size:
+                    self.flush(last)
+                    pending = 0
+        self.flush(total)
+        return len(tasks)
+
+    def find(self, position):
+        """Apariciones (partida, jugada) de una posición, dada como tablero o como clave Zobrist"""
+        if isinstance(position, GameBoard):
+            key = position.zobrist_key()
+        elif isinstance(position, chess.Board):
+            key = chess.polyglot.zobrist_hash(position)
+        else:
+            key = position
+        key = np.uint64(key)
+        found = []
+        for keys, postings in self.segments:
+            lo = np.searchsorted(keys, key, side="left")
+            hi = np.searchsorted(keys, key, side="right")
+            if hi > lo:
+                found.append(np.asarray(postings[lo:hi]))
+        if not found:
+            return np.zeros(0, dtype=POSTING_DTYPE)
+        return np.concatenate(found)
+
+    def continuations(self, position, archive):
+        """Qué se jugó después de una posición: {uci: (partidas, puntuación de las blancas)}"""
+        stats = {}
+        for game, ply in self.find(position).tolist():
+            moves = archive.moves(game)
+            move = unpack_move(int(moves[ply])).uci() if ply < len(moves) else None
+            result = RESULTS[archive.header(game)["result"]]
+            count, points, decided = stats.get(move, (0, 0.0, 0))
+            if result != "*":
+                points += {"1-0": 1.0, "0-1": 0.0, "1/2-1/2": 0.5}[result]
+                decided += 1
+            stats[move] = (count + 1, points, decided)
+        return {
+            move: (count, points / decided if decided else None)
+            for move, (count, points, decided) in sorted(stats.items(), key=lambda item: -item[1][0])
+        }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Índice de posiciones sobre un archivo de partidas")
+    parser.add_argument("archive")
+    parser.add_argument("index")
+    parser.add_argument("--workers", type=int)
+    parser.add_argument("--compact", action="store_true", help="Juntar los segmentos al terminar")
+    parser.add_argument("--find", metavar="FEN", help="Buscar las partidas que llegaron a esta posición")
+    args = parser.parse_args()
+
+    index = PositionIndex(args.index)
+    if args.find:
+        archive = GameArchive(args.archive)
+        board = GameBoard(args.find)
+        postings = index.find(board)
+        print(f"{len(postings)} apariciones en {len(np.unique(postings['game']))} partidas")
+        for move, (count, score) in index.continuations(board, archive).items():
+            score = f"{score * 100:.1f}%" if score is not None else "-"
+            print(f"  {move or '(fin)'}: {count} partidas, blancas {score}")
+        archive.close()
+    else:
+        before = index.games
+        index.update(args.archive, args.workers)
+        if args.compact:
+            index.compact()
+        print(f"{index.games - before} partidas indexadas ({index.games} en total, {len(index.segments)} segmentos)")
@@ -0,0 +1,296 @@
+import argparse
+import collections
+import csv
+import os
+
+import chess
+import chess.engine
+import chess.pgn
+
+from accuracy import score_to_cp, win_percent
+from annotate import Annotator, read_games
+from builtin_engine import PIECE_VALUES
+from engine_pool import EnginePool
+from engine_watchdog import ENGINE_ERRORS
+from game_archive import GameArchive
+from game_board import GameBoard
+
+# Caída mínima de la probabilidad de ganar (%) del que mueve para considerar la jugada un error grave
+MIN_SWING = 30
+# Probabilidad de ganar (%) que debe tener quien resuelve tras el error
+MIN_WIN = 70
+# Diferencia mínima (%) entre la mejor y la segunda jugada para que la solución sea única
+ONLY_MOVE_GAP = 25
+FIELDS = ["FEN", "Moves", "Themes", "Source"]
+
+
+def win_chance(score, color):
+    """Probabilidad de ganar (%) de color según un PovScore"""
+    chance = float(win_percent(score_to_cp(score)))
+    return chance if color == chess.WHITE else 100 - chance
+
+
+def result_or_none(future):
+    """Resultado de un análisis; None si el motor falló (un fallo solo pierde esa posición)"""
+    try:
+        return future.result()
+    except ENGINE_ERRORS:
+        return None
+
+
+def find_candidates(game, infos):
+    """Plies tras los que el rival queda ganando por un error grave (con la evaluación rápida)
+
+    Las posiciones sin evaluación (None) no pueden dar candidatos.
+    """
+    candidates = []
+    board = game.board()
+    for ply, move in enumerate(game.mainline_moves()):
+        mover = board.turn
+        board.push(move)
+        if board.is_game_over():
+            break
+        if infos[ply] is None or infos[ply + 1] is None:
+            continue
+        before = win_chance(infos[ply]["score"], mover)
+        after = win_chance(infos[ply + 1]["score"], mover)
+        if before - after >= MIN_SWING and 100 - after >= MIN_WIN:
+            candidates.append(ply + 1)
+    return candidates
+
+
+def only_move(lines, color):
+    """Mejor jugada de un análisis MultiPV=2 si es la única que gana; si no, None"""
+    if not lines or len(lines) < 2 or not lines[0].get("pv"):
+        return None
+    if lines[0].get("score") is None or lines[1].get("score") is None:
+        return None
+    best, second = lines[0]["score"].pov(color), lines[1]["score"].pov(color)
+    if best.is_mate():
+        # En los mates, cualquier otro mate también vale
+        unique = best.mate() > 0 and not (second.is_mate() and second.mate() > 0)
+    else:
+        best_chance = win_chance(lines[0]["score"], color)
+        unique = best_chance >= MIN_WIN and best_chance - win_chance(lines[1]["score"], color) >= ONLY_MOVE_GAP
+    return lines[0]["pv"] if unique else None
+
+
+def material(board, color):
+    return sum(
+        PIECE_VALUES[piece.piece_type] * (1 if piece.color == color else -1)
+        for piece in board.piece_map().values()
+    )
+
+
+def themes(board, line, score):
+    """Etiquetas al estilo de lichess a partir de la posición, la solución y su evaluación"""
+    solver = board.turn
+    tags = []
+    if score.pov(solver).is_mate():
+        tags += ["mate", f"mateIn{score.pov(solver).mate()}"]
+    elif win_chance(score, solver) >= 90:
+        tags.append("crushing")
+    else:
+        tags.append("advantage")
+    solver_moves = (len(line) + 1) // 2
+    tags.append("oneMove" if solver_moves == 1 else "short" if solver_moves <= 2 else "long")
+
+    first = line[0]
+    if board.is_en_passant(first):
+        tags.append("enPassant")
+    if board.is_capture(first) and not board.is_en_passant(first):
+        victim = board.piece_type_at(first.to_square)
+        if victim != chess.PAWN and not board.is_attacked_by(not solver, first.to_square):
+            tags.append("hangingPiece")
+
+    board = board.copy(stack=False)
+    start = material(board, solver)
+    lowest = start
+    for ply, move in enumerate(line):
+        if move.promotion:
+            tags.append("promotion")
+        board.push(move)
+        lowest = min(lowest, material(board, solver))
+        if not ply:
+            # Horquilla: la pieza movida ataca a dos piezas más valiosas que ella (o al rey)
+            piece = board.piece_at(move.to_square)
+            value = PIECE_VALUES[piece.piece_type]
+            targets = [
+                square for square in board.attacks(move.to_square)
+                if board.color_at(square) == (not solver)
+                and (board.piece_type_at(square) == chess.KING or PIECE_VALUES[board.piece_type_at(square)] > value)
+            ]
+            if len(targets) >= 2 and piece.piece_type != chess.KING:
+                tags.append("fork")
+    if start - lowest >= 200:
+        tags.append("sacrifice")
+    return sorted(set(tags), key=tags.index)
+
+
+class PuzzleMiner:
+    """Buscar ejercicios tácticos en partidas jugadas con un grupo de motores
+
+    Primero una evaluación rápida de cada posición descarta casi todo; solo las posiciones tras
+    un error grave se verifican con una búsqueda profunda MultiPV=2, jugada a jugada de la solución.
+    """
+
+    def __init__(self, pool, shallow_limit, deep_limit, max_moves=4, seen=None):
+        self.pool = pool
+        self.shallow = Annotator(pool, shallow_limit)
+        self.deep_limit = deep_limit
+        self.max_moves = max_moves
+        # Claves Zobrist de los ejercicios ya encontrados (las aperturas se repiten mucho)
+        self.seen = seen if seen is not None else set()
+
+    def submit(self, game):
+        """Encolar la evaluación rápida de la partida (las ya anotadas con [%eval] no la necesitan)"""
+        nodes = [game] + list(game.mainline())
+        if all(node.eval() is not None for node in nodes):
+            return [node.eval() for node in nodes]
+        return self.shallow.submit(game)
+
+    def _verify(self, board):
+        return self.pool.analyse(board.copy(stack=False), self.deep_limit, multipv=2)
+
+    def candidates(self, game, evaluations):
+        """Encolar la verificación profunda de los candidatos; devuelve [(ply, tablero, futuro)]"""
+        infos = []
+        for item in evaluations:
+            info = {"score": item} if isinstance(item, chess.engine.PovScore) else result_or_none(item)
+            infos.append(info if info and info.get("score") is not None else None)
+        plies = set(find_candidates(game, infos))
+        board = GameBoard(game.board().fen(), chess960=game.board().chess960)
+        pending = []
+        for ply, move in enumerate(game.mainline_moves(), 1):
+            board.push(move)
+            if ply in plies and board.zobrist_key() not in self.seen:
+                self.seen.add(board.zobrist_key())
+                pending.append((ply, board.copy(stack=False), self._verify(board)))
+        return pending
+
+    def solve(self, board, future):
+        """Extender la solución mientras cada jugada de quien resuelve sea la única buena"""
+        solver = board.turn
+        lines = result_or_none(future)
+        pv = only_move(lines, solver)
+        if pv is None:
+            return None
+        score = lines[0]["score"]
+        line = [pv[0]]
+        position = board.copy(stack=False)
+        position.push(pv[0])
+        while len(line) < 2 * self.max_moves - 1 and not position.is_game_over() and len(pv) > 1:
+            reply = pv[1]
+            position.push(reply)
+            if position.is_game_over():
+                break
+            pv = only_move(result_or_none(self._verify(position)), solver)
+            if pv is None:
+                break
+            line += [reply, pv[0]]
+            position.push(pv[0])
+        return line, score
+
+    def mine(self, games, window=8):
+        """Generar (partida, ply, tablero, solución, etiquetas) con window partidas en vuelo"""
+        evaluating = collections.deque()
+        verifying = collections.deque()
+
+        def drain_one():
+            game, pending = verifying.popleft()
+            for ply, board, future in pending:
+                solution = self.solve(board, future)
+                if solution:
+                    line, score = solution
+                    yield game, ply, board, line, themes(board, line, score)
+
+        for game in games:
+            evaluating.append((game, self.submit(game)))
+            if len(evaluating) >= window:
+                game, evaluations = evaluating.popleft()
+                verifying.append((game, self.candidates(game, evaluations)))
+            if len(verifying) >= window:
+                yield from drain_one()
+        while evaluating:
+            game, evaluations = evaluating.popleft()
+            verifying.append((game, self.candidates(game, evaluations)))
+        while verifying:
+            yield from drain_one()
+
+
+def archive_games(path):
+    archive = GameArchive(path)
+    try:
+        for index in range(len(archive)):
+            yield archive.game(index)
+    finally:
+        archive.close()
+
+
+def read_seen(path):
+    """Claves de los ejercicios que ya están en el archivo de salida"""
+    seen = set()
+    if os.path.exists(path):
+        with open(path, newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                seen.add(GameBoard(row["FEN"]).zobrist_key())
+    return seen
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Extraer ejercicios tácticos de partidas jugadas")
+    parser.add_argument("output", help="Archivo CSV de ejercicios (se añade si ya existe)")
+    parser.add_argument("--pgn", action="append", default=[], help="PGN de partidas (repetible)")
+    parser.add_argument("--archive", action="append", default=[], help="Archivo binario de partidas (repetible)")
+    parser.add_argument("--engine", action="append", required=True, help="Motor como nombre=comando (repetible)")
+    parser.add_argument("--workers", type=int, default=1, help="Copias del motor si solo se da uno")
+    parser.add_argument("--shallow-depth", type=int, help="Profundidad de la pasada rápida")
+    parser.add_argument("--shallow-nodes", type=int)
+    parser.add_argument("--depth", type=int, help="Profundidad de la verificación MultiPV=2")
+    parser.add_argument("--nodes", type=int)
+    parser.add_argument("--max-moves", type=int, default=4, help="Jugadas máximas de la solución")
+    parser.add_argument("--window", type=int, default=8, help="Partidas en vuelo")
+    args = parser.parse_args()
+
+    shallow_limit = chess.engine.Limit(depth=args.shallow_depth, nodes=args.shallow_nodes)
+    if not (args.shallow_depth or args.shallow_nodes):
+        shallow_limit = chess.engine.Limit(depth=8)
+    deep_limit = chess.engine.Limit(depth=args.depth, nodes=args.nodes)
+    if not (args.depth or args.nodes):
+        deep_limit = chess.engine.Limit(depth=16)
+
+    def all_games():
+        for path in args.pgn:
+            for game in read_games(path):
+                game.headers["Source"] = path
+                yield game
+        for path in args.archive:
+            for index, game in enumerate(archive_games(path)):
+                game.headers["Source"] = f"{path}#{index}"
+                yield game
+
+    seen = read_seen(args.output)
+    new_file = not os.path.exists(args.output)
+    pool = EnginePool(args.engine, args.workers)
+    found = 0
+    try:
+        with open(args.output, "a", newline="", encoding="utf-8") as output:
+            writer = csv.DictWriter(output, FIELDS)
+            if new_file:
+                writer.writeheader()
+            miner = PuzzleMiner(pool, shallow_limit, deep_limit, args.max_moves, seen)
+            for game, ply, board, line, tags in miner.mine(all_games(), args.window):
+                writer.writerow({
+                    "FEN": board.fen(),
+                    "Moves": " ".join(move.uci() for move in line),
+                    "Themes": " ".join(tags),
+                    "Source": f"{game.headers.get('Source', '?')} ply {ply}",
+                })
+                output.flush()
+                found += 1
+                print(f"Ejercicio {found}: {board.fen()} {' '.join(tags)}")
+    except KeyboardInterrupt:
+        print("Búsqueda interrumpida")
+    finally:
+        pool.close()
+    print(f"{found} ejercicios nuevos en {args.output}")
@@ -0,0 +1,280 @@
+import itertools
+import json
+import queue
+import sqlite3
+import threading
+import time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS engines (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    version TEXT,
+    config TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS games (
+    id INTEGER PRIMARY KEY,
+    white_id INTEGER NOT NULL REFERENCES engines(id),
+    black_id INTEGER NOT NULL REFERENCES engines(id),
+    started REAL NOT NULL,
+    finished REAL,
+    start_fen TEXT,
+    eco TEXT,
+    opening TEXT,
+    result TEXT NOT NULL DEFAULT '*',
+    termination TEXT,
+    plies INTEGER
+);
+
+CREATE TABLE IF NOT EXISTS moves (
+    game_id INTEGER NOT NULL REFERENCES games(id),
+    ply INTEGER NOT NULL,
+    engine_id INTEGER NOT NULL REFERENCES engines(id),
+    san TEXT NOT NULL,
+    uci TEXT NOT NULL,
+    time_ms REAL NOT NULL,
+    score_cp INTEGER,
+    mate INTEGER,
+    depth INTEGER,
+    nodes INTEGER,
+    PRIMARY KEY (game_id, ply)
+) WITHOUT ROWID;
+
+-- Reinicios de motores colgados o caídos (engine_watchdog.py)
+CREATE TABLE IF NOT EXISTS restarts (
+    engine_id INTEGER NOT NULL REFERENCES engines(id),
+    time REAL NOT NULL,
+    reason TEXT NOT NULL,
+    latency_ms REAL NOT NULL
+);
+
+-- Siguiente id libre por tabla: cada ResultStore reserva bloques para no repetir ids con otros abiertos
+CREATE TABLE IF NOT EXISTS id_blocks (
+    name TEXT PRIMARY KEY,
+    next INTEGER NOT NULL
+);
+
+-- Tasa de victorias por apertura y por motor
+CREATE INDEX IF NOT EXISTS games_opening ON games(opening, result);
+CREATE INDEX IF NOT EXISTS games_white ON games(white_id, result);
+CREATE INDEX IF NOT EXISTS games_black ON games(black_id, result);
+
+-- Uso de tiempo por motor y jugadas más lentas
+CREATE INDEX IF NOT EXISTS moves_engine_time ON moves(engine_id, time_ms);
+CREATE INDEX IF NOT EXISTS moves_time ON moves(time_ms);
+"""
+
+FIND_ENGINE = "SELECT id FROM engines WHERE name = ? AND version IS ? AND config = ?"
+INSERT_ENGINE = "INSERT INTO engines (name, version, config) VALUES (?, ?, ?)"
+INSERT_GAME = "INSERT INTO games (id, white_id, black_id, started, start_fen) VALUES (?, ?, ?, ?, ?)"
+INSERT_MOVE = (
+    "INSERT OR REPLACE INTO moves (game_id, ply, engine_id, san, uci, time_ms, score_cp, mate, depth, nodes) "
+    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+)
+FINISH_GAME = "UPDATE games SET finished = ?, result = ?, termination = ?, plies = ? WHERE id = ?"
+SET_OPENING = "UPDATE games SET eco = ?, opening = ? WHERE id = ?"
+INSERT_RESTART = "INSERT INTO restarts (engine_id, time, reason, latency_ms) VALUES (?, ?, ?, ?)"
+
+
+class ResultStore:
+    """Base de datos SQLite con los resultados, jugadas y configuraciones de los motores
+
+    Las escrituras se encolan y las ejecuta un único hilo escritor en transacciones por lotes,
+    así las partidas nunca esperan a la base de datos.
+    """
+
+    def __init__(self, path, batch_size=5000, flush_interval=0.5, id_block=1000):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.id_block = id_block
+
+        connection = self._connect()
+        connection.executescript(SCHEMA)
+        connection.close()
+
+        # Los ids de partida salen de un bloque reservado en la base de datos, así no se espera
+        # al hilo escritor ni se repiten con otro ResultStore abierto sobre el mismo archivo
+        self._engines = {}
+        self._lock = threading.Lock()
+        self._game_ids = iter(())
+
+        self._queue = queue.Queue()
+        self._error = None
+        # Escrituras descartadas: [(sentencia, parámetros, error)]
+        self.failed = []
+        self._writer = threading.Thread(target=self._write_loop, name="result-store-writer", daemon=True)
+        self._writer.start()
+
+    def _connect(self):
+        connection = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        return connection
+
+    def _transaction(self, function):
+        """Ejecutar function(conexión) en una transacción que bloquea a los demás escritores desde el principio"""
+        connection = self._connect()
+        try:
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                result = function(connection)
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+            connection.execute("COMMIT")
+            return result
+        finally:
+            connection.close()
+
+    def _reserve_games(self, connection):
+        # Nunca por debajo de los ids ya usados (bases de datos anteriores a id_blocks)
+        row = connection.execute("SELECT next FROM id_blocks WHERE name = 'games'").fetchone()
+        used = connection.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM games").fetchone()[0]
+        start = max(row[0] if row else 0, used)
+        connection.execute("INSERT OR REPLACE INTO id_blocks (name, next) VALUES ('games', ?)", (start + self.id_block,))
+        return range(start, start + self.id_block)
+
+    def register_engine(self, name, config=None, version=None):
+        """Obtener el id de un motor, registrándolo si su configuración es nueva"""
+        config = json.dumps(config or {}, sort_keys=True)
+        key = (name, version, config)
+        with self._lock:
+            engine_id = self._engines.get(key)
+            if engine_id is None:
+                def find_or_insert(connection):
+                    row = connection.execute(FIND_ENGINE, key).fetchone()
+                    return row[0] if row else connection.execute(INSERT_ENGINE, key).lastrowid
+
+                engine_id = self._engines[key] = self._transaction(find_or_insert)
+        return engine_id
+
+    def start_game(self, white_id, black_id, start_fen=None):
+        """Registrar una partida nueva y devolver su id"""
+        with self._lock:
+            game_id = next(self._game_ids, None)
+            if game_id is None:
+                self._game_ids = iter(self._transaction(self._reserve_games))
+                game_id = next(self._game_ids)
+        self._queue.put((INSERT_GAME, (game_id, white_id, black_id, time.time(), start_fen)))
+        return game_id
+
+    def record_move(self, game_id, ply, engine_id, san, uci, time_spent, info=None):
+        """Guardar una jugada con el tiempo usado (segundos) y la info de búsqueda de chess.engine
+
+        La evaluación se guarda desde el punto de vista del bando que movió.
+        """
+        info = info or {}
+        score_cp = mate = None
+        if info.get("score") is not None:
+            score = info["score"].relative
+            score_cp, mate = score.score(), score.mate()
+        self._queue.put((INSERT_MOVE, (
+            game_id, ply, engine_id, san, uci, time_spent * 1000,
+            score_cp, mate, info.get("depth"), info.get("nodes"),
+        )))
+
+    def finish_game(self, game_id, result, termination=None, plies=None):
+        """Guardar el resultado final de una partida"""
+        self._queue.put((FINISH_GAME, (time.time(), result, termination, plies, game_id)))
+
+    def set_opening(self, game_id, eco, opening):
+        """Guardar la clasificación de apertura de una partida"""
+        self._queue.put((SET_OPENING, (eco, opening, game_id)))
+
+    def record_restart(self, engine_id, reason, latency):
+        """Guardar un reinicio de motor ("crash" o "hang") y lo que tardó (segundos)"""
+        self._queue.put((INSERT_RESTART, (engine_id, time.time(), reason, latency * 1000)))
+
+    def _write_loop(self):
+        connection = self._connect()
+        running = True
+        while running:
+            # Esperar la primera escritura y juntar las que lleguen mientras tanto
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size and batch[-1] is not None:
+                try:
+                    batch.append(self._queue.get(timeout=max(0, deadline - time.monotonic())))
+                except queue.Empty:
+                    break
+
+            if batch[-1] is None:
+                running = False
+
+            items = [item for item in batch if item is not None]
+            try:
+                connection.execute("BEGIN")
+                # Agrupar sentencias iguales consecutivas en un solo executemany
+                for sql, group in itertools.groupby(items, key=lambda item: item[0]):
+                    connection.executemany(sql, [params for _, params in group])
+                connection.execute("COMMIT")
+            except sqlite3.Error:
+                if connection.in_transaction:
+                    connection.execute("ROLLBACK")
+                self._retry_one_by_one(connection, items)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+        connection.close()
+
+    def _retry_one_by_one(self, connection, items):
+        """Repetir un lote fallido sentencia a sentencia; solo se pierden las filas que fallan"""
+        for sql, params in items:
+            try:
+                connection.execute(sql, params)
+            except sqlite3.Error as e:
+                print(f"Error al escribir en la base de datos: {e} ({sql.split('(')[0].strip()} {params})")
+                e.add_note(f"Sentencia: {sql}\nParámetros: {params}")
+                self.failed.append((sql, params, e))
+                if self._error is None:
+                    self._error = e
+
+    def _raise_error(self):
+        # Las filas que fallaron quedan en self.failed: quien espera a la base de datos debe enterarse
+        error, self._error = self._error, None
+        if error is not None:
+            raise error
+
+    def flush(self):
+        """Esperar a que todas las escrituras pendientes estén en disco; si alguna falló, lanzar el primer error"""
+        self._queue.join()
+        self._raise_error()
+
+    def close(self):
+        """Escribir lo pendiente y detener el hilo escritor; si alguna falló, lanzar el primer error"""
+        if self._writer.is_alive():
+            self._queue.put(None)
+            self._writer.join()
+        self._raise_error()
+
+    def query(self, sql, params=()):
+        """Ejecutar una consulta de lectura en una conexión propia (WAL permite leer mientras se escribe)"""
+        connection = self._connect()
+        try:
+            return connection.execute(sql, params).fetchall()
+        finally:
+            connection.close()
+
+    def win_rate_by_opening(self):
+        """Partidas y puntuación de las blancas por apertura"""
+        return self.query(
+            "SELECT opening, COUNT(*), "
+            "AVG(CASE result WHEN '1-0' THEN 1.0 WHEN '0-1' THEN 0.0 ELSE 0.5 END) "
+            "FROM games WHERE result != '*' GROUP BY opening ORDER BY COUNT(*) DESC"
+        )
+
+    def time_by_engine(self):
+        """Jugadas, tiempo medio y tiempo máximo (ms) por motor y versión"""
+        return self.query(
+            "SELECT e.name, e.version, COUNT(*), AVG(m.time_ms), MAX(m.time_ms) "
+            "FROM moves m JOIN engines e ON e.id = m.engine_id GROUP BY m.engine_id"
+        )
+
+    def slowest_moves(self, limit=20):
+        """Las jugadas que más tiempo tardaron"""
+        return self.query(
+            "SELECT game_id, ply, san, time_ms FROM moves ORDER BY time_ms DESC LIMIT ?", (limit,)
+        )
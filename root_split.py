@@ -0,0 +1,127 @@
+import argparse
+import queue
+import threading
+import time
+
+import chess
+import chess.engine
+
+from builtin_engine import MATE_SCORE
+from engine_pool import EnginePool, stream_analysis
+
+
+def split_root_moves(board, parts):
+    """Repartir las jugadas legales entre parts motores, alternando para equilibrar el trabajo
+
+    Las capturas y los jaques van primero para que cada motor reciba algunas de las jugadas
+    que suelen costar más de refutar.
+    """
+    moves = sorted(board.legal_moves, key=lambda move: (not board.is_capture(move), not board.gives_check(move)))
+    parts = max(1, min(parts, len(moves)))
+    return [moves[index::parts] for index in range(parts)]
+
+
+def stream_lines(player, board, limit, multipv, root_moves, updates):
+    """Analizar solo root_moves y enviar cada línea nueva a updates como (motor, info)"""
+    for info in stream_analysis(player, board, limit, multipv, root_moves):
+        updates.put((player.name, info))
+
+
+class RootSplitAnalysis:
+    """Análisis de una posición repartiendo las jugadas de la raíz entre los motores de un grupo
+
+    Cada motor busca solo su parte con root_moves y con un MultiPV que cubre toda la parte, así
+    que todas las jugadas se evalúan; las evaluaciones se combinan según llegan en una única
+    clasificación MultiPV.
+    """
+
+    def __init__(self, pool, board, limit, multipv=5):
+        self.pool = pool
+        self.board = board.copy()
+        self.limit = limit
+        self.multipv = multipv
+        # jugada de la raíz -> última línea recibida (score, depth, pv, engine)
+        self.lines = {}
+        self.lock = threading.Lock()
+
+    def merge(self, engine, info):
+        """Guardar una línea; una más superficial no sustituye a otra más profunda de la misma jugada"""
+        move = info["pv"][0]
+        with self.lock:
+            current = self.lines.get(move)
+            if current is None or info.get("depth", 0) >= current["depth"]:
+                self.lines[move] = {
+                    "score": info["score"], "depth": info.get("depth", 0), "pv": info["pv"], "engine": engine,
+                }
+
+    def ranking(self):
+        """Las multipv mejores jugadas combinadas, de la mejor a la peor para el bando que mueve"""
+        turn = self.board.turn
+        with self.lock:
+            lines = list(self.lines.values())
+        lines.sort(key=lambda line: -line["score"].pov(turn).score(mate_score=MATE_SCORE))
+        return lines[:self.multipv]
+
+    def run(self, interval=0.5, callback=None):
+        """Lanzar el análisis y llamar a callback(ranking) cada interval segundos mientras llegan líneas"""
+        updates = queue.Queue()
+        futures = [
+            self.pool.submit(stream_lines, self.board, self.limit, len(part), part, updates)
+            for part in split_root_moves(self.board, len(self.pool))
+        ]
+        last = 0
+        while True:
+            running = not all(future.done() for future in futures)
+            try:
+                self.merge(*updates.get(timeout=0.1))
+            except queue.Empty:
+                if not running:
+                    break
+                continue
+            if callback and time.monotonic() - last >= interval:
+                callback(self.ranking())
+                last = time.monotonic()
+        for future in futures:
+            # Volver a lanzar aquí los errores de los motores
+            future.result()
+        if callback:
+            callback(self.ranking())
+        return self.ranking()
+
+
+def format_ranking(board, ranking):
+    lines = []
+    for index, line in enumerate(ranking, 1):
+        score = line["score"].pov(board.turn)
+        evaluation = f"#{score.mate()}" if score.is_mate() else f"{score.score() / 100:+.2f}"
+        lines.append(f"{index:>2}. {evaluation:>7} prof. {line['depth']:>2} [{line['engine']}] "
+                     f"{board.variation_san(line['pv'])}")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Analizar una posición repartiendo las jugadas de la raíz entre motores")
+    parser.add_argument("fen", nargs="?", default=chess.STARTING_FEN)
+    parser.add_argument("--engine", action="append", required=True, help="Motor como nombre=comando (repetible)")
+    parser.add_argument("--workers", type=int, default=1, help="Copias del motor si solo se da uno")
+    parser.add_argument("--multipv", type=int, default=5)
+    parser.add_argument("--depth", type=int)
+    parser.add_argument("--nodes", type=int)
+    parser.add_argument("--time", type=float, help="Segundos de análisis")
+    args = parser.parse_args()
+
+    limit = chess.engine.Limit(depth=args.depth, nodes=args.nodes, time=args.time)
+    if not (args.depth or args.nodes or args.time):
+        limit = chess.engine.Limit(time=10)
+
+    board = chess.Board(args.fen)
+    pool = EnginePool(args.engine, args.workers)
+    try:
+        def show(ranking):
+            print(format_ranking(board, ranking), end="\n\n")
+
+        RootSplitAnalysis(pool, board, limit, args.multipv).run(callback=show)
+    except KeyboardInterrupt:
+        print("Análisis interrumpido")
+    finally:
+        pool.close()
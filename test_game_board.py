@@ -0,0 +1,179 @@
+import random
+
+import chess
+import chess.polyglot
+
+from game_board import GameBoard
+
+# Posiciones con enroques, capturas al paso y coronaciones a mano
+FENS = [
+    chess.STARTING_FEN,
+    "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+    "n1n5/PPPk4/8/8/8/8/4Kppp/5N1N b - - 0 1",
+    "rnbqkbnr/ppp1p1pp/8/3pPp2/8/8/PPPP1PPP/RNBQKBNR w KQkq f6 0 3",
+    "4k3/3p4/8/K3P2r/8/8/8/6N1 b - - 0 1",
+]
+
+
+def check_key(board):
+    assert board.zobrist_key() == chess.polyglot.zobrist_hash(board), board.fen()
+
+
+def random_walk(board, rng, steps=400):
+    """Jugadas al azar (y alguna nula) deshaciendo a veces; la clave se comprueba tras cada paso"""
+    seen = set()
+    check_key(board)
+    for _ in range(steps):
+        moves = list(board.legal_moves)
+        if board.move_stack and (not moves or rng.random() < 0.2):
+            board.pop()
+        elif not moves or (rng.random() < 0.05 and not board.is_check()):
+            board.push(chess.Move.null())
+            seen.add("null")
+        else:
+            move = rng.choice(moves)
+            if board.is_castling(move):
+                seen.add("castling")
+            if board.is_en_passant(move):
+                seen.add("en_passant")
+            if move.promotion:
+                seen.add("promotion")
+            board.push(move)
+        check_key(board)
+    return seen
+
+
+def test_zobrist_key_matches_polyglot_after_push_and_pop():
+    rng = random.Random(0)
+    seen = set()
+    for fen in FENS:
+        for _ in range(20):
+            seen |= random_walk(GameBoard(fen), rng)
+    assert seen == {"null", "castling", "en_passant", "promotion"}
+
+
+def test_zobrist_key_matches_polyglot_in_chess960():
+    rng = random.Random(1)
+    seen = set()
+    for index in rng.sample(range(960), 40):
+        seen |= random_walk(GameBoard.from_chess960_pos(index), rng)
+    assert "castling" in seen
+
+
+def test_zobrist_key_survives_copy():
+    rng = random.Random(2)
+    board = GameBoard(FENS[1])
+    random_walk(board, rng, steps=50)
+    for stack in (True, False, 3):
+        copy = board.copy(stack=stack)
+        check_key(copy)
+        random_walk(copy, rng, steps=50)
+
+
+def check_outcome(board, reference):
+    """Fin de partida, repeticiones y reglas de 50/75 movimientos iguales que en chess.Board"""
+    fen = board.fen()
+    assert board.outcome() == reference.outcome(), fen
+    assert board.is_game_over() == reference.is_game_over(), fen
+    assert board.outcome(claim_draw=True) == reference.outcome(claim_draw=True), fen
+    assert board.is_insufficient_material() == reference.is_insufficient_material(), fen
+    for count in (2, 3, 5):
+        assert board.is_repetition(count) == reference.is_repetition(count), (fen, count)
+    assert board.is_fivefold_repetition() == reference.is_fivefold_repetition(), fen
+    assert board.is_seventyfive_moves() == reference.is_seventyfive_moves(), fen
+
+
+def play_and_compare(fen, moves):
+    """Hacer las jugadas en un GameBoard y en un chess.Board comparándolos, y deshacerlas todas"""
+    board, reference = GameBoard(fen), chess.Board(fen)
+    check_outcome(board, reference)
+    for uci in moves:
+        move = chess.Move.from_uci(uci)
+        board.push(move)
+        reference.push(move)
+        check_outcome(board, reference)
+    outcomes = [board.outcome()]
+    while board.move_stack:
+        board.pop()
+        reference.pop()
+        check_outcome(board, reference)
+    return outcomes[0]
+
+
+def test_outcome_threefold_and_fivefold_repetition():
+    shuffle = ["g1f3", "g8f6", "f3g1", "f6g8"]
+    outcome = play_and_compare(chess.STARTING_FEN, ["e2e4", "e7e5"] + shuffle * 4)
+    assert outcome.termination == chess.Termination.FIVEFOLD_REPETITION
+
+
+def quiet_walk(fen, rng, plies):
+    """Jugadas al azar sin capturas, sin peones y sin repetir posición (solo avanza el reloj de 50)"""
+    board = chess.Board(fen)
+    seen = {board.epd()}
+    moves = []
+    while len(moves) < plies and not board.is_game_over():
+        candidates = []
+        for move in board.legal_moves:
+            if board.is_capture(move) or board.piece_type_at(move.from_square) == chess.PAWN:
+                continue
+            board.push(move)
+            if board.epd() not in seen:
+                candidates.append(move)
+            board.pop()
+        move = rng.choice(candidates)
+        board.push(move)
+        seen.add(board.epd())
+        moves.append(move.uci())
+    return moves
+
+
+def test_outcome_fifty_and_seventyfive_move_rules():
+    # El reloj empieza en 90: se cruzan las 100 medias jugadas (reclamable) y las 150 (automático)
+    fen = "4k3/8/8/3q4/8/8/2R5/4K3 w - - 90 100"
+    moves = quiet_walk(fen, random.Random(3), 62)
+    outcome = play_and_compare(fen, moves)
+    assert outcome.termination == chess.Termination.SEVENTYFIVE_MOVES
+
+
+def test_outcome_insufficient_material_after_captures_and_promotions():
+    # Captura que deja rey y alfil contra rey, alfiles del mismo color y coronación a caballo
+    assert play_and_compare("4k3/8/8/8/8/8/3n4/3BK3 w - - 0 1", ["e1d2"]).termination == \
+        chess.Termination.INSUFFICIENT_MATERIAL
+    assert play_and_compare("4k3/8/8/8/8/2b5/1P6/B3K3 b - - 0 1", ["c3b2", "a1b2"]).termination == \
+        chess.Termination.INSUFFICIENT_MATERIAL
+    assert play_and_compare("8/3P4/8/8/8/8/8/k3K3 w - - 0 1", ["d7d8n"]).termination == \
+        chess.Termination.INSUFFICIENT_MATERIAL
+
+
+def test_repetition_ignores_en_passant_square_without_legal_capture():
+    # Tras d5 Polyglot cuenta la casilla al paso (hay peón al lado), pero exd6 es ilegal (clavada
+    # horizontal): la posición se repite al volver los caballos y el rey aunque la clave sea distinta
+    fen = "4k3/3p4/8/K3P2r/8/8/8/6N1 b - - 0 1"
+    cycle = ["g1f3", "e8e7", "f3g1", "e7e8"]
+    board = GameBoard(fen)
+    board.push(chess.Move.from_uci("d7d5"))
+    key = board.zobrist_key()
+    for uci in cycle:
+        board.push(chess.Move.from_uci(uci))
+    assert board.zobrist_key() != key and board.is_repetition(2)
+    outcome = play_and_compare(fen, ["d7d5"] + cycle * 4)
+    assert outcome.termination == chess.Termination.FIVEFOLD_REPETITION
+
+
+def test_outcome_matches_chess_board_in_random_endgames():
+    rng = random.Random(4)
+    fens = ["8/8/4k3/8/2n5/8/3PB3/4K3 w - - 80 60", "4k3/8/8/8/8/8/3n4/3BK3 w - - 0 1",
+            "8/8/3k4/8/8/3K4/8/R7 w - - 0 1", "r3k3/8/8/8/8/8/8/4K2R w Kq - 0 1"]
+    for fen in fens:
+        for _ in range(3):
+            board, reference = GameBoard(fen), chess.Board(fen)
+            for _ in range(300):
+                moves = list(board.legal_moves)
+                if board.move_stack and (not moves or rng.random() < 0.3):
+                    board.pop()
+                    reference.pop()
+                else:
+                    move = rng.choice(moves)
+                    board.push(move)
+                    reference.push(move)
+                check_outcome(board, reference)
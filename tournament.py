@@ -0,0 +1,241 @@
+import argparse
+
+import chess
+import chess.engine
+import chess.polyglot
+
+from analysis_client import AnalysisClient
+from builtin_engine import BuiltinEngine
+from eco import default_classifier
+from engine_watchdog import SupervisedEngine
+from game_board import GameBoard
+from lazy_smp import LazySMPEngine
+from match import EnginePlayer, play_game
+from match_stats import MatchStats, SPRT
+from opening_tree import OpeningTree
+from result_store import ResultStore
+from tournament_journal import TournamentJournal
+
+
+def parse_engine(spec):
+    """Leer un motor con el formato nombre=comando, nombre=xboard:comando, nombre=builtin[:procesos]
+    o nombre=http://host:puerto (servicio de análisis)"""
+    name, _, command = spec.partition("=")
+    protocol = "uci"
+    if command.startswith(("http://", "https://")):
+        protocol = "service"
+    elif command.startswith(("uci:", "xboard:", "builtin:")):
+        protocol, _, command = command.partition(":")
+    elif command in ("", "builtin"):
+        protocol, command = "builtin", ""
+    return name, command, protocol
+
+
+def make_player(spec, watchdog=False):
+    """Abrir el motor descrito por spec; con watchdog, los motores externos se reinician si se cuelgan o caen"""
+    name, command, protocol = parse_engine(spec)
+    if protocol == "builtin":
+        # Con más de un proceso, búsqueda Lazy SMP
+        workers = int(command) if command else 1
+        player = LazySMPEngine(workers) if workers > 1 else BuiltinEngine()
+        player.name = name
+        return player
+    if protocol == "service":
+        return AnalysisClient(name, command)
+    if watchdog:
+        return SupervisedEngine(name, command, protocol)
+    return EnginePlayer(name, command, protocol)
+
+
+def load_openings(path):
+    """Leer posiciones iniciales, una por línea en formato FEN o EPD"""
+    openings = []
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            try:
+                board = GameBoard(line)
+            except ValueError:
+                board, _ = GameBoard.from_epd(line)
+            openings.append(board.fen())
+    return openings
+
+
+class Tournament:
+    """Partidas por pares (misma apertura, colores invertidos) entre dos motores, sin interfaz gráfica"""
+
+    def __init__(self, engine_a, engine_b, limit, pairs=100, openings=None, sprt=None, result_store=None,
+                 opening_tree=None, book=None, journal=None):
+        self.engine_a = engine_a
+        self.engine_b = engine_b
+        self.limit = limit
+        self.pairs = pairs
+        self.openings = openings or [chess.STARTING_FEN]
+        self.sprt = sprt
+        self.result_store = result_store
+        self.opening_tree = opening_tree
+        self.book = book
+        self.journal = journal
+        self.stats = MatchStats()
+        self.engine_ids = {}
+
+        if self.result_store:
+            for player in (engine_a, engine_b):
+                config = {"command": player.command, "protocol": player.protocol, "options": player.options}
+                self.engine_ids[player.name] = self.result_store.register_engine(player.name, config, player.version)
+                if isinstance(player, SupervisedEngine):
+                    player.on_restart = self.record_restart
+
+    def record_restart(self, player, reason, latency):
+        self.result_store.record_restart(self.engine_ids[player.name], reason, latency)
+
+    def play_one(self, white, black, fen, number=None):
+        """Jugar una partida desde fen y devolver el tablero final
+
+        Con diario, una partida number que quedó a medias se reanuda desde su última jugada guardada.
+        """
+        board = GameBoard(fen)
+        game_id = None
+        evals = []
+        times = []
+
+        resumed = self.journal.in_flight(number) if self.journal else None
+        if resumed:
+            for uci in resumed["moves"]:
+                board.push_uci(uci)
+            # Las jugadas anteriores a la caída no tienen evaluación ni tiempo
+            evals = [None] * len(resumed["moves"])
+            times = [0.0] * len(resumed["moves"])
+            game_id = resumed["db"]
+        if self.result_store and game_id is None:
+            game_id = self.result_store.start_game(self.engine_ids[white.name], self.engine_ids[black.name], fen)
+        if self.journal and not resumed:
+            self.journal.start_game(number, white.name, black.name, fen, game_id)
+
+        def on_move(board, player, move, san_move, time_spent, info):
+            if self.journal:
+                self.journal.record_move(number, move.uci())
+            evals.append(info.get("score"))
+            times.append(time_spent)
+            if self.result_store:
+                self.result_store.record_move(
+                    game_id, len(board.move_stack), self.engine_ids[player.name],
+                    san_move, move.uci(), time_spent, info
+                )
+
+        play_game(white, black, self.limit, board=board, on_move=on_move, book=self.book)
+
+        outcome = board.outcome()
+        if self.journal:
+            self.journal.finish_game(
+                number, outcome.result() if outcome else "*", outcome.termination.name.lower() if outcome else None,
+            )
+        if self.opening_tree:
+            self.opening_tree.add_game(board, evals=evals, times=times)
+
+        if self.result_store:
+            opening = default_classifier().classify_board(board)
+            if opening:
+                self.result_store.set_opening(game_id, *opening)
+            self.result_store.finish_game(
+                game_id,
+                outcome.result() if outcome else "*",
+                outcome.termination.name.lower() if outcome else None,
+                len(board.move_stack),
+            )
+        return board
+
+    def run(self):
+        """Jugar los pares de partidas; con SPRT, parar en cuanto el test decida"""
+        a, b = self.engine_a, self.engine_b
+        decision = None
+
+        for pair in range(self.pairs):
+            fen = self.openings[pair % len(self.openings)]
+            for white, black in ((a, b), (b, a)):
+                number = 2 * pair + (white is b)
+                # Las partidas que el diario ya da por terminadas no se repiten
+                result = self.journal.result(number) if self.journal else None
+                if result is None:
+                    outcome = self.play_one(white, black, fen, number).outcome()
+                    result = outcome.result() if outcome else "*"
+                if result == "*":
+                    continue
+                if result == "1/2-1/2":
+                    score = 0.5
+                else:
+                    score = 1.0 if (result == "1-0") == (white is a) else 0.0
+                self.stats.add_game(a.name, b.name, score, pair_id=pair)
+                print(f"Partida {number + 1}: {white.name} - {black.name} {result}")
+
+            print(self.stats.format_report(a.name, b.name))
+
+            # El SPRT se evalúa tras cada par de partidas
+            if self.sprt:
+                llr, decision = self.sprt.evaluate(self.stats, a.name, b.name)
+                print(self.sprt.format_status(llr, decision))
+                if decision:
+                    break
+
+        return decision
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Torneo entre dos motores, con parada temprana por SPRT")
+    parser.add_argument("--engine", action="append", required=True,
+                        help="Motor como nombre=comando, nombre=xboard:comando, nombre=builtin[:procesos] "
+                             "o nombre=http://host:puerto (dos veces)")
+    parser.add_argument("--time", type=float, default=0.1, help="Segundos por jugada")
+    parser.add_argument("--pairs", type=int, default=100, help="Máximo de pares de partidas")
+    parser.add_argument("--openings", help="Archivo FEN/EPD con las posiciones iniciales")
+    parser.add_argument("--sprt", nargs=2, type=float, metavar=("ELO0", "ELO1"), help="Activar el SPRT con estos límites")
+    parser.add_argument("--alpha", type=float, default=0.05)
+    parser.add_argument("--beta", type=float, default=0.05)
+    parser.add_argument("--db", help="Guardar partidas y jugadas en esta base de datos SQLite")
+    parser.add_argument("--tree", help="Actualizar este árbol de aperturas (.npy) con cada partida")
+    parser.add_argument("--book", help="Libro Polyglot .bin: sus jugadas se hacen sin preguntar al motor")
+    parser.add_argument("--journal", help="Diario del torneo: si existe, se reanuda donde se quedó")
+    parser.add_argument("--watchdog", action="store_true", help="Reiniciar los motores que se cuelguen o se caigan")
+    args = parser.parse_args()
+
+    if len(args.engine) != 2:
+        parser.error("hacen falta exactamente dos motores")
+
+    players = [make_player(spec, args.watchdog) for spec in args.engine]
+    result_store = ResultStore(args.db) if args.db else None
+    opening_tree = OpeningTree(args.tree) if args.tree else None
+    book = chess.polyglot.open_reader(args.book) if args.book else None
+    sprt = SPRT(args.sprt[0], args.sprt[1], args.alpha, args.beta) if args.sprt else None
+    journal = None
+    if args.journal:
+        try:
+            journal = TournamentJournal(args.journal, [player.name for player in players])
+        except ValueError as e:
+            parser.error(str(e))
+    if journal and journal.games:
+        finished, in_flight = journal.summary()
+        print(f"Reanudando el torneo: {finished} partidas terminadas y {in_flight} a medias")
+    try:
+        tournament = Tournament(
+            players[0], players[1], chess.engine.Limit(time=args.time), pairs=args.pairs,
+            openings=load_openings(args.openings) if args.openings else None,
+            sprt=sprt, result_store=result_store, opening_tree=opening_tree, book=book, journal=journal,
+        )
+        tournament.run()
+    except KeyboardInterrupt:
+        print("Torneo interrumpido")
+    finally:
+        for player in players:
+            if isinstance(player, SupervisedEngine):
+                print(player.format_stats())
+            player.quit()
+        if result_store:
+            result_store.close()
+        if opening_tree:
+            opening_tree.save()
+        if book:
+            book.close()
+        if journal:
+            journal.close()
@@ -0,0 +1,98 @@
+import json
+import os
+import time
+
+
+class TournamentJournal:
+    """Diario de un torneo que solo crece: partidas empezadas, jugadas y resultados, una línea JSON cada uno
+
+    Las jugadas se pasan a disco (fsync) por lotes y cada resultado en el momento, así que tras
+    una caída se pierden como mucho las últimas jugadas y nunca una partida terminada.
+    """
+
+    def __init__(self, path, engines, sync_every=64, sync_interval=2.0):
+        self.path = path
+        self.sync_every = sync_every
+        self.sync_interval = sync_interval
+        # número de partida -> {"white", "black", "fen", "db", "moves", "result"}
+        self.games = {}
+        self._pending = 0
+        self._last_sync = time.monotonic()
+
+        header = self._load()
+        if header is not None and header["engines"] != list(engines):
+            raise ValueError(f"El diario {path} es de otro torneo: {' vs '.join(header['engines'])}")
+        self.file = open(path, "a", encoding="utf-8")
+        if header is None:
+            self._write({"t": "torneo", "engines": list(engines)}, sync=True)
+
+    def _load(self):
+        """Leer el diario existente; una última línea a medias (caída al escribir) se descarta"""
+        if not os.path.exists(self.path):
+            return None
+        with open(self.path, "rb") as f:
+            data = f.read()
+        valid = data[:data.rfind(b"\n") + 1]
+        if len(valid) != len(data):
+            with open(self.path, "r+b") as f:
+                f.truncate(len(valid))
+
+        header = None
+        for line in valid.decode("utf-8").splitlines():
+            record = json.loads(line)
+            kind = record["t"]
+            if kind == "torneo":
+                header = record
+            elif kind == "partida":
+                self.games[record["n"]] = {
+                    "white": record["white"], "black": record["black"], "fen": record["fen"],
+                    "db": record.get("db"), "moves": [], "result": None,
+                }
+            elif kind == "jugada":
+                self.games[record["n"]]["moves"].append(record["m"])
+            elif kind == "fin":
+                self.games[record["n"]]["result"] = record["result"]
+        return header
+
+    def _write(self, record, sync=False):
+        self.file.write(json.dumps(record, separators=(",", ":")) + "\n")
+        self._pending += 1
+        if sync or self._pending >= self.sync_every or time.monotonic() - self._last_sync >= self.sync_interval:
+            self.sync()
+
+    def sync(self):
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self._pending = 0
+        self._last_sync = time.monotonic()
+
+    def result(self, number):
+        """Resultado de una partida terminada según el diario, o None"""
+        game = self.games.get(number)
+        return game["result"] if game else None
+
+    def in_flight(self, number):
+        """Partida empezada y sin terminar (para reanudarla), o None"""
+        game = self.games.get(number)
+        return game if game and game["result"] is None else None
+
+    def start_game(self, number, white, black, fen, db_id=None):
+        self.games[number] = {"white": white, "black": black, "fen": fen, "db": db_id, "moves": [], "result": None}
+        self._write({"t": "partida", "n": number, "white": white, "black": black, "fen": fen, "db": db_id})
+
+    def record_move(self, number, uci):
+        self.games[number]["moves"].append(uci)
+        self._write({"t": "jugada", "n": number, "m": uci})
+
+    def finish_game(self, number, result, termination=None):
+        self.games[number]["result"] = result
+        self._write({"t": "fin", "n": number, "result": result, "termination": termination}, sync=True)
+
+    def summary(self):
+        finished = sum(1 for game in self.games.values() if game["result"] is not None)
+        return finished, len(self.games) - finished
+
+    def close(self):
+        if not self.file.closed:
+            self.sync()
+            self.file.close()